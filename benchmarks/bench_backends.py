@@ -0,0 +1,77 @@
+"""
+Compare the accuracy and the latency of the backends of a model over the
+french corpus. The torch backend is the reference: the other backends are
+scored by their agreement with its results.
+
+Usage: python -m benchmarks.bench_backends [--model NAME] [--texts N]
+"""
+import argparse
+from time import perf_counter
+
+from core.backends import BACKENDS, create_pipeline
+from core.models import MODEL_SPECS
+from benchmarks.corpus import french_messages
+
+
+def run(pipe, task, texts, batch_size):
+    """Returns the results of the pipeline and the time per text."""
+    kwargs = {"top_k": None} if task == "text-classification" else {}
+    pipe(texts[:1], **kwargs)  # warm up
+    start = perf_counter()
+    outputs = pipe(texts, batch_size=batch_size, **kwargs)
+    elapsed = (perf_counter() - start) / len(texts)
+    if task == "text-classification":
+        outputs = [{res["label"]: res["score"] for res in out} for out in outputs]
+    else:
+        outputs = [list(out.values())[0] for out in outputs]
+    return outputs, elapsed
+
+
+def compare(reference, outputs, task):
+    """Returns the agreement with the reference results."""
+    if task == "text-classification":
+        same_label = sum(
+            max(ref, key=ref.get) == max(out, key=out.get)
+            for ref, out in zip(reference, outputs)
+        )
+        score_diff = sum(
+            abs(ref[label] - out.get(label, 0))
+            for ref, out in zip(reference, outputs)
+            for label in ref
+        ) / sum(len(ref) for ref in reference)
+        return f"top label={same_label / len(reference):.1%} score diff={score_diff:.4f}"
+    same_text = sum(ref == out for ref, out in zip(reference, outputs))
+    return f"same text={same_text / len(reference):.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentiment", choices=list(MODEL_SPECS))
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    args = parser.parse_args()
+    spec = MODEL_SPECS[args.model]
+    texts = french_messages(args.texts)
+
+    reference, reference_time = None, None
+    for backend in args.backends:
+        start = perf_counter()
+        try:
+            pipe = create_pipeline(spec.task, spec.model, backend)
+        except ImportError as err:
+            print(f"{backend:6}: skipped, {err}")
+            continue
+        load_time = perf_counter() - start
+        outputs, elapsed = run(pipe, spec.task, texts, args.batch_size)
+        line = f"{backend:6}: load={load_time:.1f}s latency={1000 * elapsed:.1f}ms/text"
+        if reference is None:
+            reference, reference_time = outputs, elapsed
+        else:
+            line += f" speedup=x{reference_time / elapsed:.2f} "
+            line += compare(reference, outputs, spec.task)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
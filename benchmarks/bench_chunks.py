@@ -0,0 +1,64 @@
+"""
+Compare the summary and the topics of a channel with the chunks sent one by
+one to the models and with the chunks sent as length-sorted batches.
+
+Usage: python -m benchmarks.bench_chunks [--messages N] [--batch-size N]
+"""
+import argparse
+from time import perf_counter
+
+from core.backends import create_pipeline
+from core.models import MODEL_SPECS
+from util.summary import Summarizer
+from benchmarks.corpus import chat_history
+
+
+class CountingPipeline:
+    """Counts the calls and the texts given to a pipeline."""
+
+    def __init__(self, pipe) -> None:
+        self.pipe = pipe
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, texts, **kwargs):
+        self.calls += 1
+        self.texts += len(texts)
+        return self.pipe(texts, **kwargs)
+
+
+def run(summary, topics, analysis, batch_size):
+    """Returns the time of the summary and of the topics of the channel."""
+    summarizer = Summarizer(summary, topics, batch_size=batch_size)
+    start = perf_counter()
+    summarizer.summarize_all(analysis)
+    summary_time = perf_counter() - start
+    start = perf_counter()
+    summarizer.topics(analysis)
+    return summary_time, perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+    summary_spec, topics_spec = MODEL_SPECS["summary"], MODEL_SPECS["topics"]
+    summary = CountingPipeline(create_pipeline(summary_spec.task, summary_spec.model))
+    topics = CountingPipeline(create_pipeline(topics_spec.task, topics_spec.model))
+
+    # the conversations are the same for both runs
+    analysis = Summarizer(None, None).analyze(chat_history(args.messages)[::-1])
+    print(f"{args.messages} messages, {len(analysis.conversations)} conversations")
+    for batch_size in (1, args.batch_size):
+        summary.calls = summary.texts = topics.calls = 0
+        summary_time, topics_time = run(summary, topics, analysis, batch_size)
+        print(
+            f"batch size {batch_size:>2}: summary {summary_time:7.2f}s"
+            f" ({summary.calls} calls for {summary.texts} chunks)"
+            f" topics {topics_time:7.2f}s ({topics.calls} calls)"
+        )
+
+
+if __name__ == "__main__":
+    main()
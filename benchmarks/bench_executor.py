@@ -0,0 +1,64 @@
+"""
+Measure the latency of the commands while the background analysis floods the
+thread pool, with a FIFO pool and with the priority lanes.
+The jobs sleep instead of running the models.
+
+Usage: python -m benchmarks.bench_executor [--jobs N] [--job-ms MS]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from core.executor import PriorityExecutor, INTERACTIVE, BACKGROUND
+
+
+def flood(submit, jobs, job_time, commands):
+    """Returns the latencies of the commands sent during the flood."""
+    background = [submit(time.sleep, job_time, False) for _ in range(jobs)]
+    latencies = []
+    for _ in range(commands):
+        start = perf_counter()
+        submit(time.sleep, job_time, True).result()
+        latencies.append(perf_counter() - start)
+    for future in background:
+        future.result()
+    return latencies
+
+
+def report(title, latencies):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{title}: command latency p50={1000 * p50:.1f}ms p99={1000 * p99:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--job-ms", type=float, default=5)
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    job_time = args.job_ms / 1000
+
+    fifo = ThreadPoolExecutor(args.threads)
+    report(
+        "fifo    ",
+        flood(lambda f, t, _: fifo.submit(f, t), args.jobs, job_time, args.commands),
+    )
+    fifo.shutdown()
+
+    lanes = PriorityExecutor(args.threads)
+
+    def submit(func, t, interactive):
+        return lanes.submit(func, t, lane=INTERACTIVE if interactive else BACKGROUND)
+
+    report("priority", flood(submit, args.jobs, job_time, args.commands))
+    for lane, stats in lanes.get_stats().items():
+        print(f"  {lane}: {stats}")
+    lanes.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Measure the input tokens and the latency of the summary of a channel with all
+the messages given to the model and with the extractive selection of the most
+salient messages.
+
+Usage: python -m benchmarks.bench_extractive [--messages N] [--budget N]
+"""
+import argparse
+from time import perf_counter
+
+from transformers import AutoTokenizer
+
+from core.backends import create_pipeline
+from core.models import MODEL_SPECS
+from util.chunking import TokenChunker
+from util.summary import Summarizer
+from benchmarks.corpus import chat_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=256)
+    args = parser.parse_args()
+    spec = MODEL_SPECS["summary"]
+    pipe = create_pipeline(spec.task, spec.model)
+    tokenizer = AutoTokenizer.from_pretrained(spec.model)
+    chunker = TokenChunker(tokenizer, 512)
+
+    analysis = Summarizer(None, None).analyze(chat_history(args.messages)[::-1])
+    print(f"{args.messages} messages, {len(analysis.conversations)} conversations")
+    for budget in (None, args.budget):
+        summarizer = Summarizer(
+            pipe, None, chunker_factory=lambda name: chunker, extractive_tokens=budget
+        )
+        chunks, _ = summarizer.get_summary_chunks(analysis.conversations)
+        tokens = sum(chunker.count(chunks))
+        start = perf_counter()
+        summarizer.summarize_chunks(chunks)
+        elapsed = perf_counter() - start
+        print(
+            f"extractive budget {budget}: {tokens} input tokens"
+            f" in {len(chunks)} chunks, summary {elapsed:.2f}s"
+        )
+        if budget is not None:
+            print("selection:", summarizer.get_extractive_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare the per-message inference path with the micro-batching scheduler.
+
+Usage: python -m benchmarks.bench_inference [--model NAME] [--texts N]
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from transformers import pipeline
+
+from core.inference import InferenceScheduler
+from benchmarks.corpus import french_messages
+
+
+def bench_per_message(pipe, texts) -> float:
+    """Returns the time to classify the texts one by one."""
+    start = perf_counter()
+    for text in texts:
+        pipe(text, top_k=None)
+    return perf_counter() - start
+
+
+async def bench_scheduler(pipe, texts, batch_size, max_wait_ms) -> float:
+    """Returns the time to classify the texts through the scheduler."""
+    scheduler = InferenceScheduler(batch_size, max_wait_ms)
+    scheduler.register("bench", pipe)
+    start = perf_counter()
+    await asyncio.gather(*(scheduler.submit("bench", text, top_k=None) for text in texts))
+    elapsed = perf_counter() - start
+    print("scheduler stats:", scheduler.get_stats()["bench"])
+    scheduler.shutdown()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--model", default="citizenlab/twitter-xlm-roberta-base-sentiment-finetunned"
+    )
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    pipe = pipeline("text-classification", model=args.model)
+    texts = french_messages(args.texts)
+    # warm up
+    pipe(texts[0])
+
+    single = bench_per_message(pipe, texts)
+    batched = asyncio.run(
+        bench_scheduler(pipe, texts, args.batch_size, args.max_wait_ms)
+    )
+    print(f"per-message: {len(texts) / single:.1f} texts/s")
+    print(f"scheduler:   {len(texts) / batched:.1f} texts/s")
+    print(f"speedup:     x{single / batched:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measure the memory and the query latency of the mood statistics of a guild
+with one MessageMood object by message and with the hourly buckets of columns
+and their running totals, then the cost of the expiry of the old messages.
+
+Usage: python -m benchmarks.bench_moods [--messages N] [--users N] [--hours N]
+"""
+import argparse
+import random
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from util.moods import GuildMoods, MessageMood, MOOD_LABELS
+
+
+def generate(count, users, hours):
+    """Returns random analyzed messages of the last hours, with their authors."""
+    rng = random.Random(0)
+    now = datetime.now()
+    return [
+        (
+            rng.randrange(users),
+            MessageMood(
+                message_id=i,
+                time=now - timedelta(seconds=rng.uniform(0, hours * 3600)),
+                pov=rng.random(),
+                mood=[rng.choice(MOOD_LABELS), rng.random()],
+                positivity=rng.random(),
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def objects_queries(user_messages, users):
+    """The statistics computed over the MessageMood objects."""
+    for user_id in range(users):
+        messages = user_messages.get(user_id, [])
+        activity = sum(msg.get_weight() for msg in messages)
+        sum(msg.get_positivity() * msg.get_weight() for msg in messages) / activity
+        sum(msg.get_pov() * msg.get_weight() for msg in messages) / activity
+        moods = dict.fromkeys(MOOD_LABELS, 0)
+        for msg in messages:
+            moods[msg.get_mood()[0]] += msg.get_weight()
+    sum(msg.get_weight() for messages in user_messages.values() for msg in messages if msg.get_pov() > 0.5)
+
+
+def store_queries(guild, users):
+    """The same statistics read from the running totals."""
+    for user_id in range(users):
+        guild.get_user_positivity(user_id)
+        guild.get_user_pov(user_id)
+        guild.get_user_mood(user_id)
+    guild.get_guild_pov()
+
+
+def objects_collector(user_messages):
+    """The expiry scan of every message, with a list.remove by expired message."""
+    current_time = datetime.now()
+    expired_messages = []
+    for user_id, messages in user_messages.items():
+        for message in messages:
+            if (current_time - message.get_time()) >= timedelta(hours=24):
+                expired_messages.append((user_id, message))
+    for user_id, message in expired_messages:
+        user_messages[user_id].remove(message)
+
+
+def measure(name, build, query, collect):
+    tracemalloc.start()
+    structure = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = perf_counter()
+    query(structure)
+    queried = perf_counter()
+    collect(structure)
+    collected = perf_counter()
+    print(
+        f"{name}: {memory / 2 ** 20:.1f} MiB, queries {(queried - start) * 1000:.1f}ms,"
+        f" expiry {(collected - queried) * 1000:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=30)
+    args = parser.parse_args()
+    messages = generate(args.messages, args.users, args.hours)
+    print(f"{args.messages} messages of {args.users} users over {args.hours} hours")
+
+    def build_objects():
+        # copies of the objects, the generated ones are not counted
+        user_messages = defaultdict(list)
+        for user_id, msg in messages:
+            user_messages[user_id].append(MessageMood(
+                msg.get_message_id(), msg.get_time(), msg.get_pov(), list(msg.get_mood()), msg.get_positivity()
+            ))
+        return user_messages
+
+    def build_store():
+        guild = GuildMoods(None, None)
+        for user_id, msg in messages:
+            guild._add_message(user_id, msg)
+        return guild
+
+    measure(
+        "objects",
+        build_objects,
+        lambda user_messages: objects_queries(user_messages, args.users),
+        objects_collector,
+    )
+    measure(
+        "hourly buckets and totals",
+        build_store,
+        lambda guild: store_queries(guild, args.users),
+        GuildMoods.garbage_collector,
+    )
+
+
+if __name__ == "__main__":
+    main()
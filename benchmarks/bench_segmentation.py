@@ -0,0 +1,54 @@
+"""
+Compare the runtime and the peak memory of the conversation segmentation
+engine with the dense cluster_maker of the summarizer.
+
+Usage: python -m benchmarks.bench_segmentation [--sizes N ...] [--max-dense N]
+"""
+import argparse
+import tracemalloc
+from time import perf_counter
+
+from util.segmentation import ConversationSegmenter
+from util.summary import Summarizer
+from benchmarks.corpus import chat_history
+
+
+def measure(func, messages):
+    """Returns the time, the peak memory and the number of conversations."""
+    tracemalloc.start()
+    start = perf_counter()
+    conversations = func(messages)
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, len(conversations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument(
+        "--max-dense",
+        type=int,
+        default=2000,
+        help="the largest history given to cluster_maker",
+    )
+    args = parser.parse_args()
+    summarizer = Summarizer(None, None)
+    segmenter = ConversationSegmenter()
+
+    for n in args.sizes:
+        messages = chat_history(n)
+        elapsed, memory, count = measure(segmenter.segment, messages)
+        print(f"{n:>6} messages, segmenter:     {elapsed:8.3f}s {memory:9.1f}MiB {count} conversations")
+        if n > args.max_dense:
+            # the similarity, time and combined matrices hold n * n floats
+            estimate = 3 * 8 * n * n / 2**20
+            print(f"{n:>6} messages, cluster_maker: skipped, more than {estimate:.0f}MiB")
+            continue
+        elapsed, memory, count = measure(summarizer.cluster_maker, messages)
+        print(f"{n:>6} messages, cluster_maker: {elapsed:8.3f}s {memory:9.1f}MiB {count} conversations")
+
+
+if __name__ == "__main__":
+    main()
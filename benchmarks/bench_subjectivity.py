@@ -0,0 +1,46 @@
+"""
+Measure the subjectivity scoring of chat messages with the TextBlob analyzer of
+textblob-fr and with the compiled lexicon of the subjectivity scorer, message
+by message and by batch, and the largest difference between their scores.
+
+Usage: python -m benchmarks.bench_subjectivity [--messages N]
+"""
+import argparse
+from time import perf_counter
+
+from textblob import Blobber
+from textblob_fr import PatternTagger, PatternAnalyzer
+
+from util.subjectivity import SubjectivityScorer
+from benchmarks.corpus import chat_history
+
+
+def measure(name, score, texts):
+    start = perf_counter()
+    scores = score(texts)
+    elapsed = perf_counter() - start
+    print(f"{name}: {elapsed:.2f}s, {elapsed / len(texts) * 1e6:.1f}us by message")
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+    texts = [content for _, content, _, _ in chat_history(args.messages)]
+    print(f"{len(texts)} messages, {len(set(texts))} distinct")
+
+    blobber = Blobber(pos_tagger=PatternTagger(), analyzer=PatternAnalyzer())
+    # both lexicons are loaded before the measures
+    blobber("bon").sentiment
+    scorer = SubjectivityScorer()
+
+    expected = measure("textblob", lambda batch: [blobber(text).sentiment[1] for text in batch], texts)
+    scores = measure("scorer", lambda batch: [scorer.score(text) for text in batch], texts)
+    batched = measure("scorer by batch", scorer.score_many, texts)
+    print(f"max difference: {max(abs(a - b) for a, b in zip(expected, scores)):.3g}")
+    assert scores == batched
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure the latency of a summary command: the previous flow clustered the
+messages once for the topics and once for the summary, the analysis context
+clusters them once. The models are replaced by constant pipelines, so only the
+work around them is measured.
+
+Usage: python -m benchmarks.bench_summary [--sizes N ...] [--runs N]
+"""
+import argparse
+from time import perf_counter
+
+from util.summary import Summarizer
+from benchmarks.corpus import chat_history
+
+
+def pipeline_summary(text, **kwargs):
+    return [{"summary_text": "résumé"}]
+
+
+def pipeline_topics(texts, **kwargs):
+    return [[{"label": "travail", "score": 0.6}, {"label": "sport", "score": 0.4}]]
+
+
+def before(summarizer, messages):
+    """Topics and summary each cluster the messages."""
+    summarizer.topics_last(messages)
+    summarizer.summarize_last(messages)
+
+
+def after(summarizer, messages):
+    """Topics and summary share the analysis of the messages."""
+    analysis = summarizer.analyze(messages)
+    summarizer.topics_last(analysis)
+    summarizer.summarize_last(analysis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    summarizer = Summarizer(pipeline_summary, pipeline_topics)
+
+    for n in args.sizes:
+        # the history is fetched from the newest message
+        messages = chat_history(n)[::-1]
+        timings = {}
+        for flow in (before, after):
+            start = perf_counter()
+            for _ in range(args.runs):
+                flow(summarizer, messages)
+            timings[flow.__name__] = (perf_counter() - start) / args.runs
+        print(
+            f"{n:>6} messages, before: {timings['before'] * 1000:8.1f}ms"
+            f" after: {timings['after'] * 1000:8.1f}ms"
+            f" speedup=x{timings['before'] / timings['after']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measure the event loop lag during a message flood, with the pipelines running
+in a thread of the bot process or in worker processes.
+
+Usage: python -m benchmarks.bench_workers [--model NAME] [--texts N]
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from core.inference import InferenceScheduler
+from core.models import ModelRegistry
+from core.workers import WorkerPool
+from benchmarks.corpus import french_messages
+
+
+async def flood(pipe, texts):
+    """Returns the duration of the flood and the lags of the event loop."""
+    scheduler = InferenceScheduler(16, 20)
+    scheduler.register("bench", pipe)
+    loop = asyncio.get_running_loop()
+    lags = []
+    done = False
+
+    async def monitor():
+        while not done:
+            start = loop.time()
+            await asyncio.sleep(0.05)
+            lags.append(max(loop.time() - start - 0.05, 0))
+
+    monitor_task = loop.create_task(monitor())
+    start = perf_counter()
+    await asyncio.gather(*(scheduler.submit("bench", text, top_k=None) for text in texts))
+    elapsed = perf_counter() - start
+    done = True
+    await monitor_task
+    scheduler.shutdown()
+    return elapsed, lags
+
+
+def report(title, elapsed, lags):
+    lags = sorted(lags) or [0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{title}: {elapsed:.2f}s, loop lag mean={1000 * sum(lags) / len(lags):.1f}ms "
+        f"p99={1000 * p99:.1f}ms max={1000 * lags[-1]:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentiment")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    texts = french_messages(args.texts)
+
+    registry = ModelRegistry()
+    registry.get(args.model)
+    report("thread ", *asyncio.run(flood(registry.lazy(args.model), texts)))
+
+    pool = WorkerPool(args.workers)
+    pool.preload(args.model).result()
+    report("process", *asyncio.run(flood(pool.remote(args.model), texts)))
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""A fixed corpus of french chat messages used by the benchmarks."""
+from random import Random
+from typing import List, Tuple
+
+MESSAGES = (
+    "Salut tout le monde, ça va ?",
+    "Je suis trop content de vous revoir ce soir !",
+    "Franchement ce film était nul, j'ai perdu deux heures.",
+    "mdr",
+    "ok",
+    "Quelqu'un a compris l'exercice 3 du TD de maths ?",
+    "J'ai peur de rater mon examen demain...",
+    "C'est vraiment injuste, je suis en colère contre le prof.",
+    "Merci beaucoup pour ton aide, tu es génial !",
+    "On se retrouve à quelle heure pour le match ?",
+    "Je pense que le nouveau patch a cassé le jeu.",
+    "Tu as vu les résultats des élections ?",
+    "J'adore cette chanson, elle me rappelle mon enfance.",
+    "Je suis tellement triste depuis que mon chat est parti.",
+    "Wow, je ne m'attendais pas du tout à ça !",
+    "Le serveur rame encore, c'est insupportable.",
+    "Bonne nuit à tous, à demain !",
+    "Qui veut jouer ce soir ? Il nous manque un joueur.",
+    "La pâtisserie c'est ma passion, surtout les éclairs au chocolat.",
+    "Je ne suis pas d'accord avec toi sur ce point, mais je comprends.",
+    "Il pleut encore, quelle journée déprimante.",
+    "J'ai enfin trouvé un stage pour cet été !",
+    "Vous avez des recommandations de livres ?",
+    "Arrête de spammer le salon s'il te plaît.",
+    "Le master informatique a l'air passionnant mais difficile.",
+    "On devrait organiser une soirée jeux la semaine prochaine.",
+    "Je déteste quand les gens arrivent en retard.",
+    "C'est incroyable ce que l'IA arrive à faire maintenant.",
+    "Tu me manques, ça fait longtemps qu'on ne s'est pas parlé.",
+    "Bravo pour ta victoire, tu le mérites vraiment !",
+    "J'ai un doute, c'est demain ou après-demain la réunion ?",
+    "Ce restaurant est vraiment excellent, je le recommande.",
+    "Je suis crevé, la semaine a été longue.",
+    "Attention, il y a une arnaque qui circule sur Discord.",
+    "J'ai mal au ventre, je crois que j'ai trop mangé.",
+    "Qu'est-ce que vous pensez de la nouvelle saison ?",
+    "Je n'en peux plus de ces bugs, je vais tout désinstaller.",
+    "Trop mignon ton chien sur la photo !",
+    "Le concert était incroyable, quelle ambiance !",
+    "Je suis surpris que personne n'en parle.",
+)
+
+
+def french_messages(n: int, seed: int = 0) -> List[str]:
+    """Returns n distinct messages built from the fixed corpus."""
+    rand = Random(seed)
+    res = []
+    seen = set()
+    while len(res) < n:
+        text = " ".join(rand.sample(MESSAGES, rand.randint(1, 3)))
+        if text in seen:
+            text = f"{text} ({len(res)})"
+        seen.add(text)
+        res.append(text)
+    return res
+
+
+
+AUTHORS = ("SepanBot", "YaBot", "HagBot", "JBot", "MaxBot", "LeaBot")
+
+
+def chat_history(n: int, seed: int = 0) -> List[Tuple[str, str, float, int]]:
+    """
+    Returns n chat messages as (author, content, timestamp, message_id) tuples,
+    the format of the summary extension. The messages come by conversations,
+    separated by pauses of up to two hours.
+    """
+    rand = Random(seed)
+    texts = french_messages(n, seed)
+    time = 1_000_000_000.0
+    res = []
+    while len(res) < n:
+        # a conversation between a few members
+        authors = rand.sample(AUTHORS, rand.randint(2, 4))
+        for _ in range(min(rand.randint(5, 60), n - len(res))):
+            time += rand.expovariate(1 / 20)
+            res.append((rand.choice(authors), texts[len(res)], time, len(res)))
+        time += rand.uniform(1800, 7200)
+    return res
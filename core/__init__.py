@@ -6,4 +6,17 @@ from .config import Config
 
 from .store import Store
 
-from .translate import Translator
\ No newline at end of file
+from .translate import Translator
+
+from .inference import InferenceScheduler
+
+from .models import ModelRegistry
+
+from .workers import WorkerPool
+
+from .cache import ResultCache
+from .executor import PriorityExecutor
+
+from .ingestion import IngestionQueue
+
+from .governor import InputGovernor
@@ -0,0 +1,79 @@
+import os
+import re
+
+from transformers import AutoModelForSeq2SeqLM, AutoModelForSequenceClassification
+from transformers import AutoTokenizer, pipeline
+
+# torch: fp32 eager mode
+# int8: linear layers quantized with torch dynamic quantization
+# onnx: graph exported once and run by onnxruntime, needs optimum
+BACKENDS = ("torch", "int8", "onnx")
+
+MODEL_CACHE_DIR = "data/models"
+
+# the model classes by pipeline task
+AUTO_MODELS = {
+    "text-classification": AutoModelForSequenceClassification,
+    "summarization": AutoModelForSeq2SeqLM,
+    "translation": AutoModelForSeq2SeqLM,
+}
+ORT_MODELS = {
+    "text-classification": "ORTModelForSequenceClassification",
+    "summarization": "ORTModelForSeq2SeqLM",
+    "translation": "ORTModelForSeq2SeqLM",
+}
+
+
+def get_cache_path(model: str, backend: str, cache_dir: str = MODEL_CACHE_DIR) -> str:
+    """Returns the path of the converted model on the disk."""
+    slug = re.sub(r"[^\w.-]", "_", model)
+    return os.path.join(cache_dir, f"{slug}.{backend}")
+
+
+def _load_int8(task: str, model: str, cache_dir: str):
+    """Returns the model with int8 linear layers, quantized once and cached."""
+    import torch
+
+    path = get_cache_path(model, "int8", cache_dir) + ".pt"
+    if os.path.exists(path):
+        return torch.load(path, weights_only=False)
+    fp32 = AUTO_MODELS[task].from_pretrained(model)
+    res = torch.quantization.quantize_dynamic(fp32, {torch.nn.Linear}, dtype=torch.qint8)
+    os.makedirs(cache_dir, exist_ok=True)
+    torch.save(res, path)
+    return res
+
+
+def _load_onnx(task: str, model: str, cache_dir: str):
+    """Returns the onnxruntime model, exported once and cached."""
+    try:
+        import optimum.onnxruntime
+    except ImportError as err:
+        raise ImportError(
+            "The onnx backend needs optimum: pip install optimum[onnxruntime]"
+        ) from err
+    model_class = getattr(optimum.onnxruntime, ORT_MODELS[task])
+    path = get_cache_path(model, "onnx", cache_dir)
+    if os.path.isdir(path):
+        return model_class.from_pretrained(path)
+    res = model_class.from_pretrained(model, export=True)
+    res.save_pretrained(path)
+    return res
+
+
+def create_pipeline(
+    task: str, model: str, backend: str = "torch", cache_dir: str = MODEL_CACHE_DIR
+):
+    """Returns the pipeline of the model running with the specified backend."""
+    if backend == "torch":
+        return pipeline(task, model=model)
+    if task not in AUTO_MODELS:
+        raise ValueError(f"The {backend} backend does not support the {task} task.")
+    if backend == "int8":
+        converted = _load_int8(task, model, cache_dir)
+    elif backend == "onnx":
+        converted = _load_onnx(task, model, cache_dir)
+    else:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}.")
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    return pipeline(task, model=converted, tokenizer=tokenizer)
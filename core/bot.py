@@ -1,13 +1,19 @@
+import asyncio
 import discord
 from discord.ext import commands, tasks
-from concurrent.futures import ThreadPoolExecutor
 import sqlite3
-from transformers import pipeline
-from typing import Any
+from typing import Any, Dict
 from random import randint, choice
 
 from core.config import Config
 from core.translate import Translator
+from core.executor import PriorityExecutor, BACKGROUND
+from core.ingestion import IngestionQueue
+from core.inference import InferenceScheduler
+from core.models import ModelRegistry, get_model_specs
+from core.governor import InputGovernor
+from core.workers import WorkerPool
+from core.cache import ResultCache
 from core.staff import StaffCog
 from core.store import Store
 from core.auth import AuthManager, privacy_cmd
@@ -17,8 +23,10 @@ from core.help import ConvolyzerHelp
 class Convolyzer(commands.Bot):
     def __init__(self, prefix, intents, config: Config) -> None:
         super().__init__(prefix, intents=intents, help_command=ConvolyzerHelp())
-        # threads pool
-        self.thread_pool = ThreadPoolExecutor()
+        # threads pool, the commands are run before the background jobs
+        self.thread_pool = PriorityExecutor(
+            max_wait_ms=config.get_executor_max_wait()
+        )
         # the config manager
         self.config = config
         # db and store
@@ -26,35 +34,139 @@ class Convolyzer(commands.Bot):
         self.privacy_store = Store("privacy", self.sql_con)
         # auth manager
         self.auth_manager = AuthManager(self.privacy_store)
-        # the translator
-        self.translator = Translator()
-        # the pipelines
-        self.pipeline_summary = pipeline(
-            "summarization", model="moussaKam/mbarthez-dialogue-summarization"
+        # the models and their backend
+        specs = get_model_specs(config.get_model_backends())
+        # the cache of the model results by message content
+        self.result_cache = ResultCache(
+            config.get_cache_size(),
+            "data/cache.sqlite" if config.is_cache_persistent() else None,
+            versions=self.__get_cache_versions(specs),
         )
-        self.pipeline_topics = pipeline(
-            "text-classification", model="lincoln/flaubert-mlsum-topic-classification"
+        # the messages waiting for their analysis, sampled under load
+        self.ingestion = IngestionQueue(
+            config.get_ingestion_size(), config.get_ingestion_watermark()
         )
-        self.pipeline_mood = pipeline(
-            "text-classification",
-            model="botdevringring/fr-naxai-ai-emotion-classification-081808122023",
-        )
-        self.pipeline_sentiment = pipeline(
-            "text-classification",
-            model="citizenlab/twitter-xlm-roberta-base-sentiment-finetunned",
+        # the models, loaded the first time they are used
+        self.models = ModelRegistry(specs, config.get_disabled_models())
+        # the worker processes which run the models out of the bot process
+        self.workers = None
+        if config.get_inference_backend() == "process":
+            self.workers = WorkerPool(
+                config.get_inference_workers(), specs, config.get_disabled_models()
+            )
+        # the event loop lag, it grows when the GIL is held by other threads
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+        # the tasks started in setup_hook, cancelled on close
+        self.__monitor_task = None  # Type: Optional[asyncio.Task]
+        self.__preload_task = None  # Type: Optional[asyncio.Task]
+        # the token budget of the messages sent to the classifiers
+        self.governor = InputGovernor(
+            config.get_model_max_tokens(), config.get_models_truncation()
         )
-        self.pipeline_mbti = pipeline(
-            "text-classification", model="JanSt/albert-base-v2_mbti-classification"
+        # the inference scheduler, it batches the texts sent to the pipelines,
+        # the workers run their batches in parallel
+        self.inference = InferenceScheduler(
+            config.get_inference_batch_size(),
+            config.get_inference_max_wait(),
+            parallel=self.workers is not None,
         )
+        # the translator
+        self.translator = Translator(self.__get_pipeline("translation"))
+        # the pipelines
+        self.pipeline_summary = self.__get_pipeline("summary")
+        self.pipeline_topics = self.__get_pipeline("topics")
+        self.pipeline_mood = self.__get_pipeline("mood")
+        self.pipeline_sentiment = self.__get_pipeline("sentiment")
+        self.pipeline_mbti = self.__get_pipeline("mbti")
         # add globals check
         self.add_check(self.__globally_block_dms)
 
-    async def run_in_thread(self, func, *args) -> Any:
-        """Run the function in a thread and return the result"""
-        future = self.loop.run_in_executor(self.thread_pool, func, *args)
-        await future
-        return future.result()
-    
+    async def run_in_thread(self, func, *args, lane: str = BACKGROUND) -> Any:
+        """
+        Run the function in a thread and return the result.
+        The jobs of the interactive lane are run before the background ones.
+        """
+        future = self.thread_pool.submit(func, *args, lane=lane)
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def __get_cache_versions(specs) -> Dict[str, str]:
+        """Returns the version of the cached results of each model."""
+        versions = {
+            name: spec.backend for name, spec in specs.items() if spec.backend != "torch"
+        }
+        # the MBTI model classifies the translated messages
+        if "translation" in versions:
+            mbti = versions.get("mbti", "torch")
+            versions["mbti"] = f"{mbti}+translation.{versions['translation']}"
+        return versions
+
+    def __get_pipeline(self, name: str):
+        """
+        Returns the lazy pipeline of the model, batched by the scheduler.
+        The messages sent to the classifiers and the translator are cut to
+        their token budget, the summarizer splits its texts itself with the
+        tokenizer and the budget of the governor.
+        """
+        if self.workers:
+            res = self.inference.register(name, self.workers.remote(name))
+        else:
+            res = self.inference.register(name, self.models.lazy(name))
+        if name in ("translation", "mood", "sentiment", "mbti"):
+            res = self.governor.wrap(name, res)
+        else:
+            self.governor.register(name, res)
+        return res
+
+    async def __preload_models(self) -> None:
+        """Load in background the models used by the loaded extensions."""
+        for name in self.models.get_models_for(self.extensions.keys()):
+            if self.workers:
+                await asyncio.wrap_future(self.workers.preload(name))
+            else:
+                await self.run_in_thread(self.models.get, name)
+
+    async def __monitor_loop_lag(self) -> None:
+        """Measure how late the event loop wakes up."""
+        interval = 0.5
+        while not self.is_closed():
+            start = self.loop.time()
+            await asyncio.sleep(interval)
+            lag = max(self.loop.time() - start - interval, 0)
+            self.loop_lag = 0.9 * self.loop_lag + 0.1 * lag
+            self.loop_lag_max = max(self.loop_lag_max, lag)
+
+    def get_performance_report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the performance counters of the bot components.
+        Each section maps a counter name to its value. The cogs can add their
+        sections with a get_performance_stats method.
+        """
+        report = dict()
+        report["gateway"] = {
+            "heartbeat_ms": self.latency * 1000,
+            "loop_lag_ms": self.loop_lag * 1000,
+            "loop_lag_max_ms": self.loop_lag_max * 1000,
+        }
+        report["ingestion"] = self.ingestion.get_stats()
+        report["cache"] = self.result_cache.get_stats()
+        for lane, stats in self.thread_pool.get_stats().items():
+            report[f"executor.{lane}"] = stats
+        for name, stats in self.governor.get_stats().items():
+            report[f"input.{name}"] = stats
+        for name, stats in self.inference.get_stats().items():
+            report[f"inference.{name}"] = stats
+        # the models are loaded in the workers with the process backend
+        models = self.workers or self.models
+        for name, stats in models.get_stats().items():
+            report[f"model.{name}"] = stats
+        # the counters of the extensions
+        for cog in self.cogs.values():
+            if hasattr(cog, "get_performance_stats"):
+                report.update(cog.get_performance_stats())
+        return report
+
     def get_cog_by_class_name(self, name: str):
         """
         Returns the cog with this class name.
@@ -152,6 +264,8 @@ class Convolyzer(commands.Bot):
         await self.change_presence(activity=activity)
 
     async def setup_hook(self) -> None:
+        # Start batching the inference calls
+        self.inference.start(self.loop)
         # Load the privacy command
         self.add_command(privacy_cmd)
         # Load Cog in core
@@ -169,12 +283,36 @@ class Convolyzer(commands.Bot):
             await self.tree.sync()
         # start the status update loop
         self.update_status.start()
+        # watch the event loop
+        self.__monitor_task = self.loop.create_task(self.__monitor_loop_lag())
+        # load the models while the bot is already online
+        if self.config.is_models_preload():
+            self.__preload_task = self.loop.create_task(self.__preload_models())
+
+    async def unload_extension(self, name: str, *, package=None) -> None:
+        await super().unload_extension(name, package=package)
+        # free the memory of the models nobody uses now
+        used = self.models.get_models_for(self.extensions.keys())
+        for model in self.models.get_models_for([name]):
+            if model not in used:
+                self.models.release(model)
 
     async def close(self) -> None:
+        tasks_started = [
+            task for task in (self.__preload_task, self.__monitor_task) if task
+        ]
+        for task in tasks_started:
+            task.cancel()
+        # a failed preload is not an error of the shutdown
+        await asyncio.gather(*tasks_started, return_exceptions=True)
         for extension in list(self.extensions.keys()):
             await self.unload_extension(extension)
         self.update_status.cancel()
         self.thread_pool.shutdown(cancel_futures=True)
+        self.inference.shutdown()
+        if self.workers:
+            self.workers.shutdown()
+        self.result_cache.close()
         await super().close()
 
     async def __globally_block_dms(self, ctx):
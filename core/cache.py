@@ -0,0 +1,149 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Returns the text with a canonical unicode form and collapsed spaces."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of the model results, keyed by a hash of the model name,
+    its version and the normalized text. If a path is given, the results are
+    also stored in a SQLite database and survive a restart.
+    The version of a model changes with its backend, the results of another
+    backend are not reused.
+    """
+
+    COMMIT_EVERY = 100
+
+    def __init__(
+        self,
+        max_size: int = 50000,
+        path: Optional[str] = None,
+        max_persisted: int = 500000,
+        versions: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.versions = versions or {}
+        self.max_persisted = max_persisted
+        self.__entries = OrderedDict()  # Type: OrderedDict[str, Any]
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__pending_writes = 0
+        self.__con = None
+        if path:
+            # the cache is used from the threads of the pool
+            self.__con = sqlite3.connect(path, check_same_thread=False)
+            self.__con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                """
+            )
+
+    def get_key(self, model: str, text: str) -> str:
+        """Returns the key of the text for the model."""
+        # the default version keeps the keys of the older caches
+        version = self.versions.get(model)
+        if version:
+            model = f"{model}@{version}"
+        data = f"{model}\0{normalize_text(text)}".encode()
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[Any]:
+        """Returns the cached result or None."""
+        key = self.get_key(model, text)
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return self.__entries[key]
+            if self.__con:
+                row = self.__con.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self.__put(key, value)
+                    self.__hits += 1
+                    return value
+            self.__misses += 1
+            return None
+
+    def contains(self, model: str, text: str) -> bool:
+        """
+        Returns whether the result is cached in memory, without counting a hit
+        or a miss. The database is not read, it is fast enough for the event loop.
+        """
+        key = self.get_key(model, text)
+        with self.__lock:
+            return key in self.__entries
+
+    def set(self, model: str, text: str, value: Any) -> None:
+        """Store the result of the model for the text."""
+        key = self.get_key(model, text)
+        with self.__lock:
+            self.__put(key, value)
+            if self.__con:
+                self.__con.execute(
+                    "REPLACE INTO results (key, value) VALUES (?, ?)",
+                    (key, json.dumps(value)),
+                )
+                self.__pending_writes += 1
+                if self.__pending_writes >= self.COMMIT_EVERY:
+                    self.__commit()
+
+    def get_or_compute(self, model: str, text: str, func: Callable[[str], Any]) -> Any:
+        """Returns the cached result or computes it with func(text)."""
+        value = self.get(model, text)
+        if value is None:
+            value = func(text)
+            self.set(model, text, value)
+        return value
+
+    def __put(self, key: str, value: Any) -> None:
+        """Add the entry in memory and evict the least recently used ones."""
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def __commit(self) -> None:
+        """Write the pending results and trim the oldest ones."""
+        # REPLACE gives a new rowid, the smallest rowids are the oldest writes
+        self.__con.execute(
+            "DELETE FROM results WHERE rowid <= (SELECT MAX(rowid) FROM results) - ?",
+            (self.max_persisted,),
+        )
+        self.__con.commit()
+        self.__pending_writes = 0
+
+    def close(self) -> None:
+        """Write the pending results and close the database."""
+        with self.__lock:
+            if self.__con:
+                self.__commit()
+                self.__con.close()
+                self.__con = None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the hit and miss counters."""
+        total = self.__hits + self.__misses
+        return {
+            "size": len(self.__entries),
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "hit_rate": self.__hits / total if total else 0.0,
+        }
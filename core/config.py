@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import Any, Dict, List, Optional
 import re
 
 class Config:
@@ -15,6 +15,18 @@ class Config:
         assert isinstance(self.__data["color"], str)
         assert re.match(r"#[0-9a-f]{6}", self.__data["color"])
         assert isinstance(self.__data["prefix"], str)
+        # optional sections
+        assert isinstance(self.__data.get("executor", {}), dict)
+        assert isinstance(self.__data.get("ingestion", {}), dict)
+        assert isinstance(self.__data.get("inference", {}), dict)
+        assert isinstance(self.__data.get("models", {}), dict)
+        assert isinstance(self.__data.get("cache", {}), dict)
+        assert isinstance(self.__data.get("summary", {}), dict)
+        assert isinstance(self.__data.get("moods", {}), dict)
+
+    def __get_option(self, section: str, key: str, default: Any) -> Any:
+        """Returns the value of an optional setting or its default value."""
+        return self.__data.get(section, {}).get(key, default)
 
     def get_token(self) -> str:
         """Returns the bot token"""
@@ -45,4 +57,131 @@ class Config:
 
     def get_prefix(self) -> str:
         """Returns the bot's prefix."""
-        return self.__data.get("prefix")
\ No newline at end of file
+        return self.__data.get("prefix")
+
+    def get_inference_batch_size(self) -> int:
+        """Returns the maximum number of texts in an inference batch."""
+        return self.__get_option("inference", "max_batch_size", 16)
+
+    def get_inference_max_wait(self) -> float:
+        """Returns the maximum time in milliseconds a text waits for its batch."""
+        return self.__get_option("inference", "max_wait_ms", 20)
+
+    def get_executor_max_wait(self) -> float:
+        """
+        Returns the time in milliseconds after which a background job is run
+        before the interactive ones.
+        """
+        return self.__get_option("executor", "max_wait_ms", 2000)
+
+    def get_inference_backend(self) -> str:
+        """
+        Returns where the pipelines run: "thread" in the bot process or
+        "process" in dedicated worker processes.
+        """
+        return self.__get_option("inference", "backend", "thread")
+
+    def get_inference_workers(self) -> int:
+        """Returns the number of worker processes of the process backend."""
+        return self.__get_option("inference", "workers", 2)
+
+    def get_disabled_models(self) -> List[str]:
+        """Returns the names of the models which must never be loaded."""
+        return self.__get_option("models", "disabled", [])
+
+    def get_model_backends(self) -> Dict[str, str]:
+        """
+        Returns the backend of the models which don't run with the default
+        torch backend, by model name.
+        """
+        return self.__get_option("models", "backends", {})
+
+    def get_model_max_tokens(self) -> Dict[str, int]:
+        """
+        Returns the maximum number of tokens of the texts sent to the models,
+        by model name. The models not listed use their maximum length.
+        """
+        return self.__get_option("models", "max_tokens", {})
+
+    def get_models_truncation(self) -> str:
+        """
+        Returns how the texts longer than the maximum are cut: "head" keeps
+        their beginning, "window" keeps their beginning and their end.
+        """
+        return self.__get_option("models", "truncation", "window")
+
+    def is_models_preload(self) -> bool:
+        """Returns True if the models are loaded in background after startup."""
+        return self.__get_option("models", "preload", True)
+
+    def get_ingestion_size(self) -> int:
+        """Returns the maximum number of messages waiting for their analysis."""
+        return self.__get_option("ingestion", "max_size", 2000)
+
+    def get_ingestion_watermark(self) -> float:
+        """Returns the fill ratio of the ingestion queue above which messages are sampled."""
+        return self.__get_option("ingestion", "high_watermark", 0.5)
+
+    def get_cache_size(self) -> int:
+        """Returns the number of model results kept in memory."""
+        return self.__get_option("cache", "max_size", 50000)
+
+    def is_cache_persistent(self) -> bool:
+        """Returns True if the model results are also stored on disk."""
+        return self.__get_option("cache", "persistent", True)
+
+    def get_summary_overlap(self) -> int:
+        """
+        Returns the number of tokens of the end of a chunk repeated at the
+        start of the next one, for the summary and the topics models.
+        """
+        return self.__get_option("summary", "chunk_overlap", 0)
+
+    def is_summary_approximate(self) -> bool:
+        """
+        Returns True if the tokens of the chunks are estimated from their
+        length instead of being counted by the tokenizer.
+        """
+        return self.__get_option("summary", "approximate", False)
+
+    def get_summary_extractive_tokens(self) -> Optional[int]:
+        """
+        Returns the number of tokens of the most salient messages of a
+        conversation given to the summary model, None to give all of them.
+        """
+        return self.__get_option("summary", "extractive_tokens", 1024)
+
+    def get_summary_max_messages(self) -> int:
+        """Returns the maximum number of messages summarized from a message."""
+        return self.__get_option("summary", "max_messages", 1000)
+
+    def get_summary_max_depth(self) -> int:
+        """Returns the maximum number of levels of a hierarchical summary."""
+        return self.__get_option("summary", "max_depth", 3)
+
+    def get_summary_fan_out(self) -> int:
+        """Returns the number of summaries gathered into the next level."""
+        return self.__get_option("summary", "fan_out", 8)
+
+    def get_summary_time_budget(self) -> float:
+        """Returns the time in seconds after which no level of summary is started."""
+        return self.__get_option("summary", "time_budget", 60)
+
+    def get_summary_output_tokens(self) -> int:
+        """Returns the number of tokens of a summary short enough to be sent."""
+        return self.__get_option("summary", "output_tokens", 256)
+
+    def get_summary_timeout(self) -> float:
+        """
+        Returns the time in seconds given to the summary model, the
+        conversations not summarized in time get an extractive summary.
+        """
+        return self.__get_option("summary", "timeout", 30)
+
+    def get_summary_edit_interval(self) -> float:
+        """Returns the minimal time in seconds between two edits of a summary reply."""
+        return self.__get_option("summary", "edit_interval", 1.5)
+
+    def get_moods_retention(self) -> float:
+        """Returns the number of hours during which a message counts in the mood statistics."""
+        return self.__get_option("moods", "retention_hours", 24)
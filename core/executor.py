@@ -0,0 +1,172 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# the lane of the job run by the current thread
+_current = threading.local()
+
+
+def current_lane() -> str:
+    """Returns the lane of the job run by the current thread, background outside a job."""
+    return getattr(_current, "lane", BACKGROUND)
+
+
+class LaneStats:
+    """Wait time counters of one lane."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.submitted = 0
+        self.done = 0
+        self.promoted = 0
+        # the most recent wait times, in seconds
+        self.waits = deque(maxlen=window)
+
+    def to_dict(self, queued: int) -> Dict[str, float]:
+        """Returns the counters and the wait percentiles as a dict."""
+        waits = sorted(self.waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(int(p * len(waits)), len(waits) - 1)] * 1000
+
+        return {
+            "queued": queued,
+            "submitted": self.submitted,
+            "done": self.done,
+            "promoted": self.promoted,
+            "wait_p50_ms": percentile(0.5),
+            "wait_p99_ms": percentile(0.99),
+        }
+
+
+class PriorityExecutor:
+    """
+    Thread pool with a queue per lane. The threads always take the jobs of the
+    first lanes first, so a command is not queued behind the background
+    analysis of the messages. A job of the last lanes which has waited more
+    than max_wait_ms is taken first, at most once every promote_every jobs of
+    the first lanes, so the last lanes never starve without taking over the
+    threads under a sustained load.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        lanes: List[str] = (INTERACTIVE, BACKGROUND),
+        max_wait_ms: float = 2000,
+        promote_every: int = 4,
+    ) -> None:
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.max_wait = max_wait_ms / 1000
+        self.promote_every = promote_every
+        # the jobs of the first lane taken since the last promotion
+        self.__first_taken = promote_every
+        self.__lanes = list(lanes)
+        # pending jobs by lane, as (submit time, future, func, args)
+        self.__queues = {lane: deque() for lane in self.__lanes}
+        self.__stats = {lane: LaneStats() for lane in self.__lanes}
+        self.__cond = threading.Condition()
+        self.__shutdown = False
+        self.__threads = []  # Type: list[threading.Thread]
+
+    def submit(self, func: Callable, *args, lane: str = BACKGROUND) -> Future:
+        """Queue the job in the lane and returns its future."""
+        if lane not in self.__queues:
+            raise ValueError(f"Unknown lane {lane}.")
+        future = Future()
+        with self.__cond:
+            if self.__shutdown:
+                raise RuntimeError("Cannot submit a job after shutdown.")
+            self.__queues[lane].append((perf_counter(), future, func, args))
+            self.__stats[lane].submitted += 1
+            # start the threads on demand, like ThreadPoolExecutor
+            if len(self.__threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self.__work,
+                    name=f"executor_{len(self.__threads)}",
+                    daemon=True,
+                )
+                self.__threads.append(thread)
+                thread.start()
+            self.__cond.notify()
+        return future
+
+    def __next_job(self):
+        """Returns the lane and the next job, the lock must be held."""
+        now = perf_counter()
+        first = self.__lanes[0]
+        if self.__queues[first] and self.__first_taken < self.promote_every:
+            self.__first_taken += 1
+            return first, self.__queues[first].popleft()
+        # the oldest starving job of the last lanes, then the lanes by priority
+        starving = [
+            lane
+            for lane in self.__lanes[1:]
+            if self.__queues[lane] and now - self.__queues[lane][0][0] > self.max_wait
+        ]
+        if starving:
+            lane = min(starving, key=lambda l: self.__queues[l][0][0])
+            ahead = self.__lanes[:self.__lanes.index(lane)]
+            if any(self.__queues[l] for l in ahead):
+                self.__stats[lane].promoted += 1
+                self.__first_taken = 0
+            return lane, self.__queues[lane].popleft()
+        for lane in self.__lanes:
+            if self.__queues[lane]:
+                if lane == first:
+                    self.__first_taken += 1
+                return lane, self.__queues[lane].popleft()
+        return None, None
+
+    def __work(self) -> None:
+        """Run the jobs until the shutdown."""
+        while True:
+            with self.__cond:
+                lane, job = self.__next_job()
+                while job is None:
+                    if self.__shutdown:
+                        return
+                    self.__cond.wait()
+                    lane, job = self.__next_job()
+                submitted, future, func, args = job
+                self.__stats[lane].waits.append(perf_counter() - submitted)
+            if future.set_running_or_notify_cancel():
+                _current.lane = lane
+                try:
+                    future.set_result(func(*args))
+                except BaseException as err:
+                    future.set_exception(err)
+                finally:
+                    del _current.lane
+            with self.__cond:
+                self.__stats[lane].done += 1
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        """Stop the threads once the queued jobs are done or cancelled."""
+        with self.__cond:
+            self.__shutdown = True
+            if cancel_futures:
+                for queue in self.__queues.values():
+                    for _, future, _, _ in queue:
+                        future.cancel()
+                    queue.clear()
+            self.__cond.notify_all()
+        if wait:
+            for thread in self.__threads:
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the wait time counters of each lane."""
+        with self.__cond:
+            return {
+                lane: self.__stats[lane].to_dict(len(self.__queues[lane]))
+                for lane in self.__lanes
+            }
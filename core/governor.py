@@ -0,0 +1,157 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List
+
+# the upper bounds of the histogram buckets, in tokens
+BUCKETS = (16, 32, 64, 128, 256, 512, 1024)
+
+STRATEGIES = ("head", "window")
+
+
+class InputStats:
+    """Histogram of the input sizes of one model."""
+
+    def __init__(self) -> None:
+        self.texts = 0
+        self.truncated = 0
+        self.max_tokens = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, tokens: int, truncated: bool) -> None:
+        """Record the size of an input."""
+        self.texts += 1
+        self.truncated += truncated
+        self.max_tokens = max(self.max_tokens, tokens)
+        self.buckets[bisect_left(BUCKETS, tokens)] += 1
+
+    def to_dict(self, budget: int) -> Dict[str, int]:
+        """Returns the counters and the histogram as a dict."""
+        res = {
+            "budget": budget,
+            "texts": self.texts,
+            "truncated": self.truncated,
+            "max_tokens": self.max_tokens,
+        }
+        for bound, count in zip(BUCKETS, self.buckets):
+            res[f"le_{bound}"] = count
+        res[f"gt_{BUCKETS[-1]}"] = self.buckets[-1]
+        return res
+
+
+class GovernedPipeline:
+    """Drop-in replacement of a pipeline which fits its inputs to the budget."""
+
+    def __init__(self, governor: "InputGovernor", name: str, pipeline) -> None:
+        self.__governor = governor
+        self.__name = name
+        self.__pipeline = pipeline
+
+    def __call__(self, inputs, **kwargs) -> Any:
+        if isinstance(inputs, str):
+            inputs = self.__governor.fit(self.__name, inputs)
+        else:
+            inputs = self.__governor.fit_many(self.__name, inputs)
+        return self.__pipeline(inputs, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.__pipeline, attr)
+
+
+class InputGovernor:
+    """
+    Measure the size of the texts sent to the models with their tokenizer and
+    cut the texts longer than the token budget of the model. The head strategy
+    keeps the beginning of the text, the window strategy keeps its beginning and
+    its end. The tokenizer of a model is the one of its registered pipeline,
+    the worker pipelines load theirs in the bot process.
+    """
+
+    def __init__(self, budgets: Dict[str, int] = None, strategy: str = "window") -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy}, expected one of {STRATEGIES}.")
+        for name, budget in (budgets or {}).items():
+            if budget < 1:
+                raise ValueError(f"The budget of {name} must be at least one token.")
+        self.strategy = strategy
+        self.__budgets = dict(budgets or {})
+        self.__pipelines = dict()  # Type: dict[str, pipeline]
+        self.__tokenizers = dict()  # Type: dict[str, PreTrainedTokenizer]
+        self.__stats = dict()  # Type: dict[str, InputStats]
+        self.__lock = threading.Lock()
+
+    def register(self, name: str, pipeline) -> None:
+        """Register the pipeline of the model, its tokenizer measures the texts."""
+        self.__pipelines[name] = pipeline
+
+    def wrap(self, name: str, pipeline) -> GovernedPipeline:
+        """Returns the pipeline with its inputs fitted to the budget of the model."""
+        self.register(name, pipeline)
+        return GovernedPipeline(self, name, pipeline)
+
+    def get_tokenizer(self, name: str):
+        """Returns the tokenizer of the pipeline of the model, it is loaded if needed."""
+        tokenizer = self.__tokenizers.get(name)
+        if tokenizer is not None:
+            return tokenizer
+        # the model may be loaded with its tokenizer, the other models are not blocked meanwhile
+        tokenizer = self.__pipelines[name].tokenizer
+        with self.__lock:
+            if name not in self.__tokenizers:
+                self.__stats[name] = InputStats()
+                if name not in self.__budgets:
+                    # the special tokens are added by the pipeline
+                    max_length = min(tokenizer.model_max_length, 512)
+                    self.__budgets[name] = max_length - tokenizer.num_special_tokens_to_add()
+                # published last, the budget and the stats are set once it is seen
+                self.__tokenizers[name] = tokenizer
+            return self.__tokenizers[name]
+
+    def get_budget(self, name: str) -> int:
+        """Returns the token budget of the model."""
+        self.get_tokenizer(name)
+        return self.__budgets[name]
+
+    def fit(self, name: str, text: str) -> str:
+        """Returns the text cut to the token budget of the model."""
+        tokenizer = self.get_tokenizer(name)
+        budget = self.__budgets[name]
+        encoding = tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=tokenizer.is_fast
+        )
+        ids = encoding["input_ids"]
+        # the pipelines run in several threads
+        with self.__lock:
+            self.__stats[name].record(len(ids), len(ids) > budget)
+        if len(ids) <= budget:
+            return text
+
+        if self.strategy == "head" or budget < 2:
+            # a window needs a token on each side
+            head, tail = budget, 0
+        else:
+            # one token for the space between the windows
+            head = budget // 2
+            tail = budget - head - 1
+        if tokenizer.is_fast:
+            # keep the original text between the offsets of the kept tokens
+            offsets = encoding["offset_mapping"]
+            res = text[: offsets[head - 1][1]]
+            if tail:
+                res += " " + text[offsets[len(ids) - tail][0] :]
+            return res
+        res = tokenizer.decode(ids[:head])
+        if tail:
+            res += " " + tokenizer.decode(ids[-tail:])
+        return res
+
+    def fit_many(self, name: str, texts: List[str]) -> List[str]:
+        """Returns the texts cut to the token budget of the model."""
+        return [self.fit(name, text) for text in texts]
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the input size histogram of each model."""
+        with self.__lock:
+            return {
+                name: stats.to_dict(self.__budgets[name])
+                for name, stats in self.__stats.items()
+            }
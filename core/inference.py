@@ -0,0 +1,223 @@
+import asyncio
+import threading
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+from core.executor import PriorityExecutor, BACKGROUND, current_lane
+
+
+class BatchStats:
+    """Throughput counters of one scheduled pipeline."""
+
+    def __init__(self) -> None:
+        self.texts = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.busy_time = 0.0
+        # batches of one text, the cost of the old per-message path
+        self.single_batches = 0
+        self.single_time = 0.0
+
+    def record(self, size: int, elapsed: float) -> None:
+        """Record a processed batch of the specified size."""
+        self.texts += size
+        self.batches += 1
+        self.max_batch = max(self.max_batch, size)
+        self.busy_time += elapsed
+        if size == 1:
+            self.single_batches += 1
+            self.single_time += elapsed
+
+    def to_dict(self) -> Dict[str, float]:
+        """Returns the counters and the throughput gain as a dict."""
+        res = {
+            "texts": self.texts,
+            "batches": self.batches,
+            "max_batch": self.max_batch,
+            "mean_batch": self.texts / self.batches if self.batches else 0,
+            "saved_calls": self.texts - self.batches,
+            "texts_per_sec": self.texts / self.busy_time if self.busy_time else 0,
+            "speedup": 1.0,
+        }
+        # compare the cost per text with the cost of a lonely text
+        batched_texts = self.texts - self.single_batches
+        batched_time = self.busy_time - self.single_time
+        if self.single_batches and batched_texts and batched_time > 0:
+            single_cost = self.single_time / self.single_batches
+            res["speedup"] = single_cost / (batched_time / batched_texts)
+        return res
+
+
+class ScheduledPipeline:
+    """
+    Drop-in replacement of a pipeline which sends the single text calls
+    through the inference scheduler, in the lane of the calling job. Lists of
+    texts are already batches and are given to the pipeline as is.
+    """
+
+    def __init__(self, scheduler: "InferenceScheduler", name: str, pipeline) -> None:
+        self.__scheduler = scheduler
+        self.__name = name
+        self.__pipeline = pipeline
+
+    def __call__(self, inputs, **kwargs) -> Any:
+        if isinstance(inputs, str):
+            return self.__scheduler.call(
+                self.__name, inputs, lane=current_lane(), **kwargs
+            )
+        return self.__pipeline(inputs, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        # expose the tokenizer, the model, etc.
+        return getattr(self.__pipeline, attr)
+
+
+class InferenceScheduler:
+    """
+    Queue the texts sent to each pipeline and process them as batches.
+    A queue is flushed when it reaches max_batch_size texts or when its
+    oldest text has waited max_wait_ms milliseconds. The texts of each lane
+    have their own queues and the batches of the interactive lane are run
+    first, like the jobs of the PriorityExecutor. With parallel, each pipeline
+    has its own dispatch thread, so the pipelines running in different worker
+    processes process their batches at the same time.
+    """
+
+    def __init__(
+        self, max_batch_size: int = 16, max_wait_ms: float = 20, parallel: bool = False
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.parallel = parallel
+        self.__pipelines = dict()  # Type: dict[str, pipeline]
+        self.__stats = dict()  # Type: dict[str, BatchStats]
+        # pending texts by (name, lane, kwargs)
+        self.__queues = dict()  # Type: dict[tuple, list[tuple[str, Future]]]
+        self.__timers = dict()  # Type: dict[tuple, TimerHandle]
+        # one thread is enough when torch runs in the bot: it already uses all the cores
+        self.__executor = PriorityExecutor(max_workers=1)
+        # the dispatch thread of each pipeline
+        self.__executors = dict()  # Type: dict[str, PriorityExecutor]
+        self.__loop = None
+        self.__loop_thread = None
+
+    def register(self, name: str, pipeline) -> ScheduledPipeline:
+        """Register a pipeline and returns its scheduled version."""
+        self.__pipelines[name] = pipeline
+        self.__stats[name] = BatchStats()
+        self.__executors[name] = (
+            PriorityExecutor(max_workers=1) if self.parallel else self.__executor
+        )
+        return ScheduledPipeline(self, name, pipeline)
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Bind the scheduler to the event loop which flushes the queues."""
+        self.__loop = loop
+        self.__loop_thread = threading.get_ident()
+
+    def shutdown(self) -> None:
+        """Stop the scheduler, pending texts are cancelled."""
+        for timer in self.__timers.values():
+            timer.cancel()
+        self.__timers.clear()
+        for queue in self.__queues.values():
+            for _, future in queue:
+                future.cancel()
+        self.__queues.clear()
+        self.__executor.shutdown(cancel_futures=True)
+        for executor in self.__executors.values():
+            if executor is not self.__executor:
+                executor.shutdown(cancel_futures=True)
+        self.__loop = None
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the throughput counters of each pipeline."""
+        return {name: stats.to_dict() for name, stats in self.__stats.items()}
+
+    # Submit ------------------------------------
+
+    async def submit(
+        self, name: str, text: str, lane: str = BACKGROUND, **kwargs
+    ) -> Any:
+        """
+        Queue the text for the pipeline in the lane and wait for its result.
+        The result has the same format as pipeline(text, **kwargs).
+        """
+        loop = asyncio.get_running_loop()
+        key = (name, lane, tuple(sorted(kwargs.items())))
+        future = loop.create_future()
+        queue = self.__queues.setdefault(key, [])
+        queue.append((text, future))
+        if len(queue) >= self.max_batch_size:
+            self.__flush(key)
+        elif key not in self.__timers:
+            self.__timers[key] = loop.call_later(self.max_wait, self.__flush, key)
+        return await future
+
+    def call(self, name: str, text: str, lane: str = BACKGROUND, **kwargs) -> Any:
+        """
+        Blocking version of submit, to use from a worker thread.
+        The pipeline is called directly if the scheduler is not running.
+        """
+        loop = self.__loop
+        if (
+            loop is None
+            or loop.is_closed()
+            or threading.get_ident() == self.__loop_thread
+        ):
+            return self.__pipelines[name](text, **kwargs)
+        future = asyncio.run_coroutine_threadsafe(
+            self.submit(name, text, lane, **kwargs), loop
+        )
+        return future.result()
+
+    # Flush -------------------------------------
+
+    def __flush(self, key: Tuple) -> None:
+        """Send the pending texts of the queue as one batch."""
+        timer = self.__timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        queue = self.__queues.pop(key, [])
+        if not queue:
+            return
+        name, lane, kwargs = key
+        texts = [text for text, _ in queue]
+        task = asyncio.wrap_future(
+            self.__executors[name].submit(
+                self.__run_batch, name, texts, dict(kwargs), lane=lane
+            )
+        )
+        task.add_done_callback(lambda t: self.__dispatch(t, queue))
+
+    def __run_batch(self, name: str, texts: List[str], kwargs: Dict) -> List[Any]:
+        """Run the pipeline on the unique texts of the batch."""
+        unique = list(dict.fromkeys(texts))
+        # without batch_size, a pipeline runs the texts of a list one by one
+        kwargs.setdefault("batch_size", len(unique))
+        start = perf_counter()
+        outputs = self.__pipelines[name](unique, **kwargs)
+        self.__stats[name].record(len(unique), perf_counter() - start)
+        # a pipeline called on a single text wraps a dict result in a list
+        by_text = {
+            text: [out] if isinstance(out, dict) else out
+            for text, out in zip(unique, outputs)
+        }
+        return [by_text[text] for text in texts]
+
+    @staticmethod
+    def __dispatch(task: asyncio.Future, queue: List) -> None:
+        """Resolve the future of each text in the batch."""
+        if task.cancelled():
+            for _, future in queue:
+                future.cancel()
+            return
+        error = task.exception()
+        results = task.result() if error is None else [None] * len(queue)
+        for (_, future), result in zip(queue, results):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
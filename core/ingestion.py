@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class IngestionQueue:
+    """
+    Bound the number of messages waiting for their analysis. Under the high
+    watermark every message is analyzed. Above it, the messages of each channel
+    are sampled at a rate which decreases with each message of the channel, so
+    the busiest channels get the lowest rates. The rates go back up once the
+    queue is drained. A message sampled at the rate r gets the weight 1 / r, so
+    the weighted aggregates stay unbiased. The decision is taken once by
+    message, the first listener which asks takes it and the others get the
+    same weight.
+    """
+
+    DECREASE = 0.9
+    INCREASE = 0.05
+    # the number of recent decisions kept for the other listeners
+    MAX_DECISIONS = 10000
+
+    def __init__(
+        self, max_size: int = 2000, high_watermark: float = 0.5, min_rate: float = 0.01
+    ) -> None:
+        self.max_size = max_size
+        self.high_watermark = high_watermark
+        self.min_rate = min_rate
+        self.pending = 0
+        self.__rates = dict()  # Type: dict[tuple[int, int], float]
+        self.__received = 0
+        self.__dropped = 0
+        # moving average of the drop rate over the last messages
+        self.__recent_drop_rate = 0.0
+        # the weight given to the last messages, by message ID
+        self.__decisions = OrderedDict()  # Type: OrderedDict[int, Optional[float]]
+
+    @staticmethod
+    def __draw(message_id: int) -> float:
+        """
+        Returns a number in [0, 1) derived from the message ID, every listener
+        makes the same choice for a message.
+        """
+        return (message_id * 2654435761) % 2**32 / 2**32
+
+    def get_rate(self, guild_id: int, channel_id: int) -> float:
+        """Returns the current sampling rate of the channel."""
+        return self.__rates.get((guild_id, channel_id), 1.0)
+
+    def sample(self, guild_id: int, channel_id: int, message_id: int) -> Optional[float]:
+        """
+        Returns the weight of the message if it is sampled, or None. The weight
+        is the one given by admit, no place is reserved.
+        """
+        if message_id in self.__decisions:
+            return self.__decisions[message_id]
+        return self.__decide(guild_id, channel_id, message_id)
+
+    def admit(self, guild_id: int, channel_id: int, message_id: int) -> Optional[float]:
+        """
+        Reserve a place for the message if it is sampled. Returns its weight,
+        or None if it is dropped. The place must be given back with release
+        once the message is analyzed.
+        """
+        weight = self.sample(guild_id, channel_id, message_id)
+        if weight is not None:
+            self.pending += 1
+        return weight
+
+    def __decide(self, guild_id: int, channel_id: int, message_id: int) -> Optional[float]:
+        """
+        Adapt the rate of the channel to the load and returns the weight of the
+        message if it is sampled, or None. The decision is kept for the other
+        listeners.
+        """
+        key = (guild_id, channel_id)
+        rate = self.get_rate(guild_id, channel_id)
+        if self.pending >= self.high_watermark * self.max_size:
+            rate = max(self.min_rate, rate * self.DECREASE)
+        else:
+            rate = min(1.0, rate + self.INCREASE)
+        if rate < 1.0:
+            self.__rates[key] = rate
+        else:
+            self.__rates.pop(key, None)
+
+        weight = None
+        if self.__draw(message_id) < rate and self.pending < self.max_size:
+            weight = 1 / rate
+
+        self.__received += 1
+        dropped = weight is None
+        self.__dropped += dropped
+        self.__recent_drop_rate = 0.99 * self.__recent_drop_rate + 0.01 * dropped
+        self.__decisions[message_id] = weight
+        if len(self.__decisions) > self.MAX_DECISIONS:
+            self.__decisions.popitem(last=False)
+        return weight
+
+    def release(self, count: int = 1) -> None:
+        """Give back the places of analyzed messages."""
+        self.pending = max(self.pending - count, 0)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the queue size and the drop counters."""
+        return {
+            "pending": self.pending,
+            "max_size": self.max_size,
+            "received": self.__received,
+            "dropped": self.__dropped,
+            "drop_rate": self.__dropped / self.__received if self.__received else 0.0,
+            "recent_drop_rate": self.__recent_drop_rate,
+            "sampled_channels": len(self.__rates),
+            "lowest_rate": min(self.__rates.values(), default=1.0),
+        }
@@ -0,0 +1,169 @@
+import os
+import resource
+import threading
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple
+
+from core.backends import BACKENDS, create_pipeline
+from core.translate import Translator
+
+
+class ModelSpec(NamedTuple):
+    task: str
+    model: str
+    extension: str  # the extension which uses the model
+    backend: str = "torch"  # one of core.backends.BACKENDS
+
+
+MODEL_SPECS = {
+    "translation": ModelSpec("translation", Translator.MODEL, "ext.moods"),
+    "summary": ModelSpec(
+        "summarization", "moussaKam/mbarthez-dialogue-summarization", "ext.summary"
+    ),
+    "topics": ModelSpec(
+        "text-classification",
+        "lincoln/flaubert-mlsum-topic-classification",
+        "ext.summary",
+    ),
+    "mood": ModelSpec(
+        "text-classification",
+        "botdevringring/fr-naxai-ai-emotion-classification-081808122023",
+        "ext.moods",
+    ),
+    "sentiment": ModelSpec(
+        "text-classification",
+        "citizenlab/twitter-xlm-roberta-base-sentiment-finetunned",
+        "ext.moods",
+    ),
+    "mbti": ModelSpec(
+        "text-classification",
+        "JanSt/albert-base-v2_mbti-classification",
+        "ext.moods",
+    ),
+}
+
+
+def get_model_specs(backends: Dict[str, str]) -> Dict[str, ModelSpec]:
+    """Returns the model specs with the backend chosen for each model."""
+    for name, backend in backends.items():
+        if name not in MODEL_SPECS:
+            raise ValueError(f"Unknown model {name}.")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend} for the model {name}.")
+    return {
+        name: spec._replace(backend=backends.get(name, spec.backend))
+        for name, spec in MODEL_SPECS.items()
+    }
+
+
+def get_rss() -> int:
+    """Returns the resident memory of the process in bytes."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # peak memory in KiB, the best we have outside of Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelDisabledError(Exception):
+    """Raised when a disabled model is used."""
+
+
+class LazyPipeline:
+    """A pipeline which is loaded by the registry the first time it is used."""
+
+    def __init__(self, registry: "ModelRegistry", name: str) -> None:
+        self.__registry = registry
+        self.__name = name
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.__registry.get(self.__name)(*args, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.__registry.get(self.__name), attr)
+
+
+class ModelRegistry:
+    """
+    Load the pipelines on demand and keep track of their cost.
+    The load time and the resident memory used by each model are recorded.
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, ModelSpec] = MODEL_SPECS,
+        disabled: Iterable[str] = (),
+        factory: Callable = None,
+    ) -> None:
+        self.__specs = specs
+        self.__disabled = set(disabled)
+        self.__factory = factory or (
+            lambda spec: create_pipeline(spec.task, spec.model, spec.backend)
+        )
+        self.__pipelines = dict()  # Type: dict[str, pipeline]
+        self.__stats = dict()  # Type: dict[str, dict[str, float]]
+        # models are loaded one at a time to measure their memory
+        self.__lock = threading.Lock()
+
+    def is_enabled(self, name: str) -> bool:
+        """Returns True if the model can be loaded."""
+        return name in self.__specs and name not in self.__disabled
+
+    def is_loaded(self, name: str) -> bool:
+        """Returns True if the model is in memory."""
+        return name in self.__pipelines
+
+    def get(self, name: str):
+        """Returns the pipeline of the model, it is loaded if needed."""
+        res = self.__pipelines.get(name)
+        if res is not None:
+            return res
+        if not self.is_enabled(name):
+            raise ModelDisabledError(f"The model {name} is disabled.")
+        with self.__lock:
+            if name not in self.__pipelines:
+                rss = get_rss()
+                start = perf_counter()
+                self.__pipelines[name] = self.__factory(self.__specs[name])
+                self.__stats[name] = {
+                    "load_time": perf_counter() - start,
+                    "memory_mb": max(get_rss() - rss, 0) / 2**20,
+                }
+            return self.__pipelines[name]
+
+    def lazy(self, name: str) -> LazyPipeline:
+        """Returns a pipeline which loads the model the first time it is used."""
+        return LazyPipeline(self, name)
+
+    def release(self, name: str) -> None:
+        """Forget the pipeline of the model to free its memory."""
+        with self.__lock:
+            self.__pipelines.pop(name, None)
+
+    def get_models_for(self, extensions: Iterable[str]) -> List[str]:
+        """Returns the enabled models used by the specified extensions."""
+        extensions = set(extensions)
+        return [
+            name
+            for name, spec in self.__specs.items()
+            if spec.extension in extensions and self.is_enabled(name)
+        ]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the state, the load time and the memory of each model."""
+        res = dict()
+        for name in self.__specs:
+            if not self.is_enabled(name):
+                state = "disabled"
+            elif self.is_loaded(name):
+                state = "loaded"
+            else:
+                state = "lazy"
+            res[name] = {
+                "state": state,
+                "backend": self.__specs[name].backend,
+                **self.__stats.get(name, {}),
+            }
+        return res
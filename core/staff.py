@@ -59,6 +59,31 @@ class StaffCog(commands.Cog, name="Outils développeurs"):
             traceback.print_exc()
             await ctx.reply("Impossible de recharger les extensions :sob: !")
 
+    @commands.command(brief="Affiche les compteurs de performance.")
+    async def perf(self, ctx: commands.Context):
+        """
+        Tout ce qu'il faut savoir pour voir si je tiens le choc : taille des batchs, \
+        débit et plein d'autres chiffres passionnants !
+        """
+        lines = []
+        for section, counters in self.bot.get_performance_report().items():
+            values = ", ".join(
+                f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+                for name, value in counters.items()
+            )
+            lines.append(f"**{section}** : {values}")
+        if not lines:
+            await ctx.reply("Aucunes données :sob:.")
+            return
+        # discord messages are limited to 2000 characters
+        text = ""
+        for line in lines:
+            if len(text) + len(line) + 1 > 2000:
+                await ctx.reply(text)
+                text = ""
+            text += line + "\n"
+        await ctx.reply(text)
+
     @commands.command(brief="Bye !")
     async def bye(self, ctx: commands.Context):
         """
@@ -1,10 +1,82 @@
-from transformers import pipeline
+import threading
+from collections import OrderedDict
+from typing import List
+
+from core.backends import create_pipeline
+from core.cache import normalize_text
 
 
 class Translator:
-    def __init__(self) -> None:
-        self.pipeline = pipeline("translation", model="Helsinki-NLP/opus-mt-fr-en")
-    
+    MODEL = "Helsinki-NLP/opus-mt-fr-en"
+
+    def __init__(
+        self,
+        pipeline_translation=None,
+        max_memo: int = 10000,
+        batch_size: int = 16,
+        backend: str = "torch",
+    ) -> None:
+        if pipeline_translation is None:
+            pipeline_translation = create_pipeline("translation", self.MODEL, backend)
+        self.pipeline = pipeline_translation
+        self.max_memo = max_memo
+        self.batch_size = batch_size
+        # translations by normalized text, the oldest are evicted first
+        self.__memo = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __get_memo(self, key: str):
+        """Returns the memoized translation or None."""
+        with self.__lock:
+            res = self.__memo.get(key)
+            if res is not None:
+                self.__memo.move_to_end(key)
+            return res
+
+    def __set_memo(self, key: str, translation: str) -> None:
+        """Memoize the translation and evict the least recently used ones."""
+        with self.__lock:
+            self.__memo[key] = translation
+            self.__memo.move_to_end(key)
+            while len(self.__memo) > self.max_memo:
+                self.__memo.popitem(last=False)
+
     def translate_to_en(self, text):
         """Translate the text in english and return the result"""
-        return self.pipeline(text)[0]["translation_text"]
\ No newline at end of file
+        key = normalize_text(text)
+        res = self.__get_memo(key)
+        if res is None:
+            # the normalized text is only the key of the memo
+            res = self.pipeline(text)[0]["translation_text"]
+            self.__set_memo(key, res)
+        return res
+
+    def translate_many(self, texts: List[str]) -> List[str]:
+        """
+        Translate the texts in english and return the results in the same order.
+        The texts are sent by batches of similar length to limit the padding.
+        """
+        keys = [normalize_text(text) for text in texts]
+        # the first text of each normalized text is translated
+        originals = dict()
+        for key, text in zip(keys, texts):
+            originals.setdefault(key, text)
+        missing = [key for key in originals if self.__get_memo(key) is None]
+        missing.sort(key=lambda key: len(originals[key]))
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i : i + self.batch_size]
+            outputs = self.pipeline(
+                [originals[key] for key in batch], batch_size=len(batch)
+            )
+            for key, output in zip(batch, outputs):
+                if isinstance(output, list):
+                    output = output[0]
+                self.__set_memo(key, output["translation_text"])
+        # the memo is large enough for a batch, unless max_memo is tiny
+        res = []
+        for key, text in zip(keys, texts):
+            translation = self.__get_memo(key)
+            if translation is None:
+                translation = self.translate_to_en(text)
+            res.append(translation)
+        return res
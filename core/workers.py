@@ -0,0 +1,168 @@
+import os
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+from transformers import AutoTokenizer
+
+from core.models import MODEL_SPECS, ModelRegistry, ModelSpec
+
+# The registry of the worker process, models are loaded once per worker
+_worker_registry = None
+
+
+def _init_worker(
+    specs: Dict[str, ModelSpec], disabled: List[str], factory: Callable, threads: int
+) -> None:
+    """Initialize a worker process."""
+    global _worker_registry
+    _worker_registry = ModelRegistry(specs, disabled, factory)
+    try:
+        import torch
+
+        # share the cores between the workers
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _load(name: str) -> Dict[str, Any]:
+    """Load the model in the worker process and returns its stats."""
+    _worker_registry.get(name)
+    return _worker_registry.get_stats()[name]
+
+
+def _run(name: str, inputs: Any, kwargs: Dict[str, Any]) -> Any:
+    """Run the pipeline in the worker process."""
+    return _worker_registry.get(name)(inputs, **kwargs)
+
+
+class RemotePipeline:
+    """
+    A pipeline running in a worker process of the pool. Its tokenizer is
+    loaded in the bot process, the model stays in the worker.
+    """
+
+    def __init__(self, pool: "WorkerPool", name: str) -> None:
+        self.__pool = pool
+        self.__name = name
+
+    def __call__(self, inputs, **kwargs) -> Any:
+        return self.__pool.call(self.__name, inputs, **kwargs)
+
+    @property
+    def tokenizer(self):
+        return self.__pool.get_tokenizer(self.__name)
+
+    def __getattr__(self, attr: str) -> Any:
+        raise AttributeError(
+            f"The pipeline {self.__name} runs in a worker process, it has no {attr} here."
+        )
+
+
+class WorkerPool:
+    """
+    Run the pipelines in dedicated processes to keep the GIL of the bot free.
+    Each model is assigned to one worker, so it is loaded only once and the
+    workers run different models in parallel. Texts and results are sent
+    through the pipes of the process pool.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        specs: Dict[str, ModelSpec] = MODEL_SPECS,
+        disabled: Iterable[str] = (),
+        factory: Callable = None,
+        tokenizer_factory: Callable = None,
+    ) -> None:
+        self.__names = list(specs)
+        self.__specs = specs
+        self.__disabled = set(disabled)
+        self.__stats = dict()  # Type: dict[str, dict[str, Any]]
+        # the models which have run in their worker
+        self.__loaded = set()  # Type: set[str]
+        self.__tokenizer_factory = tokenizer_factory or (
+            lambda spec: AutoTokenizer.from_pretrained(spec.model)
+        )
+        self.__tokenizers = dict()  # Type: dict[str, PreTrainedTokenizer]
+        self.__lock = threading.Lock()
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # torch and the event loop don't survive a fork
+        context = multiprocessing.get_context("spawn")
+        self.__executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(specs, list(disabled), factory, threads),
+            )
+            for _ in range(workers)
+        ]
+
+    def __get_executor(self, name: str) -> ProcessPoolExecutor:
+        """Returns the executor of the worker which owns the model."""
+        index = self.__names.index(name) % len(self.__executors)
+        return self.__executors[index]
+
+    def submit(self, name: str, inputs: Any, **kwargs) -> Future:
+        """Run the pipeline on the inputs in its worker."""
+        def mark_loaded(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self.__loaded.add(name)
+
+        future = self.__get_executor(name).submit(_run, name, inputs, kwargs)
+        future.add_done_callback(mark_loaded)
+        return future
+
+    def call(self, name: str, inputs: Any, **kwargs) -> Any:
+        """Run the pipeline on the inputs in its worker and wait for the result."""
+        return self.submit(name, inputs, **kwargs).result()
+
+    def preload(self, name: str) -> Future:
+        """Load the model in its worker."""
+        def save_stats(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self.__stats[name] = future.result()
+                self.__loaded.add(name)
+
+        future = self.__get_executor(name).submit(_load, name)
+        future.add_done_callback(save_stats)
+        return future
+
+    def get_tokenizer(self, name: str):
+        """Returns the tokenizer of the model in the bot process, it is loaded if needed."""
+        with self.__lock:
+            if name not in self.__tokenizers:
+                self.__tokenizers[name] = self.__tokenizer_factory(self.__specs[name])
+            return self.__tokenizers[name]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the state of each model in the workers, with the load time and
+        the memory of the preloaded ones.
+        """
+        res = dict()
+        for name, spec in self.__specs.items():
+            if name in self.__disabled:
+                state = "disabled"
+            elif name in self.__loaded:
+                state = "loaded"
+            else:
+                state = "lazy"
+            res[name] = {
+                "backend": spec.backend,
+                **self.__stats.get(name, {}),
+                "state": state,
+            }
+        return res
+
+    def remote(self, name: str) -> RemotePipeline:
+        """Returns a pipeline which runs in the worker of the model."""
+        return RemotePipeline(self, name)
+
+    def shutdown(self) -> None:
+        """Stop the workers."""
+        for executor in self.__executors:
+            executor.shutdown(cancel_futures=True)
@@ -10,6 +10,7 @@ from discord import Message
 from discord.ext import tasks, commands
 from util.socialgraph import SocialGraph
 from util.ascii import AsciiHelper
+from core.executor import INTERACTIVE
 
 
 class CommunityCog(commands.Cog, name="Communauté"):
@@ -100,6 +101,13 @@ class CommunityCog(commands.Cog, name="Communauté"):
         if not self.bot.auth_manager.is_allowed(message.author.id):
             return
 
+        # the same sampling decision as the other listeners when the bot is overloaded
+        sample_weight = self.bot.ingestion.sample(
+            message.guild.id, message.channel.id, message.id
+        )
+        if sample_weight is None:
+            return
+
         socialgraph = self.get_graph(message.guild.id)
 
         # direct mention
@@ -137,7 +145,7 @@ class CommunityCog(commands.Cog, name="Communauté"):
             if len(others_msgs) == 10:
                 break
 
-        socialgraph.handle_message(msg_data, others_msgs)
+        socialgraph.handle_message(msg_data, others_msgs, sample_weight)
 
     # ----------
     # Commands
@@ -261,7 +269,7 @@ class CommunityCog(commands.Cog, name="Communauté"):
 
         # get the path
         path = await self.bot.run_in_thread(
-            socialgraph.get_social_path, user_src.id, user_dst.id
+            socialgraph.get_social_path, user_src.id, user_dst.id, lane=INTERACTIVE
         )
 
         if len(path) == 0:
@@ -1,6 +1,7 @@
 import asyncio
 import random
 import sys
+import traceback
 
 import discord
 from discord.ext import commands, tasks
@@ -9,8 +10,10 @@ from datetime import datetime
 from typing import List
 
 from core import Convolyzer
+from core.executor import INTERACTIVE
 from util.mbti import GuildMBTI
 from util.moods import GuildMoods
+from util.prefilter import MessagePrefilter, Verdict
 from util.chart import ChartHelper
 from util.ascii import AsciiHelper
 
@@ -52,7 +55,10 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
         self.bot = bot
         self.__guild_mood_map = {}  # Type: dict[int, GuildMoods]
         self.__guild_mbti_map = {}  # Type: dict[int, GuildMBTI]
+        # messages waiting for the MBTI ingestion, by guild
+        self.__mbti_backlog = {}  # Type: dict[int, list[tuple[int, str]]]
         self.ascii_helper = AsciiHelper()  # Type: AsciiHelper
+        self.prefilter = MessagePrefilter(self.bot.result_cache)  # Type: MessagePrefilter
         self.chart_helper = ChartHelper()  # Type: ChartHelper
         self.ctx_menu_mbti = app_commands.ContextMenu(
             name="Affiche le type MBTI", callback=self.mbti_from_message
@@ -104,6 +110,10 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
             "ENTJ": "darkgreen",
         }
 
+        # Start timers
+        self.cleaner.start()
+        self.mbti_ingester.start()
+
     async def cog_unload(self) -> None:
         """
         Unloads the cog by removing the context menu commands from the bot's command tree.
@@ -117,9 +127,21 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
         self.bot.tree.remove_command(
             self.ctx_menu_sentiment.name, type=self.ctx_menu_sentiment.type
         )
+        self.cleaner.cancel()
+        self.mbti_ingester.cancel()
+        # give back the places of the messages which will never be ingested
+        for messages in self.__mbti_backlog.values():
+            self.bot.ingestion.release(len(messages))
+        self.__mbti_backlog.clear()
 
     # Utilities ---------------------------------
 
+    def get_performance_stats(self) -> dict:
+        """
+        Returns the counters of the message prefilter for the perf command.
+        """
+        return {"prefilter": self.prefilter.get_stats()}
+
     def get_guild_moods(self, guild: Guild) -> GuildMoods:
         """
         Retrieves or initializes the GuildMoods instance for the given guild.
@@ -136,7 +158,12 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
 
         pipeline_mood = self.bot.pipeline_mood
         pipeline_positivity = self.bot.pipeline_sentiment
-        guild_moods = GuildMoods(pipeline_mood, pipeline_positivity)
+        guild_moods = GuildMoods(
+            pipeline_mood,
+            pipeline_positivity,
+            self.bot.result_cache,
+            self.bot.config.get_moods_retention(),
+        )
         self.__guild_mood_map[guild_id] = guild_moods
         return guild_moods
 
@@ -156,7 +183,7 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
 
         pipeline_mbti = self.bot.pipeline_mbti
         translator = self.bot.translator
-        guild_mbti = GuildMBTI(pipeline_mbti, translator)
+        guild_mbti = GuildMBTI(pipeline_mbti, translator, self.bot.result_cache)
         self.__guild_mbti_map[guild_id] = guild_mbti
         return guild_mbti
 
@@ -233,13 +260,47 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
     @tasks.loop(minutes=10)
     async def cleaner(self):
         """
-        Periodically cleans mood data for all guilds by invoking the garbage collector.
+        Periodically cleans mood data for all guilds by invoking the garbage collector,
+        which drops the expired hourly buckets.
         """
         futures = []
         for guild in self.__guild_mood_map.values():
             futures.append(self.bot.run_in_thread(guild.garbage_collector))
         await asyncio.gather(*futures)
 
+    @tasks.loop(seconds=5)
+    async def mbti_ingester(self):
+        """
+        Periodically classifies the pending messages of each guild as one batch,
+        the translations and the MBTI classifications are batched together.
+        """
+        backlog, self.__mbti_backlog = self.__mbti_backlog, {}
+        for guild_id, messages in backlog.items():
+            mbti_instance = self.__guild_mbti_map[guild_id]
+            try:
+                await self.bot.run_in_thread(
+                    mbti_instance.handle_messages,
+                    [(user_id, content) for user_id, content, _ in messages],
+                    [weight for _, _, weight in messages],
+                )
+            except Exception:
+                # the batch of this guild is lost, the other guilds are still ingested
+                traceback.print_exc()
+            finally:
+                self.bot.ingestion.release(len(messages))
+
+    @mbti_ingester.error
+    async def mbti_ingester_error(self, error: BaseException) -> None:
+        """
+        Restarts the MBTI ingestion after an unexpected error, so the backlog
+        keeps being ingested and its places released.
+
+        Args:
+            error (BaseException): The error which stopped the loop.
+        """
+        traceback.print_exception(type(error), error, error.__traceback__)
+        self.mbti_ingester.restart()
+
     @commands.Cog.listener()
     async def on_message(self, message) -> None:
         """
@@ -254,28 +315,94 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
         if not self.bot.auth_manager.is_allowed(message.author.id):
             return
 
-        # List of special characters
-        special_characters = "!@#$%^&*()-_+=[]{}|;:',.<>?"
-
-        # Check if the message starts with any special character
-        if message.content.startswith(tuple(special_characters)):
+        # Skip the commands, the links, the emojis only messages, etc.
+        result = self.prefilter.classify(message.content)
+        if result.verdict == Verdict.SKIP:
             return
 
         guild = message.guild
-        if guild:
+        if guild and result.verdict == Verdict.ESTIMATE:
+            # a short message, the lexicon is enough
+            moods_instance = self.get_guild_moods(guild)
+            moods_instance.add_estimate(
+                message.author.id, result.estimate, message.id, datetime.now()
+            )
+        elif guild:
+            # the message is sampled when too many messages wait for their analysis
+            weight = self.bot.ingestion.admit(guild.id, message.channel.id, message.id)
+            if weight is None:
+                return
+
             moods_instance = self.get_guild_moods(guild)
             mbti_instance = self.get_guild_mbti(guild)
 
-            await self.bot.run_in_thread(
-                moods_instance.handle_message,
-                message.author.id,
-                message.content,
-                message.id,
-                datetime.now(),
+            try:
+                await self.bot.run_in_thread(
+                    moods_instance.handle_message,
+                    message.author.id,
+                    message.content,
+                    message.id,
+                    datetime.now(),
+                    weight,
+                )
+            except BaseException:
+                self.bot.ingestion.release()
+                raise
+            # the MBTI ingestion is batched by the mbti_ingester timer, the
+            # message leaves the ingestion queue once it is done
+            self.__mbti_backlog.setdefault(guild.id, []).append(
+                (message.author.id, message.content, weight)
+            )
+
+    @commands.Cog.listener()
+    async def on_message_edit(self, before: Message, after: Message) -> None:
+        """
+        Analyzes again an edited message which counts in the mood statistics.
+
+        Args:
+            before (Message): The message before the edit.
+            after (Message): The edited message.
+        """
+        # the embeds and the pins are edits too
+        if before.content == after.content:
+            return
+        if after.guild is None or after.guild.id not in self.__guild_mood_map:
+            return
+        moods_instance = self.__guild_mood_map[after.guild.id]
+        previous = moods_instance.get_message(after.id)
+        if previous is None:
+            return
+
+        # the edited message keeps its time and its weight
+        message = None
+        # the edit is not a new message for the prefilter counters
+        result = self.prefilter._classify(after.content)
+        if result.verdict == Verdict.ESTIMATE:
+            message = moods_instance.estimate_message(
+                result.estimate, after.id, previous.get_time(), previous.get_weight()
             )
-            await self.bot.run_in_thread(
-                mbti_instance.handle_message, message.author.id, message.content
+        elif result.verdict == Verdict.ANALYZE:
+            message = await self.bot.run_in_thread(
+                moods_instance.analyze_message,
+                after.content,
+                after.id,
+                previous.get_time(),
+                previous.get_weight(),
             )
+        # the previous analysis and the new one are swapped under the lock
+        moods_instance.replace_message(after.author.id, after.id, message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        """
+        Removes a deleted message from the mood statistics.
+
+        Args:
+            payload (RawMessageDeleteEvent): The deleted message.
+        """
+        moods_instance = self.__guild_mood_map.get(payload.guild_id)
+        if moods_instance:
+            moods_instance.remove_message(payload.message_id)
 
     # Commands ----------------------------------
 
@@ -551,7 +678,7 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
         guild_moods = self.get_guild_moods(message.guild)
 
         mood_score, mood_label = await self.bot.run_in_thread(
-            guild_moods.get_message_mood, message.id, message.content
+            guild_moods.get_message_mood, message.id, message.content, lane=INTERACTIVE
         )
 
         title = "Le score de {} pour ce [message]({}) est : ".format(
@@ -577,11 +704,14 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
         guild_moods = self.get_guild_moods(message.guild)
 
         positivity_score = await self.bot.run_in_thread(
-            guild_moods.get_message_positivity, message.id, message.content
+            guild_moods.get_message_positivity,
+            message.id,
+            message.content,
+            lane=INTERACTIVE,
         )
 
         pov_score = await self.bot.run_in_thread(
-            guild_moods.get_message_pov, message.id, message.content
+            guild_moods.get_message_pov, message.id, message.content, lane=INTERACTIVE
         )
 
         title_1 = "Le score de positivité pour ce [message]({}) est : ".format(
@@ -617,7 +747,7 @@ class MoodsCog(commands.Cog, name="Émotions et personnalités"):
         mbti_instance = self.get_guild_mbti(message.guild)
 
         mbti_result = await self.bot.run_in_thread(
-            mbti_instance.get_message_mbti, message.content
+            mbti_instance.get_message_mbti, message.content, lane=INTERACTIVE
         )
 
         dominant_type = max(mbti_result, key=mbti_result.get)
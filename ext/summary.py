@@ -1,9 +1,18 @@
 from discord.ext import commands, tasks
 from util.summary import Summarizer  # noqa
+from util.segmentation import ChatMessage
+from util.history import ChannelHistory
+from util.chunking import TokenChunker
+from util.progress import SharedProgress, ThrottledMessage
 from util.subject import Subjector
 from util.chart import ChartHelper  # noqa
 from core import Convolyzer  # noqa
+from core.executor import INTERACTIVE
 from discord import File, app_commands
+from collections import deque
+from functools import partial
+import asyncio
+from time import perf_counter
 import discord
 import sys
 
@@ -15,11 +24,28 @@ class SummaryCog(commands.Cog, name="Analyse de conversation"):
     Si tu n'es pas motivé, un petit résumé peut te simplifier la vie le soir, tu ne trouves pas ?
     """
 
+    # the number of messages read from the channel history
+    HISTORY_LIMIT = 100
+
     def __init__(self, bot: Convolyzer) -> None:
         # Setup utilities
         self.bot = bot
-        self.summarizer = Summarizer(bot.pipeline_summary, bot.pipeline_topics)
+        self.summarizer = Summarizer(
+            bot.pipeline_summary,
+            bot.pipeline_topics,
+            chunker_factory=self.__create_chunker,
+            extractive_tokens=bot.config.get_summary_extractive_tokens(),
+        )
         self.subjector = Subjector()
+        # the recent messages of the channels, so the commands rarely walk the API history
+        self.history = ChannelHistory()
+        # the most recent durations of the commands and of their steps, in seconds
+        self.latencies = {
+            step: deque(maxlen=100) for step in ("fetch", "analysis", "command")
+        }
+        # the running computations and the replies waiting for them, shared by the identical requests
+        self.pending = dict()  # Type: dict[tuple, tuple[asyncio.Task, SharedProgress]]
+        self.coalesced = 0
 
         self.sum_menu = app_commands.ContextMenu(
             name="Résumer à partir d'ici",
@@ -35,6 +61,31 @@ class SummaryCog(commands.Cog, name="Analyse de conversation"):
         await self.subjector.close()
         self.updater.stop()
 
+    # Events ------------------------------------
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        record = self.__to_record(message)
+        if record:
+            self.history.add(message.channel.id, record)
+
+    @commands.Cog.listener()
+    async def on_message_edit(self, before: discord.Message, after: discord.Message):
+        record = self.__to_record(after)
+        if record:
+            self.history.update(after.channel.id, record)
+        else:
+            self.history.remove(after.channel.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        self.history.remove(payload.channel_id, payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # the messages sent while the bot was disconnected are missing
+        self.history.clear()
+
     # Timers ------------------------------------
 
     @tasks.loop(minutes=30)
@@ -43,33 +94,135 @@ class SummaryCog(commands.Cog, name="Analyse de conversation"):
 
     # Utilities ---------------------------------
 
+    def __create_chunker(self, name: str) -> TokenChunker:
+        """Returns the chunker of the model, with its tokenizer and its budget."""
+        governor = self.bot.governor
+        return TokenChunker(
+            governor.get_tokenizer(name),
+            governor.get_budget(name),
+            overlap=self.bot.config.get_summary_overlap(),
+            approximate=self.bot.config.is_summary_approximate(),
+        )
+
+    def __to_record(self, msg: discord.Message):
+        """Returns the compact record of a message, None if it is ignored."""
+        prefix=self.bot.config.get_prefix()
+        if msg.author.bot or msg.content.startswith(prefix):
+            return None
+        # the replies and the mentions link the messages into threads
+        return ChatMessage(
+            msg.author.display_name,
+            msg.clean_content,
+            msg.created_at.timestamp(),
+            msg.id,
+            msg.reference.message_id if msg.reference else None,
+            tuple(member.display_name for member in msg.mentions),
+        )
+
     async def __fetch_messages(
-        self, channel: discord.TextChannel, target_message: discord.Message = None
+        self,
+        channel: discord.TextChannel,
+        target_message: discord.Message = None,
+        limit: int = HISTORY_LIMIT,
     ):
+        after = target_message.id if target_message else None
+        messages = self.history.get(channel.id, after, limit)
+        if messages is not None:
+            return messages
+
         messages = []
-        prefix=self.bot.config.get_prefix()
-        async for msg in channel.history(limit=100, after=target_message):
-            if not msg.author.bot and not msg.content.startswith(prefix):
-                t = (
-                    msg.author.display_name,
-                    msg.clean_content,
-                    msg.created_at.timestamp(),
-                    msg.id,
-                )
+        count, oldest = 0, None
+        async for msg in channel.history(limit=limit, after=target_message):
+            count += 1
+            oldest = msg
+            t = self.__to_record(msg)
+            if t:
                 messages.append(t)
+        if not target_message:
+            # the last messages of the channel, the live ones will follow them
+            since = oldest.id - 1 if count == limit else 0
+            self.history.backfill(channel.id, messages, since)
         return messages
 
+    async def __analyze(
+        self,
+        channel: discord.TextChannel,
+        target_message: discord.Message = None,
+        limit: int = HISTORY_LIMIT,
+    ):
+        """Fetch and cluster the messages once for the whole command."""
+        start = perf_counter()
+        messages = await self.__fetch_messages(channel, target_message, limit)
+        fetched = perf_counter()
+        analysis = await self.bot.run_in_thread(
+            self.summarizer.analyze, messages, channel.id, lane=INTERACTIVE
+        )
+        self.latencies["fetch"].append(fetched - start)
+        self.latencies["analysis"].append(perf_counter() - fetched)
+        return analysis
+
+    async def __coalesce(self, key: tuple, func, reply: ThrottledMessage):
+        """
+        Returns the result of the coroutine function, computed once for the
+        identical requests which arrive while it runs. func is called with the
+        function which edits the replies of all these requests.
+        """
+        pending = self.pending.get(key)
+        if pending is None:
+            progress = SharedProgress()
+            task = asyncio.ensure_future(func(progress.update))
+            self.pending[key] = task, progress
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        else:
+            task, progress = pending
+            self.coalesced += 1
+        progress.add(reply)
+        try:
+            # a cancelled request does not cancel the others
+            return await asyncio.shield(task)
+        finally:
+            progress.remove(reply)
+
     async def extract_topics(
-        self, channel: discord.TextChannel, target_msg: discord.Message = None
+        self,
+        channel: discord.TextChannel,
+        target_msg: discord.Message = None,
+        analysis=None,
     ):
+        if analysis is None:
+            analysis = await self.__analyze(channel, target_msg)
         if target_msg:
-            messages = await self.__fetch_messages(channel, target_msg)
-            topics = await self.bot.run_in_thread(self.summarizer.topics, messages)
+            topics = await self.bot.run_in_thread(
+                self.summarizer.topics, analysis, lane=INTERACTIVE
+            )
         else:
-            messages = await self.__fetch_messages(channel)
-            topics = await self.bot.run_in_thread(self.summarizer.topics_last, messages)
+            topics = await self.bot.run_in_thread(
+                self.summarizer.topics_last, analysis, lane=INTERACTIVE
+            )
         return topics
 
+    def get_performance_stats(self) -> dict:
+        """
+        Returns the latency percentiles of the summary commands, the hit ratio
+        of the history and summary caches and the tokens saved by the
+        extractive selection for the perf command.
+        """
+        res = {"commands": len(self.latencies["command"])}
+        for step, durations in self.latencies.items():
+            durations = sorted(durations) or [0.0]
+            for p in (50, 99):
+                value = durations[min(p * len(durations) // 100, len(durations) - 1)]
+                res[f"{step}_p{p}_ms"] = value * 1000
+        return {
+            "summary": res,
+            "history": self.history.get_stats(),
+            "extractive": self.summarizer.get_extractive_stats(),
+            "summary_cache": {
+                **self.summarizer.get_summary_cache_stats(),
+                "coalesced": self.coalesced,
+            },
+        }
+
     # Command context ---------------------------
 
     async def summary_all(
@@ -78,24 +231,52 @@ class SummaryCog(commands.Cog, name="Analyse de conversation"):
         """Envoie le résumé à partir du message cible jusqu'au dernier message dans le canal"""
         # pls wait us discord 
         await interaction.response.defer(thinking=True)
-        # fetch the messages
-        messages = await self.__fetch_messages(interaction.channel, target_message)
+        start = perf_counter()
+        # the reply is edited as the summary is written
+        reply = ThrottledMessage(
+            await interaction.followup.send(
+                "Je vais tenter de résumer la conversation à partir de ce message...", wait=True
+            ),
+            self.bot.config.get_summary_edit_interval(),
+        )
+        # the requests from the same message at the same time share the summary
+        content = await self.__coalesce(
+            ("summary_all", interaction.channel.id, target_message.id),
+            partial(self.__summarize_from, interaction.channel, target_message),
+            reply,
+        )
+        await reply.close(content)
+        self.latencies["command"].append(perf_counter() - start)
+
+    async def __summarize_from(
+        self, channel: discord.TextChannel, target_message: discord.Message, on_update
+    ) -> str:
+        """
+        Returns the reply of the summary from the target message, on_update is
+        called with the reply so far while the summary is written.
+        """
+        # fetch and cluster the messages, a long history is summarized by levels
+        config = self.bot.config
+        analysis = await self.__analyze(
+            channel, target_message, config.get_summary_max_messages()
+        )
         # get the topics
-        topics = list((await self.extract_topics(interaction.channel)).items())
+        topics = list(
+            (
+                await self.extract_topics(channel, target_message, analysis)
+            ).items()
+        )
         if topics[0][1] - topics[0][1] <= 0.3:
             topic_text = f"Le thème de la discussion était {topics[0][0]} ou peut-être {topics[1][0]}."
         else:
             topic_text = (
                 f"Le thème de la discussion précédente était: {topics[0][0]}"
             )
-        # get the summary
-        summary_all, list_users = await self.bot.run_in_thread(
-            self.summarizer.summarize_all, messages
-        )
         # Prepare the list of users as a formatted string
+        list_users = {message[0] for message in analysis.messages}
         user_lists_str = "\n".join([f"- {user}" for user in list_users])
 
-        content = (
+        header = (
             f"*Voici mon beau résumé à partir de ce [message]({target_message.jump_url}) ! "
             "Les résumés ne sont ni repris ni échangés !*"
             "\n\n"
@@ -105,10 +286,26 @@ class SummaryCog(commands.Cog, name="Analyse de conversation"):
             f"{user_lists_str}"
             "\n\n"
             "**Mon beau résumé :**\n"
-            f"{summary_all}"
         )
+        # each level of summary replaces the previous one
+        on_update(header + "*J'écris...*")
+        loop = asyncio.get_running_loop()
 
-        await interaction.followup.send(content)
+        def progress(depth: int, summary: str) -> None:
+            loop.call_soon_threadsafe(on_update, header + summary)
+
+        # get the summary
+        summarize = partial(
+            self.summarizer.summarize_hierarchical,
+            max_depth=config.get_summary_max_depth(),
+            fan_out=config.get_summary_fan_out(),
+            time_budget=config.get_summary_time_budget(),
+            output_tokens=config.get_summary_output_tokens(),
+            progress=progress,
+            timeout=config.get_summary_timeout(),
+        )
+        summary_all, _ = await self.bot.run_in_thread(summarize, analysis, lane=INTERACTIVE)
+        return header + (summary_all or "")
 
     # Commands ----------------------------------
 
@@ -118,40 +315,70 @@ class SummaryCog(commands.Cog, name="Analyse de conversation"):
         Récupère la dernière conversation et rédige un petit résumé rien que pour toi ! \
         *C'est très addictif, attention >_<*.
         """
-        await ctx.reply(
-            "Je vais tenter de résumer la dernière conversation... J'espère qu'elle est intéressante !"
-        )
-
-        async with ctx.channel.typing():
-            messages = await self.__fetch_messages(ctx.channel)
-            # topics
-            topics = list((await self.extract_topics(ctx.channel)).items())
-            if topics[0][1] - topics[0][1] <= 0.3:
-                topic_text = f"Le thème de la discussion était {topics[0][0]} ou peut-être {topics[1][0]}."
-            else:
-                topic_text = (
-                    f"Le thème de la discussion précédente était: {topics[0][0]}"
-                )
-
-            # summary
-            summary_last, list_users = await self.bot.run_in_thread(
-                self.summarizer.summarize_last, messages
-            )
-            # Prepare the list of users as a formatted string
-            user_lists_str = "\n".join([f"- {user}" for user in list_users])
-            content = (
-                "*Voici mon beau résumé ! Les résumés ne sont ni repris ni échangés !*"
-                "\n\n"
-                f"{topic_text}"
-                "\n\n"
-                "**Qui a parlé ?**\n"
-                f"{user_lists_str}"
-                "\n\n"
-                "**Mon beau résumé :**\n"
-                f"{summary_last}"
+        start = perf_counter()
+        # the reply is edited as the summary is written
+        reply = ThrottledMessage(
+            await ctx.reply(
+                "Je vais tenter de résumer la dernière conversation... J'espère qu'elle est intéressante !"
+            ),
+            self.bot.config.get_summary_edit_interval(),
+        )
+        # the requests of the same channel at the same time share the summary
+        content = await self.__coalesce(
+            ("summary", ctx.channel.id),
+            partial(self.__summarize_last, ctx.channel),
+            reply,
+        )
+        await reply.close(content)
+        self.latencies["command"].append(perf_counter() - start)
+
+    async def __summarize_last(self, channel: discord.TextChannel, on_update) -> str:
+        """
+        Returns the reply of the summary command, on_update is called with the
+        reply so far while the summary is written.
+        """
+        analysis = await self.__analyze(channel)
+        # topics
+        topics = list(
+            (await self.extract_topics(channel, analysis=analysis)).items()
+        )
+        if topics[0][1] - topics[0][1] <= 0.3:
+            topic_text = f"Le thème de la discussion était {topics[0][0]} ou peut-être {topics[1][0]}."
+        else:
+            topic_text = (
+                f"Le thème de la discussion précédente était: {topics[0][0]}"
             )
 
-            await ctx.reply(content)
+        # Prepare the list of users as a formatted string
+        list_users = set()
+        for cluster in analysis.conversations:
+            if len(analysis.messages) > 1 and analysis.messages[1] in cluster:
+                list_users.update(message[0] for message in cluster)
+        user_lists_str = "\n".join([f"- {user}" for user in list_users])
+        header = (
+            "*Voici mon beau résumé ! Les résumés ne sont ni repris ni échangés !*"
+            "\n\n"
+            f"{topic_text}"
+            "\n\n"
+            "**Qui a parlé ?**\n"
+            f"{user_lists_str}"
+            "\n\n"
+            "**Mon beau résumé :**\n"
+        )
+        on_update(header + "*J'écris...*")
+        loop = asyncio.get_running_loop()
+
+        def progress(summary: str) -> None:
+            loop.call_soon_threadsafe(on_update, header + summary)
+
+        # summary, the conversation is summarized by extracts when the model is too slow
+        summarize = partial(
+            self.summarizer.summarize_last,
+            timeout=self.bot.config.get_summary_timeout(),
+            progress=progress,
+        )
+        summary_last, _ = await self.bot.run_in_thread(summarize, analysis, lane=INTERACTIVE)
+        return header + f"{summary_last}"
 
 
 async def setup(bot: commands.Bot):
@@ -0,0 +1,26 @@
+import pytest
+
+from core.backends import create_pipeline, get_cache_path
+from core.models import get_model_specs
+
+
+def test_cache_path():
+    path = get_cache_path("JanSt/albert-base-v2_mbti-classification", "int8", "cache")
+    assert path == "cache/JanSt_albert-base-v2_mbti-classification.int8"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_pipeline("text-classification", "model", "fp16")
+    with pytest.raises(ValueError):
+        create_pipeline("fill-mask", "model", "int8")
+
+
+def test_model_specs():
+    specs = get_model_specs({"mbti": "int8"})
+    assert specs["mbti"].backend == "int8"
+    assert specs["mood"].backend == "torch"
+    with pytest.raises(ValueError):
+        get_model_specs({"mbti": "fp16"})
+    with pytest.raises(ValueError):
+        get_model_specs({"unknown": "int8"})
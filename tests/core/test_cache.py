@@ -0,0 +1,73 @@
+from core import ResultCache
+from core.cache import normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text("  mdr   ok \n") == "mdr ok"
+    assert normalize_text("été") == "été"
+
+
+def test_get_set():
+    cache = ResultCache(max_size=10)
+    assert cache.get("mood", "ok") is None
+    cache.set("mood", "ok", [{"label": "joy", "score": 0.9}])
+    assert cache.get("mood", " ok ") == [{"label": "joy", "score": 0.9}]
+    assert cache.get("sentiment", "ok") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_contains():
+    cache = ResultCache(max_size=10)
+    assert not cache.contains("mood", "ok")
+    cache.set("mood", "ok", 1)
+    assert cache.contains("mood", " ok ")
+    assert not cache.contains("sentiment", "ok")
+    stats = cache.get_stats()
+    assert stats["hits"] == 0
+    assert stats["misses"] == 0
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_size=2)
+    cache.set("mood", "a", 1)
+    cache.set("mood", "b", 2)
+    cache.get("mood", "a")
+    cache.set("mood", "c", 3)
+    assert cache.get("mood", "b") is None
+    assert cache.get("mood", "a") == 1
+    assert cache.get_stats()["size"] == 2
+
+
+def test_get_or_compute():
+    cache = ResultCache()
+    calls = []
+
+    def compute(text):
+        calls.append(text)
+        return len(text)
+
+    assert cache.get_or_compute("len", "mdr", compute) == 3
+    assert cache.get_or_compute("len", "mdr", compute) == 3
+    assert calls == ["mdr"]
+
+
+def test_persistent(tmpdir):
+    path = str(tmpdir.join("cache.sqlite"))
+    cache = ResultCache(path=path)
+    cache.set("mbti", "salut", {"INTJ": 0.8})
+    cache.close()
+    cache = ResultCache(path=path)
+    # only the results in memory are seen without a lookup
+    assert not cache.contains("mbti", "salut")
+    assert cache.get("mbti", "salut") == {"INTJ": 0.8}
+    assert cache.contains("mbti", "salut")
+    cache.close()
+
+
+def test_versions():
+    cache = ResultCache(versions={"mood": "int8"})
+    other = ResultCache()
+    assert cache.get_key("mood", "mdr") != other.get_key("mood", "mdr")
+    assert cache.get_key("mbti", "mdr") == other.get_key("mbti", "mdr")
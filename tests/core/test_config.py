@@ -28,3 +28,39 @@ def test_valid_config(tmpdir):
     assert conf.get_test_guild() == 123
     assert conf.get_color() == "#5e17eb"
     assert conf.get_prefix() == "!"
+
+
+def test_optional_config(tmpdir):
+    conf_data = {
+        "token": "TOKEN",
+        "staff_team": [],
+        "debug": False,
+        "test_guild": 123,
+        "color": "#5e17eb",
+        "prefix": "!",
+        "inference": {"max_batch_size": 32},
+        "models": {"disabled": ["summary"], "backends": {"mbti": "int8"}},
+        "summary": {"chunk_overlap": 16},
+    }
+    conf_path = tmpdir.join("optional_conf.json")
+    create_config(conf_path, conf_data)
+    conf = Config(conf_path)
+    assert conf.get_inference_batch_size() == 32
+    assert conf.get_inference_max_wait() == 20
+    assert conf.get_inference_backend() == "thread"
+    assert conf.get_disabled_models() == ["summary"]
+    assert conf.get_model_backends() == {"mbti": "int8"}
+    assert conf.get_model_max_tokens() == {}
+    assert conf.get_models_truncation() == "window"
+    assert conf.is_models_preload()
+    assert conf.get_summary_overlap() == 16
+    assert not conf.is_summary_approximate()
+    assert conf.get_summary_extractive_tokens() == 1024
+    assert conf.get_summary_max_messages() == 1000
+    assert conf.get_summary_max_depth() == 3
+    assert conf.get_summary_fan_out() == 8
+    assert conf.get_summary_time_budget() == 60
+    assert conf.get_summary_output_tokens() == 256
+    assert conf.get_summary_timeout() == 30
+    assert conf.get_summary_edit_interval() == 1.5
+    assert conf.get_moods_retention() == 24
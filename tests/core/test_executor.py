@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from core.executor import PriorityExecutor, INTERACTIVE, BACKGROUND, current_lane
+
+
+def test_submit():
+    executor = PriorityExecutor(2)
+    try:
+        assert executor.submit(sum, [1, 2]).result() == 3
+        assert executor.submit(max, 1, 5, lane=INTERACTIVE).result() == 5
+        with pytest.raises(ZeroDivisionError):
+            executor.submit(lambda: 1 / 0).result()
+        with pytest.raises(ValueError):
+            executor.submit(sum, [1], lane="unknown")
+    finally:
+        executor.shutdown()
+
+
+def test_interactive_first():
+    executor = PriorityExecutor(1)
+    order = []
+    gate = threading.Event()
+    try:
+        # keep the thread busy while the jobs are queued
+        executor.submit(gate.wait)
+        futures = [executor.submit(order.append, i) for i in range(5)]
+        futures.append(executor.submit(order.append, "cmd", lane=INTERACTIVE))
+        gate.set()
+        for future in futures:
+            future.result()
+        assert order[0] == "cmd"
+        stats = executor.get_stats()
+        assert stats[INTERACTIVE]["done"] == 1
+        assert stats[BACKGROUND]["done"] == 6
+        assert stats[BACKGROUND]["wait_p99_ms"] >= stats[BACKGROUND]["wait_p50_ms"]
+    finally:
+        executor.shutdown()
+
+
+def test_no_starvation():
+    executor = PriorityExecutor(1, max_wait_ms=10)
+    order = []
+    gate = threading.Event()
+    try:
+        executor.submit(gate.wait)
+        background = executor.submit(order.append, "background")
+        time.sleep(0.02)
+        futures = [
+            executor.submit(order.append, i, lane=INTERACTIVE) for i in range(3)
+        ]
+        gate.set()
+        for future in futures + [background]:
+            future.result()
+        assert order[0] == "background"
+        assert executor.get_stats()[BACKGROUND]["promoted"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_bounded_promotion():
+    executor = PriorityExecutor(1, max_wait_ms=0, promote_every=2)
+    order = []
+    gate = threading.Event()
+    try:
+        executor.submit(gate.wait)
+        futures = [executor.submit(order.append, f"b{i}") for i in range(3)]
+        time.sleep(0.01)
+        futures += [
+            executor.submit(order.append, f"i{i}", lane=INTERACTIVE) for i in range(6)
+        ]
+        gate.set()
+        for future in futures:
+            future.result()
+        # the starving background jobs get one turn every two interactive jobs
+        assert order == ["b0", "i0", "i1", "b1", "i2", "i3", "b2", "i4", "i5"]
+        assert executor.get_stats()[BACKGROUND]["promoted"] == 3
+    finally:
+        executor.shutdown()
+
+
+def test_current_lane():
+    executor = PriorityExecutor(1)
+    try:
+        assert executor.submit(current_lane, lane=INTERACTIVE).result() == INTERACTIVE
+        assert executor.submit(current_lane).result() == BACKGROUND
+        assert current_lane() == BACKGROUND
+    finally:
+        executor.shutdown()
+
+
+def test_shutdown_cancel():
+    executor = PriorityExecutor(1)
+    gate = threading.Event()
+    executor.submit(gate.wait)
+    pending = executor.submit(sum, [1])
+    executor.shutdown(wait=False, cancel_futures=True)
+    gate.set()
+    assert pending.cancelled()
+    with pytest.raises(RuntimeError):
+        executor.submit(sum, [1])
@@ -0,0 +1,145 @@
+import re
+import sys
+import threading
+
+import pytest
+
+from core.governor import InputGovernor
+
+
+class WordTokenizer:
+    """One token per word."""
+
+    model_max_length = 12
+    is_fast = True
+
+    def __init__(self, fast=True):
+        self.is_fast = fast
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, text, add_special_tokens=True, return_offsets_mapping=False):
+        matches = list(re.finditer(r"\S+", text))
+        res = {"input_ids": [m.group() for m in matches]}
+        if return_offsets_mapping:
+            res["offset_mapping"] = [m.span() for m in matches]
+        return res
+
+    def decode(self, ids):
+        return " ".join(ids)
+
+
+class EchoPipeline:
+    """Returns its inputs and its arguments."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, inputs, **kwargs):
+        return inputs, kwargs
+
+
+def create_governor(budgets, strategy, tokenizer=None):
+    governor = InputGovernor(budgets, strategy)
+    governor.register("a", EchoPipeline(tokenizer or WordTokenizer()))
+    return governor
+
+
+def get_text(words):
+    return " ".join(f"w{i}" for i in range(words))
+
+
+def test_fit_short_text():
+    governor = create_governor({"a": 4}, "head")
+    assert governor.fit("a", "un  deux") == "un  deux"
+    stats = governor.get_stats()["a"]
+    assert stats["texts"] == 1
+    assert stats["truncated"] == 0
+    assert stats["le_16"] == 1
+
+
+def test_fit_head():
+    governor = create_governor({"a": 4}, "head")
+    assert governor.fit("a", get_text(10)) == "w0 w1 w2 w3"
+    assert governor.get_stats()["a"]["truncated"] == 1
+
+
+def test_fit_window():
+    for fast in (True, False):
+        governor = create_governor({"a": 5}, "window", WordTokenizer(fast))
+        assert governor.fit("a", get_text(10)) == "w0 w1 w8 w9"
+
+
+def test_fit_window_one_token():
+    # no room for two windows, the beginning of the text is kept
+    for fast in (True, False):
+        governor = create_governor({"a": 1}, "window", WordTokenizer(fast))
+        assert governor.fit("a", get_text(10)) == "w0"
+
+
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        InputGovernor({"a": 0}, "window")
+
+
+def test_tokenizer_outside_lock():
+    governor = InputGovernor({"b": 4}, "head")
+    governor.register("b", EchoPipeline(WordTokenizer()))
+
+    fitted = []
+
+    class LoadingPipeline:
+        @property
+        def tokenizer(self):
+            # another model is fitted in another thread while this one loads
+            thread = threading.Thread(target=lambda: fitted.append(governor.fit("b", get_text(10))))
+            thread.start()
+            thread.join(timeout=5)
+            return WordTokenizer()
+
+    governor.register("a", LoadingPipeline())
+    assert governor.get_budget("a") == 10
+    assert fitted == ["w0 w1 w2 w3"]
+
+
+def test_stats_threads():
+    governor = create_governor({"a": 4}, "head")
+    threads = [
+        threading.Thread(target=lambda: [governor.fit("a", "un deux") for _ in range(500)])
+        for _ in range(8)
+    ]
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(previous)
+    stats = governor.get_stats()["a"]
+    assert stats["texts"] == stats["le_16"] == 4000
+
+
+def test_default_budget():
+    governor = create_governor(None, "head")
+    assert governor.fit("a", get_text(40)) == get_text(10)
+    stats = governor.get_stats()["a"]
+    assert stats["budget"] == 10
+    assert stats["max_tokens"] == 40
+    assert stats["le_64"] == 1
+
+
+def test_wrap():
+    governor = InputGovernor({"a": 2}, "head")
+    pipeline = governor.wrap("a", EchoPipeline(WordTokenizer()))
+    assert pipeline("un deux trois", top_k=None) == ("un deux", {"top_k": None})
+    assert pipeline(["un", "un deux trois"]) == (["un", "un deux"], {})
+
+
+def test_get_budget():
+    governor = create_governor({}, "head")
+    # the maximum length of the model without its special tokens
+    assert governor.get_budget("a") == 10
+    assert isinstance(governor.get_tokenizer("a"), WordTokenizer)
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import pytest
+
+from core import InferenceScheduler
+from core.executor import PriorityExecutor, INTERACTIVE, BACKGROUND
+
+
+class FakePipeline:
+    """Text classification pipeline which records the size of each batch."""
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    def __call__(self, inputs, top_k=1, batch_size=1):
+        if isinstance(inputs, str):
+            res = self([inputs], top_k=top_k)[0]
+            return [res] if isinstance(res, dict) else res
+        self.batches.append(batch_size)
+        res = []
+        for text in inputs:
+            labels = [{"label": text, "score": 0.9}, {"label": "other", "score": 0.1}]
+            res.append(labels[0] if top_k == 1 else labels[:top_k])
+        return res
+
+
+@pytest.mark.asyncio
+async def test_submit_batch():
+    fake = FakePipeline()
+    scheduler = InferenceScheduler(max_batch_size=4, max_wait_ms=50)
+    scheduler.register("fake", fake)
+    results = await asyncio.gather(*(scheduler.submit("fake", str(i)) for i in range(4)))
+    assert fake.batches == [4]
+    assert [res[0]["label"] for res in results] == ["0", "1", "2", "3"]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_submit_timeout_flush():
+    fake = FakePipeline()
+    scheduler = InferenceScheduler(max_batch_size=16, max_wait_ms=5)
+    scheduler.register("fake", fake)
+    results = await asyncio.gather(
+        *(scheduler.submit("fake", text, top_k=None) for text in ("a", "b", "a"))
+    )
+    # one batch, duplicated texts are computed once
+    assert fake.batches == [2]
+    assert results[0] == results[2]
+    assert len(results[1]) == 2
+    stats = scheduler.get_stats()["fake"]
+    assert stats["texts"] == 2
+    assert stats["batches"] == 1
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_scheduled_pipeline_from_threads():
+    fake = FakePipeline()
+    scheduler = InferenceScheduler(max_batch_size=8, max_wait_ms=20)
+    scheduled = scheduler.register("fake", fake)
+    scheduler.start(asyncio.get_running_loop())
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(None, scheduled, str(i)) for i in range(8))
+    )
+    assert sum(fake.batches) == 8
+    assert len(fake.batches) < 8
+    assert [res[0]["label"] for res in results] == [str(i) for i in range(8)]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_interactive_batches_first():
+    fake = FakePipeline()
+    gate = threading.Event()
+    calls = []
+
+    def pipeline(inputs, **kwargs):
+        calls.append(list(inputs))
+        gate.wait()
+        return fake(inputs, **kwargs)
+
+    scheduler = InferenceScheduler(max_batch_size=2, max_wait_ms=1000)
+    scheduler.register("fake", pipeline)
+    # the first batch keeps the inference thread busy
+    tasks = [asyncio.ensure_future(scheduler.submit("fake", text)) for text in ("b1", "b2")]
+    await asyncio.sleep(0.01)
+    tasks += [asyncio.ensure_future(scheduler.submit("fake", text)) for text in ("b3", "b4")]
+    tasks += [
+        asyncio.ensure_future(scheduler.submit("fake", text, lane=INTERACTIVE))
+        for text in ("i1", "i2")
+    ]
+    await asyncio.sleep(0.01)
+    gate.set()
+    results = await asyncio.gather(*tasks)
+    # the interactive texts have their own batch, run before the background one
+    assert calls == [["b1", "b2"], ["i1", "i2"], ["b3", "b4"]]
+    assert [res[0]["label"] for res in results] == ["b1", "b2", "b3", "b4", "i1", "i2"]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_scheduled_pipeline_lane():
+    fake = FakePipeline()
+    scheduler = InferenceScheduler(max_batch_size=8, max_wait_ms=1)
+    scheduled = scheduler.register("fake", fake)
+    scheduler.start(asyncio.get_running_loop())
+    executor = PriorityExecutor(1)
+    lanes = []
+    original = scheduler.submit
+
+    async def submit(name, text, lane=BACKGROUND, **kwargs):
+        lanes.append(lane)
+        return await original(name, text, lane, **kwargs)
+
+    scheduler.submit = submit
+    # the texts keep the lane of the job which sends them
+    await asyncio.wrap_future(executor.submit(scheduled, "a", lane=INTERACTIVE))
+    await asyncio.wrap_future(executor.submit(scheduled, "b"))
+    assert lanes == [INTERACTIVE, BACKGROUND]
+    executor.shutdown()
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_parallel_pipelines():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def pipeline(inputs, **kwargs):
+        # each pipeline waits for the batch of the other one
+        barrier.wait()
+        return FakePipeline()(inputs, **kwargs)
+
+    scheduler = InferenceScheduler(max_batch_size=1, parallel=True)
+    scheduler.register("a", pipeline)
+    scheduler.register("b", pipeline)
+    results = await asyncio.gather(scheduler.submit("a", "x"), scheduler.submit("b", "y"))
+    assert [res[0]["label"] for res in results] == ["x", "y"]
+    scheduler.shutdown()
+
+
+def test_scheduled_pipeline_not_started():
+    fake = FakePipeline()
+    scheduler = InferenceScheduler()
+    scheduled = scheduler.register("fake", fake)
+    assert scheduled("text")[0]["label"] == "text"
+    assert scheduled(["a", "b"])[1]["label"] == "b"
+    scheduler.shutdown()
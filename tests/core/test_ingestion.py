@@ -0,0 +1,56 @@
+from core.ingestion import IngestionQueue
+
+
+def test_admit_under_watermark():
+    queue = IngestionQueue(10, 0.5)
+    for message_id in range(5):
+        assert queue.admit(1, 1, message_id) == 1.0
+    assert queue.pending == 5
+    queue.release(5)
+    assert queue.pending == 0
+    assert queue.get_stats()["dropped"] == 0
+
+
+def test_sampling_under_load():
+    queue = IngestionQueue(1000, 0.1)
+    weights = [queue.admit(1, 1, message_id) for message_id in range(2000)]
+    kept = [weight for weight in weights if weight is not None]
+    stats = queue.get_stats()
+    assert stats["dropped"] == len(weights) - len(kept) > 0
+    assert queue.get_rate(1, 1) < 1.0
+    # a quiet channel is not sampled as much as the busy one
+    assert queue.get_rate(1, 2) == 1.0
+    # the weights keep the counts unbiased
+    assert abs(sum(kept) - len(weights)) / len(weights) < 0.2
+
+
+def test_max_size():
+    queue = IngestionQueue(10, 1.0)
+    weights = [queue.admit(1, 1, message_id) for message_id in range(20)]
+    assert weights.count(None) == 10
+    assert queue.pending == 10
+
+
+def test_rate_recovery():
+    queue = IngestionQueue(10, 0.5)
+    for message_id in range(10):
+        queue.admit(1, 1, message_id)
+    assert queue.get_rate(1, 1) < 1.0
+    queue.release(10)
+    for message_id in range(10, 40):
+        queue.admit(1, 1, message_id)
+        queue.release()
+    assert queue.get_rate(1, 1) == 1.0
+    assert queue.sample(1, 1, 123) == 1.0
+
+
+def test_shared_decision():
+    queue = IngestionQueue(100, 0.01)
+    queue.admit(1, 1, 0)
+    for message_id in range(1, 200):
+        # one listener samples the message before the other one admits it
+        weight = queue.sample(1, 1, message_id)
+        assert queue.admit(1, 1, message_id) == weight
+        assert queue.sample(1, 1, message_id) == weight
+    # the rate is adapted once by message
+    assert queue.get_stats()["received"] == 200
@@ -0,0 +1,51 @@
+import pytest
+
+from core.models import ModelRegistry, ModelSpec, ModelDisabledError
+
+
+SPECS = {
+    "a": ModelSpec("text-classification", "model-a", "ext.first"),
+    "b": ModelSpec("text-classification", "model-b", "ext.second"),
+}
+
+
+def get_registry(disabled=()):
+    loaded = []
+
+    def factory(spec):
+        loaded.append(spec.model)
+        return lambda text: [{"label": spec.model, "score": 1.0}]
+
+    return ModelRegistry(SPECS, disabled, factory), loaded
+
+
+def test_lazy_load():
+    registry, loaded = get_registry()
+    lazy = registry.lazy("a")
+    assert loaded == []
+    assert not registry.is_loaded("a")
+    assert lazy("text")[0]["label"] == "model-a"
+    assert lazy("text")[0]["label"] == "model-a"
+    assert loaded == ["model-a"]
+    stats = registry.get_stats()
+    assert stats["a"]["state"] == "loaded"
+    assert stats["a"]["load_time"] >= 0
+    assert stats["b"]["state"] == "lazy"
+
+
+def test_disabled():
+    registry, loaded = get_registry(disabled=["b"])
+    with pytest.raises(ModelDisabledError):
+        registry.lazy("b")("text")
+    assert loaded == []
+    assert registry.get_stats()["b"]["state"] == "disabled"
+    assert registry.get_models_for(["ext.first", "ext.second"]) == ["a"]
+
+
+def test_release():
+    registry, loaded = get_registry()
+    registry.get("a")
+    registry.release("a")
+    assert not registry.is_loaded("a")
+    registry.get("a")
+    assert loaded == ["model-a", "model-a"]
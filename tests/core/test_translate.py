@@ -10,4 +10,44 @@ def test_translate_to_en(mocker):
     for text in texts:
         res = translator.translate_to_en(text)
         assert res is not None
-        assert len(res) > 0
\ No newline at end of file
+        assert len(res) > 0
+
+class FakeTranslation:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs, batch_size=1):
+        self.calls.append(inputs)
+        if isinstance(inputs, str):
+            return [{"translation_text": inputs.upper()}]
+        return [{"translation_text": text.upper()} for text in inputs]
+
+
+def test_translate_to_en_memo():
+    pipeline = FakeTranslation()
+    translator = Translator(pipeline)
+    assert translator.translate_to_en("Salut  ça va") == "SALUT  ÇA VA"
+    assert translator.translate_to_en(" Salut ça va ") == "SALUT  ÇA VA"
+    # the model translates the original text
+    assert pipeline.calls == ["Salut  ça va"]
+
+
+def test_translate_to_en_memo_eviction():
+    pipeline = FakeTranslation()
+    translator = Translator(pipeline, max_memo=2)
+    for text in ("a", "b", "c", "a"):
+        translator.translate_to_en(text)
+    assert pipeline.calls == ["a", "b", "c", "a"]
+
+
+def test_translate_many():
+    pipeline = FakeTranslation()
+    translator = Translator(pipeline, batch_size=2)
+    translator.translate_to_en("J'aime Python")
+    texts = ["Tu fais quoi?", "J'aime Python", "Salut", "Tu fais quoi?", "Bonjour à tous"]
+    res = translator.translate_many(texts)
+    assert res == [text.upper() for text in texts]
+    # unique texts without translation, sorted by length
+    assert pipeline.calls[1:] == [["Salut", "Tu fais quoi?"], ["Bonjour à tous"]]
+    assert translator.translate_many(["Au  revoir", "Au revoir "]) == ["AU  REVOIR"] * 2
+    assert pipeline.calls[-1] == ["Au  revoir"]
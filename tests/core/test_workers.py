@@ -0,0 +1,49 @@
+import pytest
+
+from core.models import ModelSpec
+from core.workers import WorkerPool
+
+
+SPECS = {
+    "a": ModelSpec("text-classification", "model-a", "ext.first"),
+    "b": ModelSpec("text-classification", "model-b", "ext.second"),
+}
+
+
+class UpperPipeline:
+    def __call__(self, inputs, suffix=""):
+        return [text.upper() + suffix for text in inputs]
+
+
+def factory(spec):
+    return UpperPipeline()
+
+
+def test_remote_pipeline():
+    pool = WorkerPool(2, SPECS, factory=factory)
+    try:
+        remote = pool.remote("a")
+        assert remote(["salut", "ok"]) == ["SALUT", "OK"]
+        assert pool.call("b", ["x"], suffix="!") == ["X!"]
+        pool.preload("b").result()
+        assert pool.get_stats()["b"]["state"] == "loaded"
+    finally:
+        pool.shutdown()
+
+
+def test_remote_tokenizer_and_stats():
+    pool = WorkerPool(
+        2, SPECS, disabled=["b"], factory=factory, tokenizer_factory=lambda spec: spec.model
+    )
+    try:
+        remote = pool.remote("a")
+        # the tokenizer is loaded in the bot process, the model is not
+        assert remote.tokenizer == "model-a"
+        with pytest.raises(AttributeError):
+            remote.model
+        assert pool.get_stats()["a"]["state"] == "lazy"
+        remote(["salut"])
+        stats = pool.get_stats()
+        assert (stats["a"]["state"], stats["b"]["state"]) == ("loaded", "disabled")
+    finally:
+        pool.shutdown()
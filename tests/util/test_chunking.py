@@ -0,0 +1,78 @@
+import pytest
+
+from util.chunking import TokenChunker
+from util.summary import Summarizer
+
+
+class WordTokenizer:
+    """One token per word."""
+
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+def line(author, words):
+    return f"{author}: " + " ".join(f"w{i}" for i in range(words - 1))
+
+
+def test_count():
+    chunker = TokenChunker(WordTokenizer())
+    assert chunker.count(["un deux", "trois", ""]) == [2, 1, 0]
+    assert chunker.count([]) == []
+    approximate = TokenChunker(WordTokenizer(), approximate=True, chars_per_token=4)
+    assert approximate.count(["un deux", ""]) == [2, 0]
+    # no tokenizer, the tokens are estimated
+    assert TokenChunker(chars_per_token=2).count(["abc"]) == [2]
+
+
+def test_pack_lines():
+    chunker = TokenChunker(WordTokenizer(), max_tokens=10)
+    text = "\n".join([line("a", 4), line("b", 4), line("c", 4), ""])
+    # 4 tokens by line and 1 by separator
+    assert chunker.split(text) == [line("a", 4) + "\n" + line("b", 4), line("c", 4)]
+
+
+def test_short_text():
+    chunker = TokenChunker(WordTokenizer(), max_tokens=10)
+    assert chunker.split("a: un deux\n\n") == ["a: un deux"]
+    assert chunker.split("") == []
+
+
+def test_long_line():
+    chunker = TokenChunker(WordTokenizer(), max_tokens=4)
+    chunks = chunker.split(line("a", 10))
+    assert chunks == ["a: w0 w1 w2", "w3 w4 w5 w6", "w7 w8"]
+    assert " ".join(chunks) == line("a", 10)
+
+
+def test_long_word():
+    chunker = TokenChunker(max_tokens=4, chars_per_token=1)
+    assert chunker.split("abcdefghij") == ["abcd", "efgh", "ij"]
+
+
+def test_overlap():
+    chunker = TokenChunker(WordTokenizer(), max_tokens=10, overlap=3)
+    lines = [line(author, 2) for author in "abcdef"]
+    chunks = chunker.split("\n".join(lines))
+    # 2 tokens by line and 1 by separator, the last line of a chunk starts the next one
+    assert chunks == ["\n".join(lines[:3]), "\n".join(lines[2:5]), "\n".join(lines[4:])]
+
+
+def test_overlap_too_large():
+    with pytest.raises(ValueError):
+        TokenChunker(WordTokenizer(), max_tokens=10, overlap=10)
+
+
+def test_summarizer_chunkers():
+    names = []
+
+    def factory(name):
+        names.append(name)
+        return TokenChunker(WordTokenizer(), max_tokens=5)
+
+    summarizer = Summarizer(None, None, chunker_factory=factory)
+    assert summarizer.split_input("summary", "a: un deux\nb: trois quatre") == ["a: un deux", "b: trois quatre"]
+    assert summarizer.split_input("summary", "a: un") == ["a: un"]
+    # the chunkers are created once by model
+    assert names == ["summary"]
+    assert Summarizer(None, None).split_input("topics", "a: un") == ["a: un"]
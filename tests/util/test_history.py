@@ -0,0 +1,88 @@
+from util.history import ChannelHistory
+
+
+def record(i):
+    return ("a", f"message {i}", 1000.0 + i, i)
+
+
+def test_live_messages():
+    history = ChannelHistory()
+    for i in range(10, 20):
+        history.add(1, record(i))
+    # the messages before the first live one are unknown
+    assert history.get(1) is None
+    assert history.get(1, after=5) is None
+    assert history.get(1, after=14) == [record(i) for i in range(15, 20)]
+    assert history.get(1, after=9, limit=3) == [record(10), record(11), record(12)]
+    # enough messages for the last ones, from the newest
+    assert history.get(1, limit=4) == [record(i) for i in (19, 18, 17, 16)]
+    assert history.get(2) is None
+
+
+def test_backfill():
+    history = ChannelHistory()
+    history.add(1, record(20))
+    history.backfill(1, [record(i) for i in range(20, 9, -1)], since=9)
+    history.add(1, record(21))
+    assert history.get(1) == [record(i) for i in range(21, 9, -1)]
+    assert history.get(1, after=9, limit=2) == [record(10), record(11)]
+    assert history.get(1, after=5) is None
+
+
+def test_backfill_whole_channel():
+    history = ChannelHistory()
+    history.backfill(1, [record(2), record(1)], since=0)
+    assert history.get(1) == [record(2), record(1)]
+    assert history.get(1, after=0) == [record(1), record(2)]
+
+
+def test_capacity():
+    history = ChannelHistory(capacity=5)
+    history.backfill(1, [record(i) for i in range(1, 4)], since=0)
+    for i in range(4, 10):
+        history.add(1, record(i))
+    assert history.get(1, limit=100) == [record(i) for i in range(9, 4, -1)]
+    # the dropped messages are not complete anymore
+    assert history.get(1, after=2) is None
+    assert history.get(1, after=5) == [record(i) for i in range(6, 10)]
+
+
+def test_max_channels():
+    history = ChannelHistory(max_channels=2)
+    for channel in (1, 2, 3):
+        history.add(channel, record(channel))
+    assert history.get(1, after=0) is None
+    assert history.get(3, after=2) == [record(3)]
+
+
+def test_late_message():
+    history = ChannelHistory()
+    history.add(1, record(10))
+    history.add(1, record(12))
+    history.add(1, record(11))
+    history.add(1, record(12))
+    assert history.get(1, after=9) == [record(10), record(11), record(12)]
+
+
+def test_update_remove():
+    history = ChannelHistory()
+    for i in range(1, 4):
+        history.add(1, record(i))
+    edited = ("a", "edited", 1002.0, 2)
+    history.update(1, edited)
+    history.remove(1, 3)
+    history.remove(2, 3)
+    assert history.get(1, after=0) == [record(1), edited]
+
+
+def test_stats():
+    history = ChannelHistory()
+    history.add(1, record(1))
+    history.get(1)
+    history.get(1, after=0)
+    history.clear()
+    history.get(1, after=0)
+    stats = history.get_stats()
+    assert stats["channels"] == 0
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_ratio"] == 1 / 3
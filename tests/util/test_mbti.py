@@ -53,3 +53,38 @@ def test_get_guild_mbtis(guildmbti_instance):
     }
     result = guildmbti_instance.get_guild_mbtis()
     assert result == {"INTJ": 1, "INTP": 1, "INFJ": 1}
+
+
+def test_get_message_mbti_cached(guildmbti_instance):
+    from core import ResultCache
+
+    guildmbti_instance.cache = ResultCache()
+    guildmbti_instance.get_message_mbti("mdr")
+    result = guildmbti_instance.get_message_mbti("mdr")
+    assert result == {"INTJ": 0.8, "ENTP": 0.2}
+    assert guildmbti_instance.pipeline_mbti.call_count == 1
+
+
+def test_handle_messages(guildmbti_instance, mocker):
+    mocker.patch("core.Translator.translate_many", return_value=["text", "text"])
+    expected_mbti = [
+        [{"label": "INTJ", "score": 0.8}, {"label": "ENTP", "score": 0.2}],
+        [{"label": "INTP", "score": 0.6}, {"label": "ENTJ", "score": 0.4}],
+    ]
+    mocker.patch.object(guildmbti_instance, "pipeline_mbti", return_value=expected_mbti)
+    guildmbti_instance.handle_messages([(1, "Bonjour"), (2, "Salut")])
+    assert guildmbti_instance.message_counters == {1: 1, 2: 1}
+    assert guildmbti_instance.get_user_mbti(1) == "INTJ"
+    assert guildmbti_instance.get_user_mbti(2) == "INTP"
+
+
+def test_handle_messages_weights(guildmbti_instance, mocker):
+    mocker.patch("core.Translator.translate_many", return_value=["text", "text"])
+    expected_mbti = [
+        [{"label": "INTJ", "score": 1.0}, {"label": "INTP", "score": 0.0}],
+        [{"label": "INTJ", "score": 0.0}, {"label": "INTP", "score": 1.0}],
+    ]
+    mocker.patch.object(guildmbti_instance, "pipeline_mbti", return_value=expected_mbti)
+    guildmbti_instance.handle_messages([(1, "Bonjour"), (1, "Salut")], [1.0, 3.0])
+    assert guildmbti_instance.message_counters[1] == 4.0
+    assert guildmbti_instance.user_mbtis[1] == {"INTJ": 0.25, "INTP": 0.75}
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 from transformers import pipeline
 import pytest
 
-from util.moods import GuildMoods  # Noqa
+from util.moods import GuildMoods, MessageMood, MoodStore  # Noqa
 
 # Fixtures
 
@@ -162,3 +162,223 @@ def test_garbage_collector(guildmoods_instance):
 
     # Ensure one message with user_id 222 is retained after garbage collection
     assert len(guildmoods_instance.user_messages[222]) == 1
+
+
+def test_mood_store():
+    store = MoodStore(capacity=1)
+    current_time = datetime.now().replace(microsecond=0)
+    for i in range(5):
+        store.append(100 + i % 2, MessageMood(i, current_time, 0.1 * i, ["joie", 0.5], 0.2, weight=2.0))
+    # the columns grow with the messages
+    assert len(store) == 5
+    assert store.authors == [100, 101]
+    assert list(store.column("author")) == [0, 1, 0, 1, 0]
+    store.keep(store.column("message_id") % 2 == 1)
+    assert list(store.column("message_id")) == [1, 3]
+    message = store.get_message(1)
+    assert (message.get_message_id(), message.get_time(), message.get_mood()) == (3, current_time, ["joie", 0.5])
+    assert (message.get_pov(), message.get_weight()) == (pytest.approx(0.3), 2.0)
+
+
+def test_running_totals():
+    from fractions import Fraction
+    import random
+
+    rng = random.Random(0)
+    current_time = datetime.now()
+    guildmoods = GuildMoods(None, None)
+    retained = GuildMoods(None, None)
+    messages = []
+    for i in range(200):
+        age = timedelta(hours=rng.choice((1, 30)))
+        message = MessageMood(i, current_time - age, rng.random(), [rng.choice(["joie", "peur"]), 0.9],
+                              rng.random(), weight=rng.choice((1.0, 3.0)))
+        guildmoods._add_message(i % 3, message)
+        if age.total_seconds() < 86400:
+            retained._add_message(i % 3, message)
+            messages.append((i % 3, message))
+    guildmoods.garbage_collector()
+    # the statistics after the expiry are the ones of the retained messages
+    for user_id in range(3):
+        user = [message for author, message in messages if author == user_id]
+        activity = sum(Fraction(message.get_weight()) for message in user)
+        pov = sum(Fraction(message.get_pov() * message.get_weight()) for message in user)
+        assert guildmoods.get_user_pov(user_id) == retained.get_user_pov(user_id) == float(pov / activity)
+        assert guildmoods.get_user_positivity(user_id) == retained.get_user_positivity(user_id)
+        assert guildmoods.get_user_mood(user_id) == retained.get_user_mood(user_id)
+    assert guildmoods.get_guild_pov() == retained.get_guild_pov()
+    assert guildmoods.get_guild_positivity() == retained.get_guild_positivity()
+    assert guildmoods.get_guild_mood() == retained.get_guild_mood()
+    assert guildmoods.get_user_pov(4) == 0
+
+
+def test_running_totals_float_sums():
+    import random
+    import numpy as np
+
+    rng = random.Random(1)
+    current_time = datetime.now()
+    guildmoods = GuildMoods(None, None)
+    messages = []
+    for i in range(500):
+        message = MessageMood(i, current_time, rng.random(), [rng.choice(["joie", "peur"]), 0.9],
+                              rng.random(), weight=rng.choice((1.0, 2.0, 3.0)))
+        guildmoods._add_message(i % 2, message)
+        messages.append((i % 2, message))
+    # the float sums of the statistics computed from the messages
+    for user_id in range(2):
+        user = [message for author, message in messages if author == user_id]
+        weights = np.array([message.get_weight() for message in user])
+        for name in ("pov", "positivity"):
+            scores = np.array([getattr(message, f"get_{name}")() for message in user])
+            expected = float(np.dot(scores, weights) / weights.sum())
+            average = getattr(guildmoods, f"get_user_{name}")(user_id)
+            assert average == pytest.approx(expected, rel=len(user) * 2 ** -52, abs=0)
+        moods = {"joie": 0, "peur": 0}
+        for message in user:
+            moods[message.get_mood()[0]] += message.get_weight()
+        assert guildmoods.get_user_mood(user_id) == moods
+    subjective = sum(message.get_weight() for _, message in messages if message.get_pov() > 0.5)
+    total = sum(message.get_weight() for _, message in messages)
+    assert guildmoods.get_guild_pov() == {"Subjectif": subjective, "Objectif": total - subjective}
+
+
+def test_retention():
+    from util.prefilter import Estimate
+
+    guildmoods = GuildMoods(None, None, retention_hours=2)
+    # the start of the current time slot, so that each message falls in its own bucket
+    now = datetime.now().timestamp()
+    slot_start = datetime.fromtimestamp(now - now % GuildMoods.BUCKET_SECONDS)
+    for i, hours in enumerate((0, 1, 3, 4)):
+        guildmoods.add_estimate(111, Estimate("joie", 0.9, 0.8), i, slot_start - timedelta(hours=hours))
+    assert len(guildmoods.buckets) == 4
+    guildmoods.garbage_collector()
+    # the buckets older than the retention are dropped with their totals
+    assert len(guildmoods.buckets) == 2
+    assert len(guildmoods.user_messages[111]) == 2
+    assert guildmoods.get_user_mood(111) == {"joie": 2}
+    assert guildmoods.get_guild_positivity() == {"Positif": 2, "Negatif": 0}
+
+
+def test_message_index(mocker):
+    from util.prefilter import Estimate
+
+    guildmoods = GuildMoods(None, None)
+    analyzer = mocker.patch.object(guildmoods, "analyzer", return_value=[{"label": "joy", "score": 0.9}])
+    mocker.patch.object(guildmoods, "sentiment_classifier", return_value=[{"label": "Positive", "score": 0.8}])
+    current_time = datetime.now()
+    for i in range(1, 4):
+        guildmoods.add_estimate(111, Estimate("peur", 0.1, 0.2), i, current_time)
+    guildmoods.handle_message(222, "mdr", 4, current_time - timedelta(hours=30))
+    # a message already analyzed is not analyzed again
+    guildmoods.handle_message(222, "mdr", 4, current_time - timedelta(hours=30))
+    guildmoods.add_estimate(111, Estimate("joie", 0.9, 0.8), 1, current_time)
+    assert analyzer.call_count == 1
+    assert guildmoods.get_user_mood(111) == {"peur": 3}
+    # the deleted message leaves the statistics, the next ones are still found
+    assert guildmoods.remove_message(2).get_positivity() == 0.1
+    assert guildmoods.remove_message(2) is None
+    assert guildmoods.get_user_mood(111) == {"peur": 2}
+    assert guildmoods.get_message_positivity(3, "") == 0.1
+    assert guildmoods.get_message_mood(4, "") == (0.9, "joie")
+    # the expired messages leave the index
+    guildmoods.garbage_collector()
+    assert set(guildmoods.index) == {1, 3}
+    assert guildmoods.remove_message(4) is None
+
+
+def test_replace_message():
+    from util.prefilter import Estimate
+
+    guildmoods = GuildMoods(None, None)
+    current_time = datetime.now()
+    guildmoods.add_estimate(111, Estimate("peur", 0.1, 0.2), 1, current_time)
+    # the edited message keeps its time and its weight
+    previous = guildmoods.get_message(1)
+    edited = guildmoods.estimate_message(Estimate("joie", 0.9, 0.8), 1, previous.get_time(), previous.get_weight())
+    assert guildmoods.replace_message(111, 1, edited).get_mood() == ["peur", 1.0]
+    assert guildmoods.get_user_mood(111) == {"joie": 1}
+    assert guildmoods.get_message(1).get_positivity() == 0.9
+    # a message removed in the meantime is not added back
+    guildmoods.remove_message(1)
+    assert guildmoods.replace_message(111, 1, edited) is None
+    assert guildmoods.get_message(1) is None
+    assert guildmoods.get_user_mood(111) == {}
+
+
+def test_result_cache(mocker):
+    from core import ResultCache
+
+    cache = ResultCache()
+    guildmoods = GuildMoods(None, None, cache)
+    msg_mood = [{"label": "joy", "score": 0.9}]
+    msg_sentiment = [{"label": "Positive", "score": 0.8}]
+    analyzer = mocker.patch.object(guildmoods, "analyzer", return_value=msg_mood)
+    classifier = mocker.patch.object(guildmoods, "sentiment_classifier", return_value=msg_sentiment)
+    current_time = datetime.now()
+    guildmoods.handle_message(111, "mdr", 1, current_time)
+    guildmoods.handle_message(222, "mdr", 2, current_time)
+    assert analyzer.call_count == 1
+    assert classifier.call_count == 1
+    # the context menu commands use the cache too
+    assert guildmoods.get_message_mood(9, "mdr") == (0.9, "joy")
+    assert analyzer.call_count == 1
+    assert guildmoods.get_user_positivity(222) == 0.8
+    # the lexicon pov is not worth the cache
+    assert not cache.contains("pov", "mdr")
+
+
+def test_sample_weights(mocker):
+    guildmoods = GuildMoods(None, None)
+    mocker.patch.object(guildmoods, "analyzer", side_effect=lambda text: [{"label": text, "score": 0.9}])
+    mocker.patch.object(guildmoods, "sentiment_classifier", return_value=[{"label": "Positive", "score": 0.8}])
+    mocker.patch.object(guildmoods, "_get_pov_message", return_value=1.0)
+    current_time = datetime.now()
+    guildmoods.handle_message(111, "joy", 1, current_time)
+    # a sampled message stands for 3 messages
+    guildmoods.handle_message(111, "anger", 2, current_time, weight=3.0)
+    assert guildmoods.get_user_mood(111) == {"joie": 1.0, "colère": 3.0}
+    assert guildmoods.get_guild_pov() == {"Subjectif": 4.0, "Objectif": 0}
+    assert guildmoods.get_user_positivity(111) == pytest.approx(0.8)
+
+
+def test_add_estimate():
+    from util.prefilter import Estimate
+
+    guildmoods = GuildMoods(None, None)
+    guildmoods.add_estimate(111, Estimate("joie", 0.9, 0.8), 1, datetime.now())
+    assert guildmoods.get_user_mood(111) == {"joie": 1}
+    assert guildmoods.get_user_positivity(111) == 0.9
+    assert guildmoods.get_message_pov(1, "mdr") == 0.8
+
+
+def test_concurrent_messages():
+    import sys
+    import threading
+
+    guildmoods = GuildMoods(None, None)
+    current_time = datetime.now()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    def add_messages(thread):
+        for i in range(500):
+            message_id = thread * 500 + i
+            guildmoods._add_message(thread, MessageMood(message_id, current_time, 0.5, ["joie", 0.9], 0.5))
+            if i % 5 == 0:
+                guildmoods.remove_message(message_id)
+
+    try:
+        threads = [threading.Thread(target=add_messages, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    # every index entry points to the row of its message
+    rows = sum(len(bucket.messages) for bucket in guildmoods.buckets.values())
+    assert rows == len(guildmoods.index) == guildmoods.guild_totals.count == 3200
+    for message_id, (slot, row) in guildmoods.index.items():
+        assert guildmoods.buckets[slot].messages.get_message(row).get_message_id() == message_id
@@ -0,0 +1,65 @@
+import pytest
+
+from core import ResultCache
+from util.prefilter import CALLS_PER_MESSAGE, MessagePrefilter, Verdict
+
+
+@pytest.fixture
+def prefilter():
+    return MessagePrefilter()
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["", "!help", "https://example.com/cat.gif", "<@1234> <#5678>", "Salut", "🦄", "..."],
+)
+def test_skip(prefilter, content):
+    assert prefilter.classify(content).verdict == Verdict.SKIP
+
+
+def test_estimate(prefilter):
+    result = prefilter.classify("😂😂")
+    assert result.verdict == Verdict.ESTIMATE
+    assert result.estimate.mood == "joie"
+    result = prefilter.classify("Ok 😭😭")
+    assert result.estimate.mood == "tristesse"
+    result = prefilter.classify("MDR")
+    assert result.verdict == Verdict.ESTIMATE
+    assert result.estimate.mood == "joie"
+    # with or without the variation selector
+    for content in ("❤️", "\u2764"):
+        result = prefilter.classify(content)
+        assert result.verdict == Verdict.ESTIMATE
+        assert result.estimate.mood == "amour"
+
+
+def test_analyze(prefilter):
+    result = prefilter.classify("J'ai peur de rater mon examen demain...")
+    assert result.verdict == Verdict.ANALYZE
+    assert result.estimate is None
+    assert prefilter.classify("ok 😂 je suis trop content").verdict == Verdict.ANALYZE
+
+
+def test_stats(prefilter):
+    for content in ("", "mdr", "Je suis trop content de vous revoir !"):
+        prefilter.classify(content)
+    stats = prefilter.get_stats()
+    assert stats["messages"] == 3
+    assert stats["skipped"] == 1
+    assert stats["estimated"] == 1
+    assert stats["analyzed"] == 1
+    assert stats["saved_calls"] == 2 * CALLS_PER_MESSAGE
+    assert stats["saved_ratio"] == pytest.approx(2 / 3)
+
+
+def test_saved_calls_cached():
+    cache = ResultCache()
+    prefilter = MessagePrefilter(cache)
+    # the results of the models are already cached for this message
+    cache.set("mood", "mdr", [{"label": "joy", "score": 0.9}])
+    cache.set("mbti", "mdr", {"ENFP": 0.8})
+    prefilter.classify("mdr")
+    assert prefilter.get_stats()["saved_calls"] == 1
+    prefilter.classify("Salut")
+    assert prefilter.get_stats()["saved_calls"] == 1 + CALLS_PER_MESSAGE
+    assert cache.get_stats()["misses"] == 0
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from util.progress import SharedProgress, ThrottledMessage
+
+
+class FakeMessage:
+    def __init__(self):
+        self.contents = []
+
+    async def edit(self, content):
+        self.contents.append(content)
+
+
+@pytest.mark.asyncio
+async def test_throttled_updates():
+    message = FakeMessage()
+    reply = ThrottledMessage(message, interval=0.05)
+    reply.update("a")
+    await asyncio.sleep(0.01)
+    # the next contents wait for the interval, only the last one is sent
+    reply.update("b")
+    reply.update("c")
+    await asyncio.sleep(0.1)
+    assert message.contents == ["a", "c"]
+    assert (reply.edits, reply.skipped) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_throttled_close():
+    message = FakeMessage()
+    reply = ThrottledMessage(message, interval=0.05, max_length=5)
+    reply.update("a")
+    await asyncio.sleep(0.01)
+    reply.update("b")
+    await reply.close("final content")
+    # the pending content is dropped for the final one
+    assert message.contents == ["a", "final"]
+    assert (reply.edits, reply.skipped) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_shared_progress():
+    first, second = FakeMessage(), FakeMessage()
+    progress = SharedProgress()
+    progress.add(ThrottledMessage(first, interval=0))
+    progress.update("a")
+    # a reply which joins later starts from the last content
+    progress.add(ThrottledMessage(second, interval=0))
+    await asyncio.sleep(0.01)
+    progress.update("b")
+    await asyncio.sleep(0.01)
+    assert first.contents == ["a", "b"]
+    assert second.contents == ["a", "b"]
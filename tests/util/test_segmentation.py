@@ -0,0 +1,99 @@
+from util.segmentation import ChatMessage, ConversationSegmenter, ReplyThreader
+from util.summary import Summarizer
+from tests.util.test_summary import messages, messages_semantic
+
+
+def test_segment():
+    conversations = ConversationSegmenter().segment(messages())
+    assert [len(c) for c in conversations] == [12, 4]
+    assert "pâtisserie" in conversations[1][0][1]
+
+
+def test_segment_semantic():
+    conversations = ConversationSegmenter().segment(messages_semantic())
+    assert len(conversations) == 1
+
+
+def test_segment_newest_first():
+    conversations = ConversationSegmenter().segment(messages()[::-1])
+    assert [len(c) for c in conversations] == [12, 4]
+    # the messages of a conversation are in time order
+    times = [message[2] for message in conversations[0]]
+    assert times == sorted(times)
+
+
+def test_segment_max_gap():
+    msgs = [("a", "le master", 0), ("b", "le master", 10), ("a", "le master", 5000)]
+    conversations = ConversationSegmenter(max_gap=1800).segment(msgs)
+    assert [len(c) for c in conversations] == [2, 1]
+
+
+def test_segment_interleaved_topics():
+    msgs = [
+        ("a", "le match de foot était incroyable", 0),
+        ("b", "une recette du gâteau au chocolat", 5),
+        ("c", "ce match de foot était nul", 10),
+        ("d", "mon gâteau au chocolat est trop cuit", 15),
+        ("e", "😂", 16),
+    ]
+    conversations = ConversationSegmenter().segment(msgs)
+    # close messages without any common word are not linked, the emoji
+    # follows the message just before
+    assert [[m[0] for m in c] for c in conversations] == [["a", "c"], ["b", "d", "e"]]
+
+
+def test_segment_empty():
+    segmenter = ConversationSegmenter()
+    assert segmenter.segment([]) == []
+    assert segmenter.segment([("a", "...", 0), ("b", "!!", 1)]) == [
+        [("a", "...", 0), ("b", "!!", 1)]
+    ]
+
+
+def test_thread_replies_and_mentions():
+    msgs = [
+        ChatMessage("a", "qui vient ce soir ?", 0, 1),
+        ChatMessage("b", "le master est dur", 300, 2),
+        ChatMessage("c", "moi je viens", 600, 3, reply_to=1),
+        ChatMessage("d", "pareil pour le master", 900, 4, mentions=("b",)),
+        ChatMessage("e", "il pleut", 1200, 5),
+    ]
+    threads, unlinked = ReplyThreader().thread(msgs)
+    assert sorted([m.id for m in t] for t in threads) == [[1, 3], [2, 4]]
+    assert [m.id for m in unlinked] == [5]
+
+
+def test_thread_turns():
+    msgs = [("a", "1", 0), ("b", "2", 30), ("a", "3", 60), ("c", "4", 90), ("c", "5", 100),
+            ("a", "6", 1000)]
+    threads, unlinked = ReplyThreader(turn_gap=120).thread(msgs)
+    assert [[m[1] for m in t] for t in threads] == [["1", "2", "3"], ["4", "5"]]
+    assert unlinked == [("a", "6", 1000)]
+
+
+def test_thread_mention_max_gap():
+    msgs = [ChatMessage("a", "x", 0, 1), ChatMessage("b", "y", 5000, 2, mentions=("a",))]
+    threads, unlinked = ReplyThreader(max_gap=1800).thread(msgs)
+    assert threads == []
+    assert len(unlinked) == 2
+
+
+def test_summarizer_threading(mocker):
+    summarizer = Summarizer(None, None)
+    msgs = [
+        ChatMessage("a", "qui vient ce soir ?", 0, 1),
+        ChatMessage("b", "le master est dur", 300, 2),
+        ChatMessage("c", "moi je viens", 600, 3, reply_to=1),
+        ChatMessage("d", "il pleut", 900, 4),
+    ]
+    segment = mocker.spy(summarizer, "segment")
+    conversations = summarizer.get_conversations(msgs[::-1])
+    # only the unlinked messages are clustered
+    segment.assert_called_once_with([msgs[1], msgs[3]])
+    assert [m.id for m in conversations[0]] == [1, 3]
+    assert sum(len(c) for c in conversations) == 4
+
+
+def test_summarizer_without_threading():
+    summarizer = Summarizer(None, None, threading=False)
+    assert summarizer.get_conversations(messages()) == summarizer.segment(messages())
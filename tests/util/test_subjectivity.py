@@ -0,0 +1,41 @@
+import pytest
+from textblob import Blobber
+from textblob_fr import PatternTagger, PatternAnalyzer
+
+from util.subjectivity import SubjectivityScorer
+
+MESSAGES = [
+    "joyeux",
+    "C'est vraiment un très bon film !",
+    "Je ne suis pas content du tout...",
+    "L’équipe n’est jamais à l’heure (!)",
+    "QU’IL est beau ce bateau :) :-(",
+    "Rendez-vous à 18h avec M. Dupont, etc.",
+    "bon\n\nmauvais\r\nhorrible",
+    "« Quelle merveilleuse journée » dit-il",
+    "",
+    "https://example.com",
+]
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    return SubjectivityScorer()
+
+
+@pytest.mark.parametrize("text", MESSAGES)
+def test_same_scores_as_textblob(scorer, text):
+    blobber = Blobber(pos_tagger=PatternTagger(), analyzer=PatternAnalyzer())
+    assert scorer.score(text) == pytest.approx(blobber(text).sentiment[1], abs=1e-12)
+
+
+def test_tokenize(scorer):
+    assert scorer.tokenize("l’amour, c'est beau :) !") == ["l’", "amour", ",", "c", "'", "est", "beau", ":)", "!"]
+    # like textblob-fr, the uppercase elisions are not joined back
+    assert scorer.tokenize("L’amour") == ["l&rsquo", ";", "amour"]
+
+
+def test_score_many(scorer):
+    texts = MESSAGES + MESSAGES[:3]
+    assert scorer.score_many(texts) == [scorer.score(text) for text in texts]
+    assert scorer.score_many([]) == []
@@ -1,6 +1,7 @@
 import pytest
+import time
 from typing import Dict
-from util.summary import Summarizer  # Noqa
+from util.summary import Analysis, Summarizer  # Noqa
 
 
 # Pipeline tools
@@ -17,6 +18,11 @@ def summary_pipeline_output(text: str):
     return res
 
 
+def batch_output(output):
+    # the pipeline returns one result by text of the batch
+    return lambda texts, **kwargs: output * len(texts)
+
+
 # Fixture
 
 @pytest.fixture
@@ -239,7 +245,7 @@ def test_topics_last(mocker, summarizer_instance):
         "Societe": 0.11,
         "Supertopic": 0.02
     })
-    mocker.patch.object(summarizer_instance, "pipeline_topics", return_value=expected)
+    mocker.patch.object(summarizer_instance, "pipeline_topics", side_effect=batch_output(expected))
     # test
     topics = summarizer_instance.topics_last(messages())
     assert topics.get("Autres") > 0.1
@@ -258,7 +264,7 @@ def test_topics(mocker, summarizer_instance):
         "Culture": 0.06,
         "Supertopic": 0.02
     })
-    mocker.patch.object(summarizer_instance, "pipeline_topics", return_value=expected)
+    mocker.patch.object(summarizer_instance, "pipeline_topics", side_effect=batch_output(expected))
     # test
     topics = summarizer_instance.topics(messages())
     print(topics)
@@ -269,7 +275,7 @@ def test_topics(mocker, summarizer_instance):
 
 def test_summary_last(mocker, summarizer_instance):
     expected = summary_pipeline_output("J'aime les macarons et les tartes!")
-    mocker.patch.object(summarizer_instance, "pipeline_summary", return_value=expected)
+    mocker.patch.object(summarizer_instance, "pipeline_summary", side_effect=batch_output(expected))
     # test
     summary_last = summarizer_instance.summarize_last(messages())
     assert isinstance(summary_last, tuple)
@@ -283,7 +289,7 @@ def test_summary_last(mocker, summarizer_instance):
 
 def test_summary_all(mocker, summarizer_instance):
     expected = summary_pipeline_output("Je regarde les Master informatique en mangeant des croissants et une tarte.")
-    mocker.patch.object(summarizer_instance, "pipeline_summary", return_value=expected)
+    mocker.patch.object(summarizer_instance, "pipeline_summary", side_effect=batch_output(expected))
     # test
     summary_all = summarizer_instance.summarize_all(messages())
     assert isinstance(summary_all, tuple)
@@ -293,11 +299,200 @@ def test_summary_all(mocker, summarizer_instance):
     assert isinstance(users, list)
     assert "Master informatique" in text
     assert "croissants" in text
+
     assert "tarte" in text
     sentences = text.split('.')
     assert len(sentences) >= 2
 
 
+def test_analysis_shared(mocker, summarizer_instance):
+    mocker.patch.object(summarizer_instance, "pipeline_summary",
+                        side_effect=batch_output(summary_pipeline_output("Résumé")))
+    mocker.patch.object(summarizer_instance, "pipeline_topics",
+                        side_effect=batch_output(topic_pipeline_output({"Etudes": 0.8, "Cuisine": 0.2})))
+    get_conversations = mocker.spy(summarizer_instance, "get_conversations")
+    # test
+    analysis = summarizer_instance.analyze(messages())
+    assert summarizer_instance.analyze(analysis) is analysis
+    topics = summarizer_instance.topics_last(analysis)
+    text, users = summarizer_instance.summarize_last(analysis)
+    # the messages are clustered once for the topics and the summary
+    assert get_conversations.call_count == 1
+    assert topics == summarizer_instance.topics_last(messages())
+    expected_text, expected_users = summarizer_instance.summarize_last(messages())
+    assert text == expected_text
+    assert sorted(users) == sorted(expected_users)
+
+
+def test_batched_chunks(mocker):
+    summarizer = Summarizer(None, None, batch_size=2)
+    calls = []
+
+    def pipeline(texts, **kwargs):
+        calls.append(texts)
+        return [{"summary_text": f"<{text}>"} for text in texts]
+
+    summarizer.pipeline_summary = pipeline
+    chunks = ["ccc", "a", "bbbb", "dd", "e"]
+    # test
+    assert summarizer.summarize_chunks(chunks) == ["<ccc>", "<a>", "<bbbb>", "<dd>", "<e>"]
+    # the batches gather the chunks of similar lengths
+    assert calls == [["a", "e"], ["dd", "ccc"], ["bbbb"]]
+
+
+def test_select_salient():
+    summarizer = Summarizer(None, None, extractive_tokens=150)
+    conversation = messages()[:12] + [("YaBot", "lol", 1000000061.0), ("JBot", "https://example.com", 1000000062.0)]
+    # test
+    kept = summarizer.select_salient(conversation)
+    assert 0 < len(kept) < 12
+    # the kept messages keep their order and fit the budget
+    assert kept == [message for message in conversation if message in kept]
+    assert sum(summarizer.count_tokens_many("summary", [message[1] for message in kept])) <= 150
+    assert ("YaBot", "lol", 1000000061.0) not in kept
+    stats = summarizer.get_extractive_stats()
+    assert stats["conversations"] == 1
+    assert 0 < stats["reduction"] < 1
+
+
+def test_select_salient_disabled():
+    summarizer = Summarizer(None, None)
+    conversation = [("YaBot", "lol", 1.0)]
+    assert summarizer.select_salient(conversation) is conversation
+    # only messages without information, they are all kept
+    assert Summarizer(None, None, extractive_tokens=10).select_salient(conversation) == conversation
+
+
+def test_text_rank(summarizer_instance):
+    conversation = [("a", "le master est dur", 1.0), ("b", "le master est super", 2.0),
+                    ("c", "le master me plait", 3.0), ("d", "une tarte aux pommes", 4.0)]
+    scores = summarizer_instance.text_rank(conversation)
+    assert abs(scores.sum() - 1) < 1e-6
+    # the message closest to the others is the most central
+    assert scores.argmax() in (0, 1, 2)
+    assert scores[3] == scores.min()
+    assert list(summarizer_instance.text_rank([("a", "a", 1.0), ("b", "b", 2.0)])) == [0.5, 0.5]
+
+
+def test_summary_cache():
+    summarizer = Summarizer(None, None)
+    calls = []
+
+    def pipeline(texts, **kwargs):
+        calls.extend(texts)
+        return [{"summary_text": f"<{text.split()[1]}>"} for text in texts]
+
+    summarizer.pipeline_summary = pipeline
+    first = [("a", "premier", 1.0, 1), ("b", "deuxième", 2.0, 2)]
+    second = [("a", "troisième", 3.0, 3)]
+    # test
+    assert summarizer.summarize_conversations([first], 42) == ["<premier>"]
+    assert summarizer.summarize_conversations([first, second], 42) == ["<premier>", "<troisième>"]
+    # only the new conversation is summarized
+    assert len(calls) == 2
+    # an edited message, another channel or messages without id are summarized again
+    edited = [("a", "premier", 1.0, 1), ("b", "modifié", 2.0, 2)]
+    summarizer.summarize_conversations([edited], 42)
+    summarizer.summarize_conversations([first], 43)
+    summarizer.summarize_conversations([first], None)
+    assert len(calls) == 5
+    stats = summarizer.get_summary_cache_stats()
+    assert (stats["summaries"], stats["hits"], stats["misses"]) == (4, 1, 4)
+
+
+def test_summary_cache_chunks():
+    from util.chunking import TokenChunker
+
+    summarizer = Summarizer(None, None, chunker_factory=lambda name: TokenChunker(max_tokens=14, chars_per_token=1))
+    calls = []
+
+    def pipeline(texts, **kwargs):
+        calls.extend(texts)
+        return [{"summary_text": f"<{text}>"} for text in texts]
+
+    summarizer.pipeline_summary = pipeline
+    conversation = [("a", "un", 1.0, 1), ("b", "deux", 2.0, 2), ("a", "trois", 3.0, 3)]
+    # test
+    assert summarizer.summarize_conversations([conversation], 42) == ["<a: un\nb: deux><a: trois>"]
+    assert sorted(calls) == ["a: trois", "a: un\nb: deux"]
+    # the conversation grew, only its new tail is summarized
+    grown = conversation + [("b", "quatre", 4.0, 4)]
+    assert summarizer.summarize_conversations([grown], 42) == ["<a: un\nb: deux><a: trois><b: quatre>"]
+    assert calls[2:] == ["b: quatre"]
+    stats = summarizer.get_summary_cache_stats()
+    assert (stats["summaries"], stats["hits"], stats["misses"]) == (3, 2, 3)
+
+
+def test_summary_timeout():
+    summarizer = Summarizer(None, None, batch_size=1)
+    calls = []
+
+    def pipeline(texts, max_time=None, **kwargs):
+        calls.append(max_time)
+        # the generation stops at max_time with a truncated text
+        time.sleep(min(0.1, max_time or 0.1))
+        return [{"summary_text": f"<{text.split()[1]}>"} for text in texts]
+
+    summarizer.pipeline_summary = pipeline
+    first = [("a", "premier", 1.0, 1)]
+    second = [("b", "deuxième message", 2.0, 2), ("c", "encore le deuxième message", 3.0, 3)]
+    updates = []
+    # test
+    summaries = summarizer.summarize_conversations([first, second], 42, timeout=0.15, progress=updates.append)
+    # the generation of the second conversation is cut by the timeout, its central messages are kept
+    assert summaries == ["<premier>", "b: deuxième message c: encore le deuxième message"]
+    assert len(calls) == 2 and 0 < calls[1] < calls[0] <= 0.15
+    assert updates == [["<premier>", None]]
+    stats = summarizer.get_summary_cache_stats()
+    assert (stats["summaries"], stats["fallbacks"]) == (1, 1)
+    # without time left, every conversation is summarized by extracts
+    assert summarizer.summarize_conversations([second], 43, timeout=0)[0].startswith("b: ")
+    assert len(calls) == 2
+    # the extracts are not cached, the model summarizes the conversation later
+    assert summarizer.summarize_conversations([second], 42) == ["<deuxième>"]
+
+
+def test_summary_hierarchical():
+    summarizer = Summarizer(None, None, batch_size=4)
+    calls = []
+
+    def pipeline(texts, **kwargs):
+        calls.append(len(texts))
+        # each summary keeps the first word of each line
+        return [{"summary_text": " ".join(word for line in text.split("\n") for word in line.split()[:1])} for text in texts]
+
+    summarizer.pipeline_summary = pipeline
+    levels = []
+    msgs = [(f"U{i % 3}", f"message {i} " + "mot " * 100, 1000.0 + i, i) for i in range(30)]
+    # one conversation by message
+    analysis = Analysis(msgs, [[message] for message in msgs])
+    # test
+    summary, users = summarizer.summarize_hierarchical(
+        analysis, fan_out=4, output_tokens=5, progress=lambda depth, text: levels.append((depth, text)))
+    assert sorted(users) == ["U0", "U1", "U2"]
+    # the first level is also sent after each of its batches
+    assert [depth for depth, _ in levels] == [1] * 9 + [2, 3]
+    assert levels[-1][1] == summary
+    # the levels are summarized in batches
+    assert calls == [4, 4, 4, 4, 4, 4, 4, 2, 4, 4, 2]
+    assert summarizer.summarize_hierarchical([]) == (None, [])
+
+
+def test_summary_hierarchical_budgets():
+    summarizer = Summarizer(None, None)
+    summarizer.pipeline_summary = lambda texts, **kwargs: [{"summary_text": text} for text in texts]
+    msgs = [("U", f"message {i} " + "mot " * 100, 1000.0 + i, i) for i in range(10)]
+    msgs = Analysis(msgs, [[message] for message in msgs])
+    levels = []
+    progress = lambda depth, text: levels.append(depth)
+    summarizer.summarize_hierarchical(msgs, max_depth=2, progress=progress)
+    assert levels == [1, 1, 1, 2]
+    levels.clear()
+    # no level is started after the time budget
+    summarizer.summarize_hierarchical(msgs, time_budget=0, progress=progress)
+    assert levels == [1, 1, 1]
+
+
 ###################
 #CLUSTERING_NORMAL#    
 ###################
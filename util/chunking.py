@@ -0,0 +1,148 @@
+import math
+
+
+class TokenChunker:
+    """
+    Split a conversation into chunks which fit the token budget of a model.
+    The lines are packed into as few chunks as possible, a line longer than the
+    budget is split between its words. The tokens are counted by the tokenizer
+    of the model, or estimated from the number of characters in the fast
+    approximate mode.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens=512, overlap=0, approximate=False, chars_per_token=3.0):
+        """
+        :param tokenizer: Tokenizer of the model, the tokens are estimated without it
+        :type tokenizer: Optional[PreTrainedTokenizer]
+        :param max_tokens: Maximal number of tokens of a chunk
+        :type max_tokens: int
+        :param overlap: Number of tokens of the last lines of a chunk repeated at the start of the next one
+        :type overlap: int
+        :param approximate: Estimate the tokens from the number of characters
+        :type approximate: bool
+        :param chars_per_token: Number of characters of a token in the approximate mode
+        :type chars_per_token: float
+        """
+        if overlap >= max_tokens:
+            raise ValueError("The overlap must be smaller than the maximal number of tokens.")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.approximate = approximate or tokenizer is None
+        self.chars_per_token = chars_per_token
+
+    def count(self, texts):
+        """
+        Count the tokens of the texts, without the special tokens.
+
+        :type texts: List[str]
+        :rtype: List[int]
+        """
+        if not texts:
+            return []
+        if self.approximate:
+            return [math.ceil(len(text) / self.chars_per_token) for text in texts]
+        encodings = self.tokenizer(texts, add_special_tokens=False)
+        return [len(ids) for ids in encodings["input_ids"]]
+
+    def __split_line(self, line, index):
+        """
+        Split a line longer than the budget between its words.
+
+        :type line: str
+        :param index: Index of the line
+        :type index: int
+        :return: The parts of the line, their number of tokens and the index of the line
+        :rtype: List[Tuple[str, int, int]]
+        """
+        words = line.split()
+        parts = []
+        for word, tokens in zip(words, self.count(words)):
+            if tokens <= self.max_tokens:
+                parts.append((word, tokens, index))
+                continue
+            # a word alone is too long, it is cut at the estimated budget
+            size = max(1, int(len(word) * self.max_tokens / tokens))
+            for start in range(0, len(word), size):
+                parts.append((word[start:start + size], math.ceil(tokens * size / len(word)), index))
+        # the spaces are part of the tokens of the words
+        return [(text, tokens, index) for text, tokens, index, _ in self.__pack(parts, " ", 0, 0)]
+
+    def __pack(self, parts, separator, separator_tokens, overlap):
+        """
+        Pack the parts into as few pieces of the budget as possible.
+
+        :param parts: Texts, their number of tokens and the index of their line
+        :type parts: List[Tuple[str, int, int]]
+        :param separator: Text between two parts
+        :type separator: str
+        :param separator_tokens: Number of tokens of the separator
+        :type separator_tokens: int
+        :param overlap: Number of tokens repeated from one piece to the next
+        :type overlap: int
+        :return: The pieces, their number of tokens and the indices of their first and last lines
+        :rtype: List[Tuple[str, int, int, int]]
+        """
+        pieces = []
+        current, size = [], 0
+        for part in parts:
+            if current and size + separator_tokens + part[1] > self.max_tokens:
+                pieces.append(self.__join(current, separator, size))
+                # the last parts start the next piece
+                kept, kept_size = [], 0
+                for previous in reversed(current):
+                    added = previous[1] + separator_tokens
+                    if kept_size + added > overlap or kept_size + added + part[1] > self.max_tokens:
+                        break
+                    kept.insert(0, previous)
+                    kept_size += added
+                current, size = kept, kept_size
+            elif current:
+                size += separator_tokens
+            size += part[1]
+            current.append(part)
+        if current:
+            pieces.append(self.__join(current, separator, size))
+        return pieces
+
+    @staticmethod
+    def __join(parts, separator, size):
+        """
+        Join the parts of a piece.
+
+        :type parts: List[Tuple[str, int, int]]
+        :type separator: str
+        :type size: int
+        :rtype: Tuple[str, int, int, int]
+        """
+        return separator.join(part[0] for part in parts), size, parts[0][2], parts[-1][2]
+
+    def split(self, text):
+        """
+        Split the lines of the text into chunks of the budget.
+
+        :param text: Text to split, one message by line
+        :type text: str
+        :return: The chunks
+        :rtype: List[str]
+        """
+        return [chunk for chunk, _ in self.split_lines(text.split("\n"))]
+
+    def split_lines(self, lines):
+        """
+        Split the lines into chunks of the budget, the blank lines are dropped.
+
+        :param lines: Lines to split, without line break
+        :type lines: List[str]
+        :return: The chunks and the indices of the lines of each chunk
+        :rtype: List[Tuple[str, range]]
+        """
+        indices = [i for i, line in enumerate(lines) if line.strip()]
+        parts = []
+        for i, tokens in zip(indices, self.count([lines[i] for i in indices])):
+            if tokens <= self.max_tokens:
+                parts.append((lines[i], tokens, i))
+            else:
+                parts.extend(self.__split_line(lines[i], i))
+        # one token for the line break
+        return [(chunk, range(first, last + 1)) for chunk, _, first, last in self.__pack(parts, "\n", 1, self.overlap)]
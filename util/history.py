@@ -0,0 +1,186 @@
+from bisect import bisect_left
+from collections import OrderedDict, deque
+
+
+class ChannelBuffer:
+    """
+    The most recent message records of a channel, sorted by id. Every accepted
+    message sent after the message since is in the buffer.
+    """
+
+    def __init__(self, since):
+        self.records = deque()
+        self.since = since
+        # the buffer holds at least the messages of the last API history walk
+        self.backfilled = False
+
+
+class ChannelHistory:
+    """
+    Bounded cache of the recent messages of each channel, so the summary
+    commands do not walk the channel history through the API. The buffers are
+    filled by the live messages and backfilled from the API on a miss. A read is
+    a hit only when the buffer holds every message it asks for.
+    """
+
+    def __init__(self, capacity=500, max_channels=1000):
+        """
+        :param capacity: Number of messages kept by channel
+        :type capacity: int
+        :param max_channels: Number of channels kept, the least recently used are dropped
+        :type max_channels: int
+        """
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.__buffers = OrderedDict()  # Type: OrderedDict[int, ChannelBuffer]
+        self.hits = 0
+        self.misses = 0
+
+    def __get_buffer(self, channel_id, since):
+        """
+        Returns the buffer of the channel, created if needed.
+
+        :param since: Id after which the new buffer is complete
+        :type since: int
+        :rtype: ChannelBuffer
+        """
+        buffer = self.__buffers.get(channel_id)
+        if buffer is None:
+            buffer = self.__buffers[channel_id] = ChannelBuffer(since)
+            if len(self.__buffers) > self.max_channels:
+                self.__buffers.popitem(last=False)
+        self.__buffers.move_to_end(channel_id)
+        return buffer
+
+    def __trim(self, buffer):
+        """
+        Drop the oldest records above the capacity.
+
+        :type buffer: ChannelBuffer
+        """
+        while len(buffer.records) > self.capacity:
+            buffer.since = buffer.records.popleft()[3]
+
+    def add(self, channel_id, record):
+        """
+        Add a live message to the buffer of its channel.
+
+        :param channel_id: Id of the channel
+        :type channel_id: int
+        :param record: The message, as an (author, content, time, id, ...) tuple
+        :type record: tuple
+        """
+        buffer = self.__get_buffer(channel_id, record[3] - 1)
+        if buffer.records and buffer.records[-1][3] >= record[3]:
+            # a late message, it may have been backfilled already
+            if record[3] > buffer.since:
+                i = bisect_left([existing[3] for existing in buffer.records], record[3])
+                if buffer.records[i][3] != record[3]:
+                    buffer.records.insert(i, record)
+                    self.__trim(buffer)
+            return
+        buffer.records.append(record)
+        self.__trim(buffer)
+
+    def backfill(self, channel_id, records, since):
+        """
+        Merge the messages fetched from the API into the buffer of the channel.
+
+        :param channel_id: Id of the channel
+        :type channel_id: int
+        :param records: The fetched messages, in any order
+        :type records: List[tuple]
+        :param since: Id after which every message has been fetched, 0 for the whole channel
+        :type since: int
+        """
+        buffer = self.__get_buffer(channel_id, since)
+        merged = {record[3]: record for record in buffer.records}
+        for record in records:
+            merged[record[3]] = record
+        newest = max((record[3] for record in records), default=since)
+        if not buffer.records or newest >= buffer.since:
+            # the fetched messages reach the buffer, there is no gap between them
+            buffer.since = min(buffer.since, since)
+            buffer.backfilled = True
+        buffer.records = deque(merged[i] for i in sorted(merged) if i > buffer.since)
+        self.__trim(buffer)
+
+    def update(self, channel_id, record):
+        """
+        Replace an edited message, if it is in the buffer.
+
+        :type channel_id: int
+        :param record: The edited message
+        :type record: tuple
+        """
+        buffer = self.__buffers.get(channel_id)
+        if buffer is None:
+            return
+        for i, existing in enumerate(buffer.records):
+            if existing[3] == record[3]:
+                buffer.records[i] = record
+                return
+
+    def remove(self, channel_id, message_id):
+        """
+        Remove a deleted message, if it is in the buffer.
+
+        :type channel_id: int
+        :type message_id: int
+        """
+        buffer = self.__buffers.get(channel_id)
+        if buffer is not None:
+            buffer.records = deque(r for r in buffer.records if r[3] != message_id)
+
+    def get(self, channel_id, after=None, limit=100):
+        """
+        Returns the messages of the channel like the API history: the last
+        messages from the newest one, or the first messages after a message from
+        the oldest one. The limit only counts the cached messages, so a hit may
+        return more messages than the API, which also counts the ignored ones.
+
+        :param channel_id: Id of the channel
+        :type channel_id: int
+        :param after: Id of the message after which the messages are read
+        :type after: Optional[int]
+        :param limit: Maximal number of messages
+        :type limit: int
+        :return: The messages, or None if the buffer does not hold all of them
+        :rtype: Optional[List[tuple]]
+        """
+        buffer = self.__buffers.get(channel_id)
+        res = None
+        if buffer is not None:
+            records = buffer.records
+            if after is None:
+                if len(records) >= limit or buffer.backfilled:
+                    res = list(records)[::-1][:limit]
+            elif after >= buffer.since:
+                res = [record for record in records if record[3] > after][:limit]
+        if res is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.__buffers.move_to_end(channel_id)
+        return res
+
+    def clear(self):
+        """
+        Forget all the messages, when some of them may have been missed.
+        """
+        self.__buffers.clear()
+
+    def get_stats(self):
+        """
+        Returns the size of the cache and its hit ratio.
+
+        :rtype: dict
+        """
+        reads = self.hits + self.misses
+        return {
+            'channels': len(self.__buffers),
+            'messages': sum(len(buffer.records) for buffer in self.__buffers.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / reads if reads else 0.0,
+        }
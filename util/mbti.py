@@ -1,45 +1,71 @@
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from transformers import pipeline
 from collections import defaultdict
 
 
 class GuildMBTI:
-    def __init__(self, pipeline_mbti: pipeline, translator: pipeline) -> None:
+    def __init__(self, pipeline_mbti: pipeline, translator: pipeline, cache=None) -> None:
         """
         Initialize the GuildMBTI class with the specified pipeline and translator.
 
         Args:
             pipeline_mbti (pipeline): The MBTI classification pipeline.
             translator (pipeline): The translator pipeline.
+            cache (ResultCache): The cache of the model results, or None.
         """
         self.pipeline_mbti = pipeline_mbti  # Type: pipeline
         self.translator = translator  # Type: Translator
+        self.cache = cache  # Type: ResultCache
         self.user_mbtis = {}  # Type: Dict[int, dict[str, float]]
-        self.message_counters = defaultdict(int)  # Type: Dict[int, int]
+        self.message_counters = defaultdict(float)  # Type: Dict[int, float]
 
-    def handle_message(self, user_id: int, msg_content: str) -> None:
+    def handle_message(self, user_id: int, msg_content: str, weight: float = 1.0) -> None:
         """
         Handle a new message by updating the MBTI distribution data for the user.
 
         Args:
             user_id (int): The ID of the message author.
             msg_content (str): The content of the message.
+            weight (float): The number of messages this one stands for when the messages are sampled.
         """
-        self.message_counters[user_id] += 1
-
         mbti_result = self.get_message_mbti(msg_content)
+        self._add_result(user_id, mbti_result, weight)
+
+    def handle_messages(self, messages: List[Tuple[int, str]], weights: Optional[List[float]] = None) -> None:
+        """
+        Handle a batch of messages, the texts are translated and classified together.
+
+        Args:
+            messages (list): The messages as (user_id, msg_content) tuples.
+            weights (list): The weight of each message, 1 by default.
+        """
+        weights = weights or [1.0] * len(messages)
+        results = self.get_messages_mbti([content for _, content in messages])
+        for (user_id, _), mbti_result, weight in zip(messages, results, weights):
+            self._add_result(user_id, mbti_result, weight)
+
+    def _add_result(self, user_id: int, mbti_result: dict[str, float], weight: float = 1.0) -> None:
+        """
+        Update the MBTI distribution of the user with the result of a message.
+
+        Args:
+            user_id (int): The ID of the message author.
+            mbti_result (dict): The MBTI classification result of the message.
+            weight (float): The weight of the message.
+        """
+        self.message_counters[user_id] += weight
 
         if user_id in self.user_mbtis:
             user_result = self.user_mbtis[user_id]
-            merged_result = self._merge_mbti_results(user_id, user_result, mbti_result)
+            merged_result = self._merge_mbti_results(user_id, user_result, mbti_result, weight)
             self.user_mbtis[user_id] = merged_result
 
         else:
             self.user_mbtis[user_id] = mbti_result
 
-    def _merge_mbti_results(self, user_id: int, existing_result: dict[str, float], new_result: dict[str, float]) -> (
-            dict)[str, float]:
+    def _merge_mbti_results(self, user_id: int, existing_result: dict[str, float], new_result: dict[str, float],
+                            weight: float = 1.0) -> dict[str, float]:
         """
         Merge two MBTI classification results.
 
@@ -47,20 +73,38 @@ class GuildMBTI:
             existing_result (dict): The existing MBTI classification result.
             new_result (dict): The new MBTI classification result to merge.
             user_id (int): The ID of the user.
+            weight (float): The weight of the new result.
 
         Returns:
             dict: The merged MBTI classification result.
         """
+        # message_counters is the total weight of the user messages, new one included
+        total = self.message_counters[user_id]
         merged_result = {}
         for mbti_type, score in new_result.items():
-            merged_result[mbti_type] = ((self.message_counters[user_id] - 1) * existing_result.get(mbti_type, 0) +
-                                        score) / self.message_counters[user_id]
+            merged_result[mbti_type] = ((total - weight) * existing_result.get(mbti_type, 0) +
+                                        weight * score) / total
         return merged_result
 
     def get_message_mbti(self, msg_content: str) -> dict[str, float]:
         """
         Get MBTI classification for a message.
 
+        Args:
+            msg_content (str): The content of the message.
+
+        Returns:
+            dict: The MBTI classification result.
+        """
+        if self.cache is None:
+            return self._classify(msg_content)
+        # the cached result also saves the translation
+        return self.cache.get_or_compute("mbti", msg_content, self._classify)
+
+    def _classify(self, msg_content: str) -> dict[str, float]:
+        """
+        Translate and classify a message with the MBTI model.
+
         Args:
             msg_content (str): The content of the message.
 
@@ -75,6 +119,41 @@ class GuildMBTI:
 
         return mbti_result
 
+    def get_messages_mbti(self, msg_contents: List[str]) -> List[dict[str, float]]:
+        """
+        Get MBTI classification for several messages with batched inference.
+
+        Args:
+            msg_contents (list): The contents of the messages.
+
+        Returns:
+            list: The MBTI classification result of each message.
+        """
+        if self.cache:
+            results = [self.cache.get("mbti", content) for content in msg_contents]
+        else:
+            results = [None] * len(msg_contents)
+
+        missing = list(dict.fromkeys(
+            content for content, result in zip(msg_contents, results) if result is None
+        ))
+        if not missing:
+            return results
+
+        translated_messages = self.translator.translate_many(missing)
+        outputs = self.pipeline_mbti(translated_messages, top_k=None, batch_size=len(missing))
+
+        computed = {}
+        for content, output in zip(missing, outputs):
+            computed[content] = {res["label"]: res["score"] for res in output}
+            if self.cache:
+                self.cache.set("mbti", content, computed[content])
+
+        return [
+            computed[content] if result is None else result
+            for content, result in zip(msg_contents, results)
+        ]
+
     def get_user_mbti(self, user_id: int) -> Optional[str]:
         """
         Get the dominant MBTI type for a user.
@@ -1,8 +1,10 @@
 from collections import defaultdict
-from textblob_fr import PatternTagger, PatternAnalyzer
-from textblob import Blobber
+import threading
 from datetime import datetime, timedelta
 from enum import Enum
+import numpy as np
+
+from util.subjectivity import SubjectivityScorer
 
 
 class Mood(Enum):
@@ -14,10 +16,15 @@ class Mood(Enum):
     FEAR = 'peur'
 
 
+# the code of each mood in the message store, in the order of the enum
+MOOD_LABELS = [mood.value for mood in Mood]
+MOOD_CODES = {label: code for code, label in enumerate(MOOD_LABELS)}
+
+
 class MessageMood:
     """Class to represent message mood."""
 
-    def __init__(self, message_id, time, pov, mood, positivity):
+    def __init__(self, message_id, time, pov, mood, positivity, weight=1.0):
         """
         Initializes a MessageMood object.
 
@@ -31,12 +38,15 @@ class MessageMood:
         @type mood: list [label,score(float)]
         @param positivity: The positivity of the message.
         @type positivity: float
+        @param weight: The number of messages this one stands for when the messages are sampled.
+        @type weight: float
         """
         self.__message_id = message_id
         self.__time = time
         self.__pov = pov
         self.__mood = mood
         self.__positivity = positivity
+        self.__weight = weight
 
     def get_message_id(self):
         """Returns the ID of the message."""
@@ -58,18 +68,309 @@ class MessageMood:
         """Returns the positivity of the message."""
         return self.__positivity
 
+    def get_weight(self):
+        """Returns the weight of the message in the aggregates."""
+        return self.__weight
+
+
+class MoodStore:
+    """
+    Columnar store of the analyzed messages of a guild: one array by field
+    instead of one object by message, so the statistics are computed by
+    vectorized reductions. The arrays double their capacity when they are full.
+    """
+
+    COLUMNS = (
+        ('message_id', np.int64),
+        ('author', np.int32),  # index of the author in authors
+        ('time', np.float64),  # POSIX timestamp
+        ('pov', np.float64),
+        ('positivity', np.float64),
+        ('mood', np.int8),  # index of the label in MOOD_LABELS
+        ('mood_score', np.float64),
+        ('weight', np.float64),
+    )
+
+    def __init__(self, capacity=16):
+        """
+        @param capacity: The number of messages stored before the first growth.
+        @type capacity: int
+        """
+        self.size = 0
+        self.__columns = {name: np.empty(capacity, dtype) for name, dtype in self.COLUMNS}
+        # the author ids, by author index
+        self.authors = []
+        self.__author_index = {}
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        """
+        Returns the values of a column for the stored messages, as a view.
+
+        @param name: The name of the column.
+        @type name: str
+        @rtype: numpy.ndarray
+        """
+        return self.__columns[name][:self.size]
+
+    def get_author_index(self, author_id):
+        """
+        Returns the index of an author in the author column, None if unknown.
+
+        @type author_id: int
+        @rtype: int or None
+        """
+        return self.__author_index.get(author_id)
+
+    def append(self, author_id, message):
+        """
+        Stores a message.
+
+        @param author_id: The ID of the message author.
+        @type author_id: int
+        @param message: The analyzed message.
+        @type message: MessageMood
+        """
+        if self.size == len(self.__columns['message_id']):
+            for name, column in self.__columns.items():
+                grown = np.empty(max(1, 2 * len(column)), column.dtype)
+                grown[:self.size] = column
+                self.__columns[name] = grown
+        author = self.__author_index.get(author_id)
+        if author is None:
+            author = self.__author_index[author_id] = len(self.authors)
+            self.authors.append(author_id)
+        label, score = message.get_mood()
+        values = (message.get_message_id(), author, message.get_time().timestamp(), message.get_pov(),
+                  message.get_positivity(), MOOD_CODES[label], score, message.get_weight())
+        for (name, _), value in zip(self.COLUMNS, values):
+            self.__columns[name][self.size] = value
+        self.size += 1
+
+    def keep(self, mask):
+        """
+        Keeps only the messages selected by the mask, in the same order.
+
+        @param mask: One boolean by stored message.
+        @type mask: numpy.ndarray
+        """
+        count = int(np.count_nonzero(mask))
+        for column in self.__columns.values():
+            column[:count] = column[:self.size][mask]
+        self.size = count
+
+    def shrink(self):
+        """
+        Releases the unused capacity of the columns, once no message is added anymore.
+        """
+        for name, column in self.__columns.items():
+            if len(column) > self.size:
+                self.__columns[name] = column[:self.size].copy()
+
+    def get_message(self, row):
+        """
+        Returns a stored message as a MessageMood.
+
+        @param row: The position of the message in the columns.
+        @type row: int
+        @rtype: MessageMood
+        """
+        columns = self.__columns
+        return MessageMood(message_id=int(columns['message_id'][row]),
+                           time=datetime.fromtimestamp(columns['time'][row]),
+                           pov=float(columns['pov'][row]),
+                           mood=[MOOD_LABELS[columns['mood'][row]], float(columns['mood_score'][row])],
+                           positivity=float(columns['positivity'][row]),
+                           weight=float(columns['weight'][row]))
+
+
+def to_ratio(value):
+    """
+    Converts a float to a fraction numerator / 2 ** bits, without rounding.
+
+    @type value: float
+    @return: The numerator and the bits of the denominator.
+    @rtype: tuple[int, int]
+    """
+    numerator, denominator = float(value).as_integer_ratio()
+    return numerator, denominator.bit_length() - 1
+
+
+class MoodTotals:
+    """
+    Running weighted sums of the scores of a set of messages. The sums are
+    exact integer numerators over a common power of two, so after removing
+    messages they are the same as if only the remaining messages had been
+    added, whatever the order.
+
+    The averages are the exact weighted means correctly rounded. The float
+    sums of the messages computed before had their own rounding errors, so
+    the averages may differ from them in the last bits: by at most n * 2 ** -52
+    relatively, n being the number of messages. The counts of the subjective,
+    positive and mood weights are the same when the weights are integers.
+    """
+
+    SUMS = ('activity', 'pov', 'positivity', 'subjective', 'positive')
+
+    def __init__(self):
+        self.count = 0
+        # the sums are numerators of fractions over 2 ** bits
+        self.bits = 0
+        self.activity = 0
+        self.pov = 0
+        self.positivity = 0
+        self.subjective = 0
+        self.positive = 0
+        self.moods = [0] * len(MOOD_LABELS)
+
+    def __rescale(self, bits):
+        """
+        Raises the denominator of the sums to 2 ** bits.
+
+        @type bits: int
+        """
+        shift = bits - self.bits
+        for name in self.SUMS:
+            setattr(self, name, getattr(self, name) << shift)
+        self.moods = [total << shift for total in self.moods]
+        self.bits = bits
+
+    def __to_numerators(self, *values):
+        """
+        Converts floats to numerators over the denominator of the sums.
+
+        @type values: float
+        @rtype: list[int]
+        """
+        ratios = [to_ratio(value) for value in values]
+        bits = max(bits for _, bits in ratios)
+        if bits > self.bits:
+            self.__rescale(bits)
+        return [numerator << (self.bits - bits) for numerator, bits in ratios]
+
+    def add(self, pov, positivity, mood, weight, sign=1):
+        """
+        Adds a message to the sums, or removes it with a sign of -1.
+
+        @param pov: The point of view of the message.
+        @type pov: float
+        @param positivity: The positivity of the message.
+        @type positivity: float
+        @param mood: The code of the mood of the message.
+        @type mood: int
+        @param weight: The weight of the message.
+        @type weight: float
+        @param sign: 1 to add the message, -1 to remove it.
+        @type sign: int
+        """
+        pov_score, positivity_score, exact_weight = self.__to_numerators(pov * weight, positivity * weight, weight)
+        exact_weight *= sign
+        self.count += sign
+        self.activity += exact_weight
+        self.pov += sign * pov_score
+        self.positivity += sign * positivity_score
+        if pov > 0.5:
+            self.subjective += exact_weight
+        if positivity > 0.5:
+            self.positive += exact_weight
+        self.moods[mood] += exact_weight
+
+    def merge(self, other, sign=1):
+        """
+        Adds the sums of other messages, or removes them with a sign of -1.
+
+        @param other: The sums of the other messages.
+        @type other: MoodTotals
+        @param sign: 1 to add the messages, -1 to remove them.
+        @type sign: int
+        """
+        if other.bits > self.bits:
+            self.__rescale(other.bits)
+        shift = self.bits - other.bits
+        self.count += sign * other.count
+        for name in self.SUMS:
+            setattr(self, name, getattr(self, name) + sign * (getattr(other, name) << shift))
+        self.moods = [total + sign * (added << shift) for total, added in zip(self.moods, other.moods)]
+
+    def to_float(self, total):
+        """
+        Converts a numerator over the denominator of the sums to a float.
+
+        @type total: int
+        @rtype: float
+        """
+        # the division of two integers is correctly rounded
+        return total / (1 << self.bits)
+
+    def average(self, name):
+        """
+        Returns the average of the pov or the positivity weighted by the activity.
+
+        @param name: 'pov' or 'positivity'.
+        @type name: str
+        @rtype: float
+        """
+        if self.activity <= 0:
+            return 0
+        # the division of two integers is correctly rounded
+        return getattr(self, name) / self.activity
+
+    def get_moods(self):
+        """
+        Returns the sum of the weights of each mood.
+
+        @return: {label: frequency} in the order of the enum.
+        @rtype: dict
+        """
+        return {label: self.to_float(total) for label, total in zip(MOOD_LABELS, self.moods)}
+
+
+class MoodBucket:
+    """
+    The messages of a guild sent during the same time slot and their totals by
+    user, so the whole slot expires at once.
+    """
+
+    def __init__(self):
+        self.messages = MoodStore()
+        self.user_totals = {}  # Type: dict[int, MoodTotals]
+
 
 class GuildMoods:
     """
     Class to manage and analyze the mood of messages within a guild.
     """
 
-    def __init__(self, pipeline_mood, pipeline_positivity):
+    # the duration of the time slot of a bucket of messages, in seconds
+    BUCKET_SECONDS = 3600
+
+    def __init__(self, pipeline_mood, pipeline_positivity, cache=None, retention_hours=24):
         """
         Class to manage and analyze the mood of messages within a guild.
+
+        @param cache: The cache of the model results, shared between guilds.
+        @type cache: ResultCache or None
+        @param retention_hours: The number of hours after which a message is forgotten.
+        @type retention_hours: float
         """
-        # Cache for user messages
-        self.user_messages = defaultdict(list)
+        # Cache of the model results by message content
+        self.cache = cache
+
+        # Guards the buckets, the index and the totals, the messages are added
+        # from the thread pool and removed from the event loop
+        self.lock = threading.RLock()
+
+        # Cache for user messages, by time slot
+        self.buckets = {}  # Type: dict[int, MoodBucket]
+        self.retention = timedelta(hours=retention_hours)
+        # Time slot and row of each cached message, by message ID
+        self.index = {}  # Type: dict[int, tuple[int, int]]
+
+        # Running statistics of the cached messages, by user and for the guild
+        self.user_totals = {}  # Type: dict[int, MoodTotals]
+        self.guild_totals = MoodTotals()
 
         # Text classification model for mood analysis
         self.analyzer = pipeline_mood  # pipeline(task='text-classification',
@@ -81,8 +382,8 @@ class GuildMoods:
         # model="citizenlab/twitter-xlm-roberta-base-sentiment-finetunned",
         # tokenizer="citizenlab/twitter-xlm-roberta-base-sentiment-finetunned")
 
-        # TextBlob French analyzer for pov analysis
-        self.tb_fr = Blobber(pos_tagger=PatternTagger(), analyzer=PatternAnalyzer())
+        # Subjectivity scorer for pov analysis, the lexicon of textblob-fr compiled once
+        self.pov_scorer = SubjectivityScorer()
 
         self.mood_translation = {
             'joy': 'joie',
@@ -92,37 +393,142 @@ class GuildMoods:
             'sadness': 'tristesse',
             'fear': 'peur'
         }
-        
+
+    @property
+    def user_messages(self):
+        """
+        The messages of each user, built from the message store on each access.
+
+        @rtype: defaultdict[int, list[MessageMood]]
+        """
+        user_messages = defaultdict(list)
+        with self.lock:
+            for slot in sorted(self.buckets):
+                messages = self.buckets[slot].messages
+                authors = messages.column('author')
+                for row in range(len(messages)):
+                    user_messages[messages.authors[authors[row]]].append(messages.get_message(row))
+        return user_messages
+
     def _add_message(self, msg_author_id, message):
         """
-        Adds message information to the user's message list.
+        Adds message information to the bucket of its time slot.
 
         @param msg_author_id: The ID of the message author.
         @type msg_author_id: int
         @param message: The message content.
         @type message: MessageMood
         """
-        if message not in self.user_messages[msg_author_id]:
-            self.user_messages[msg_author_id].append(message)
+        slot = int(message.get_time().timestamp() // self.BUCKET_SECONDS)
+        with self.lock:
+            if message.get_message_id() in self.index:
+                return
+            bucket = self.buckets.get(slot)
+            if bucket is None:
+                bucket = self.buckets[slot] = MoodBucket()
+            self.index[message.get_message_id()] = (slot, len(bucket.messages))
+            bucket.messages.append(msg_author_id, message)
+            self._update_totals(bucket, msg_author_id, message.get_pov(), message.get_positivity(),
+                                MOOD_CODES[message.get_mood()[0]], message.get_weight())
+
+    def _update_totals(self, bucket, user_id, pov, positivity, mood, weight, sign=1):
+        """
+        Adds a message to the running statistics, or removes it with a sign of -1.
+        The lock must be held.
+
+        @param bucket: The bucket of the message.
+        @type bucket: MoodBucket
+        @param user_id: The ID of the message author.
+        @type user_id: int
+        @param sign: 1 to add the message, -1 to remove it.
+        @type sign: int
+        """
+        for user_totals in (bucket.user_totals, self.user_totals):
+            totals = user_totals.get(user_id)
+            if totals is None:
+                totals = user_totals[user_id] = MoodTotals()
+            totals.add(pov, positivity, mood, weight, sign)
+            if totals.count == 0:
+                del user_totals[user_id]
+        self.guild_totals.add(pov, positivity, mood, weight, sign)
 
     def garbage_collector(self):
         """
-        Removes expired messages from the cache.
-        """
-        current_time = datetime.now()
-        expired_messages = []
+        Removes expired messages from the cache. The buckets are dropped whole,
+        so a message is kept at most one time slot longer than the retention.
+        """
+        expiry = (datetime.now() - self.retention).timestamp()
+        current_slot = int(datetime.now().timestamp() // self.BUCKET_SECONDS)
+        with self.lock:
+            # the buckets whose time slot ends before the expiry hold only expired messages
+            expired = [slot for slot in self.buckets if (slot + 1) * self.BUCKET_SECONDS <= expiry]
+            for slot in expired:
+                bucket = self.buckets.pop(slot)
+                for message_id in bucket.messages.column('message_id').tolist():
+                    del self.index[message_id]
+                # the totals of the bucket are removed from the running statistics
+                for user_id, bucket_totals in bucket.user_totals.items():
+                    totals = self.user_totals[user_id]
+                    totals.merge(bucket_totals, sign=-1)
+                    if totals.count == 0:
+                        del self.user_totals[user_id]
+                    self.guild_totals.merge(bucket_totals, sign=-1)
+            # the past time slots only receive the late messages
+            for slot, bucket in self.buckets.items():
+                if slot < current_slot:
+                    bucket.messages.shrink()
+
+    def remove_message(self, message_id):
+        """
+        Removes a deleted or edited message from the cache and from the statistics.
 
-        for user_id, messages in self.user_messages.items():
-            for message in messages:
-                # Check if the message has passed 24 hours since creation
-                if (current_time - message.get_time()) >= timedelta(hours=24):
-                    expired_messages.append((user_id, message))
+        @param message_id: The ID of the message.
+        @type message_id: int
+        @return: The removed message, or None if it is not in the cache
+        @rtype: MessageMood or None
+        """
+        with self.lock:
+            location = self.index.pop(message_id, None)
+            if location is None:
+                return None
+            slot, row = location
+            bucket = self.buckets[slot]
+            messages = bucket.messages
+            message = messages.get_message(row)
+            self._update_totals(bucket, messages.authors[messages.column('author')[row]], message.get_pov(),
+                                message.get_positivity(), MOOD_CODES[message.get_mood()[0]], message.get_weight(),
+                                sign=-1)
+            kept = np.ones(len(messages), dtype=bool)
+            kept[row] = False
+            messages.keep(kept)
+            # the next messages of the bucket move up by one row
+            for next_row, next_id in enumerate(messages.column('message_id')[row:].tolist(), start=row):
+                self.index[next_id] = (slot, next_row)
+            if len(messages) == 0:
+                del self.buckets[slot]
+        return message
+
+    def replace_message(self, msg_author_id, message_id, message=None):
+        """
+        Replaces an edited message by its new analysis at once, so no other
+        thread sees the statistics without the message.
 
-        # Remove expired messages from the user_messages cache
-        for user_id, message in expired_messages:
-            self.user_messages[user_id].remove(message)
+        @param msg_author_id: The ID of the message author.
+        @type msg_author_id: int
+        @param message_id: The ID of the message.
+        @type message_id: int
+        @param message: The new analysis of the message, None to only remove it.
+        @type message: MessageMood or None
+        @return: The replaced message, or None if it is not in the cache anymore
+        @rtype: MessageMood or None
+        """
+        with self.lock:
+            previous = self.remove_message(message_id)
+            if previous is not None and message is not None:
+                self._add_message(msg_author_id, message)
+        return previous
 
-    def handle_message(self, msg_author_id, msg_content, msg_id, msg_created_at):
+    def handle_message(self, msg_author_id, msg_content, msg_id, msg_created_at, weight=1.0):
         """
        Handles a new message by analyzing its sentiment and mood.
 
@@ -134,30 +540,47 @@ class GuildMoods:
        @type msg_id: int
        @param msg_created_at: The creation timestamp of the message.
        @type msg_created_at: datetime.datetime
+       @param weight: The number of messages this one stands for when the messages are sampled.
+       @type weight: float
        """
 
-        if msg_content.startswith(('@', '#', '$', '%', '^', '&', '*', '(', ')', '-', '_', '+', '=', '[', ']',
-                                   '{', '}', ';', ':', ',', '<', '>', '.', '/', '?', 'https')):
+        # The message is already analyzed
+        if msg_id in self.index:
             return
 
-        # Perform sentiment analysis on the message content
-        sentiment_result = self.sentiment_classifier(msg_content, top_k=None)
+        message = self.analyze_message(msg_content, msg_id, msg_created_at, weight)
 
-        positive_score = 0.0
+        # Add the message to the GuildMood
+        if message is not None:
+            self._add_message(msg_author_id, message)
 
-        # Find the entry with the label "Positive"
-        for entry in sentiment_result:
-            if entry['label'] == 'Positive':
-                positive_score = entry['score']
-                break  # Exit the loop once "Positive" is found
+    def analyze_message(self, msg_content, msg_id, msg_created_at, weight=1.0):
+        """
+        Analyzes the sentiment, the pov and the mood of a message, without adding it.
+
+        @param msg_content: The content of the message.
+        @type msg_content: str
+        @param msg_id: The ID of the message.
+        @type msg_id: int
+        @param msg_created_at: The creation timestamp of the message.
+        @type msg_created_at: datetime.datetime
+        @param weight: The number of messages this one stands for when the messages are sampled.
+        @type weight: float
+        @return: The analyzed message, or None if it is ignored
+        @rtype: MessageMood or None
+        """
+        if msg_content.startswith(('@', '#', '$', '%', '^', '&', '*', '(', ')', '-', '_', '+', '=', '[', ']',
+                                   '{', '}', ';', ':', ',', '<', '>', '.', '/', '?', 'https')):
+            return None
 
         # Perform sentiment analysis on the message content
-        blob = self.tb_fr(msg_content)
+        positive_score = self._get_positivity_message(msg_content)
+
         # Calculate subjectivity score
-        subjectivity_score = blob.sentiment[1]
+        subjectivity_score = self._get_pov_message(msg_content)
 
         # Analyse moods
-        mood_scores = self.analyzer(msg_content)
+        mood_scores = self._cached("mood", msg_content, self.analyzer)
 
         # Extraction of dominant mood {['fear', 0.9997491240501404]}
         label_mood = self.mood_translation[mood_scores[0]['label']]
@@ -166,11 +589,43 @@ class GuildMoods:
         mood_resultat = [label_mood, score_mood]
 
         # Create a Message object with the message content and sentiment score
-        message = MessageMood(message_id=msg_id, time=msg_created_at, pov=subjectivity_score, mood=mood_resultat,
-                              positivity=positive_score)
+        return MessageMood(message_id=msg_id, time=msg_created_at, pov=subjectivity_score, mood=mood_resultat,
+                           positivity=positive_score, weight=weight)
 
-        # Add the message to the GuildMood
-        self._add_message(msg_author_id, message)
+    def add_estimate(self, msg_author_id, estimate, msg_id, msg_created_at, weight=1.0):
+        """
+        Adds a message with a heuristic result instead of the model results.
+
+        @param msg_author_id: The ID of the message author.
+        @type msg_author_id: int
+        @param estimate: The heuristic result of the message prefilter.
+        @type estimate: util.prefilter.Estimate
+        @param msg_id: The ID of the message.
+        @type msg_id: int
+        @param msg_created_at: The creation timestamp of the message.
+        @type msg_created_at: datetime.datetime
+        @param weight: The number of messages this one stands for when the messages are sampled.
+        @type weight: float
+        """
+        self._add_message(msg_author_id, self.estimate_message(estimate, msg_id, msg_created_at, weight))
+
+    @staticmethod
+    def estimate_message(estimate, msg_id, msg_created_at, weight=1.0):
+        """
+        Returns the message with a heuristic result instead of the model results, without adding it.
+
+        @param estimate: The heuristic result of the message prefilter.
+        @type estimate: util.prefilter.Estimate
+        @param msg_id: The ID of the message.
+        @type msg_id: int
+        @param msg_created_at: The creation timestamp of the message.
+        @type msg_created_at: datetime.datetime
+        @param weight: The number of messages this one stands for when the messages are sampled.
+        @type weight: float
+        @rtype: MessageMood
+        """
+        return MessageMood(message_id=msg_id, time=msg_created_at, pov=estimate.pov, mood=[estimate.mood, 1.0],
+                           positivity=estimate.positivity, weight=weight)
 
     def get_user_positivity(self, msg_author_id):
         """
@@ -181,16 +636,10 @@ class GuildMoods:
         @return: the user's positivity score.
         @rtype: float
         """
-        # Get the positivity scores from the user's messages
-        positive_score = sum(msg.get_positivity() for msg in self.user_messages.get(msg_author_id, []))
-
-        # Calculate the total activity
-        user_activity = len(self.user_messages.get(msg_author_id, []))
-        # Calculate the normalized score
-        normalized_positive = positive_score / user_activity if user_activity > 0 else 0
-
-        # Return the sentiment score
-        return normalized_positive
+        # Average of the positivity scores weighted by the activity
+        with self.lock:
+            totals = self.user_totals.get(msg_author_id)
+            return totals.average('positivity') if totals else 0
 
     def get_user_pov(self, msg_author_id):
         """
@@ -201,16 +650,10 @@ class GuildMoods:
         @return: the user's point of view score.
         @rtype: float
         """
-        # Get the pov scores from the user's messages
-        pov_score = sum(msg.get_pov() for msg in self.user_messages.get(msg_author_id, []))
-
-        # Calculate the total of messages of user
-        user_activity = len(self.user_messages.get(msg_author_id, []))
-        # Calculate the normalized score
-        normalized_pov = pov_score / user_activity if user_activity > 0 else 0
-
-        # Return the score
-        return normalized_pov
+        # Average of the pov scores weighted by the activity
+        with self.lock:
+            totals = self.user_totals.get(msg_author_id)
+            return totals.average('pov') if totals else 0
 
     def get_user_mood(self, user_id):
         """
@@ -243,31 +686,30 @@ class GuildMoods:
         @return: Dictionary containing mood frequencies for the user.
         @rtype: dict
         """
+        with self.lock:
+            totals = self.user_totals.get(user_id)
+            if totals is None:
+                return dict.fromkeys(MOOD_LABELS, 0)
+            # Return the mood accumulator dictionary {label: frequency}
+            return totals.get_moods()
 
-        # Initialize mood accumulator
-        mood_accumulator = {
-            Mood.JOY.value: 0,
-            Mood.SURPRISE.value: 0,
-            Mood.LOVE.value: 0,
-            Mood.ANGER.value: 0,
-            Mood.SADNESS.value: 0,
-            Mood.FEAR.value: 0
-        }
-
-        # Iterate through all messages from the user
-        for message in self.user_messages.get(user_id, []):
-            # Get mood scores from the message
-            mood_data = message.get_mood()
-
-            # Extraction label because the max label is always first
-            mood_label = mood_data[0]
-
-            mood_accumulator[mood_label] += 1
+    def _cached(self, model, msg_content, func):
+        """
+        Returns the result of func for the message content, using the result cache.
 
-        # Return the mood accumulator dictionary {label: frequency}
-        return mood_accumulator
+        @param model: The name of the model, part of the cache key.
+        @type model: str
+        @param msg_content: The content of the message.
+        @type msg_content: str
+        @param func: The function which computes the result from the content.
+        @type func: callable
+        @return: the result of func(msg_content)
+        """
+        if self.cache is None:
+            return func(msg_content)
+        return self.cache.get_or_compute(model, msg_content, func)
 
-    def _check_message_cache(self, message_id):
+    def get_message(self, message_id):
         """
         Get the message from cache
 
@@ -276,12 +718,12 @@ class GuildMoods:
         @return: The message in cache or None
         @rtype: MessageMood or None
         """
-        # Check if the message id exists in any user's messages
-        for messages in self.user_messages.values():
-            for msg in messages:
-                if msg.get_message_id() == message_id:
-                    return msg
-        return None
+        with self.lock:
+            location = self.index.get(message_id)
+            if location is None:
+                return None
+            slot, row = location
+            return self.buckets[slot].messages.get_message(row)
 
     def _get_pov_message(self, msg_content):
         """
@@ -292,11 +734,8 @@ class GuildMoods:
         @return: the score pov of the message
         @rtype: float
         """
-        # Perform sentiment analysis on the message content
-        blob = self.tb_fr(msg_content)
-        # Calculate subjectivity score
-        subjectivity_score = blob.sentiment[1]
-        return subjectivity_score
+        # the lexicon scoring is faster than a lookup of the result cache
+        return self.pov_scorer.score(msg_content)
 
     def get_message_pov(self, message_id, msg_content):
         """
@@ -309,7 +748,7 @@ class GuildMoods:
         @return: the point of view score.
         @rtype: float
         """
-        msg = self._check_message_cache(message_id)
+        msg = self.get_message(message_id)
         if msg:
             # If the message id is found, get the pov score
             pov_score = msg.get_pov()
@@ -329,7 +768,9 @@ class GuildMoods:
         @rtype: float
         """
         # Perform sentiment analysis on the message content
-        sentiment_result = self.sentiment_classifier(msg_content, top_k=None)
+        sentiment_result = self._cached(
+            "sentiment", msg_content, lambda text: self.sentiment_classifier(text, top_k=None)
+        )
 
         positive_score = 0.0
         # Find the entry with the label "Positive"
@@ -350,7 +791,7 @@ class GuildMoods:
        @return: the positivity score.
        @rtype: float
        """
-        msg = self._check_message_cache(message_id)
+        msg = self.get_message(message_id)
         if msg:
             # If the message id is found, get the pov score
             positivity_score = msg.get_positivity()
@@ -369,7 +810,7 @@ class GuildMoods:
         @rtype: float, str
         """
         # Analyse moods
-        mood_scores = self.analyzer(msg_content)  # top_k=None
+        mood_scores = self._cached("mood", msg_content, self.analyzer)  # top_k=None
 
         # Extraction of dominant mood
         score_mood = mood_scores[0]['score']
@@ -387,7 +828,7 @@ class GuildMoods:
         @return: the mood score and the mood label.
         @rtype: float, str
         """
-        msg = self._check_message_cache(message_id)
+        msg = self.get_message(message_id)
         if msg:
             # If the message id is found, get the mood score
             mood_score = msg.get_mood()[1]
@@ -404,18 +845,11 @@ class GuildMoods:
         @return: the distribution of subjective and objective messages [labels],[counts].
         @rtype: dict
         """
-        # Initialize counts for subjective and objective scores
-        subjective_count = 0
-        objective_count = 0
-
-        # Iterate through all messages from all users
-        for messages in self.user_messages.values():
-            for msg in messages:
-                # Increment counts based on the pov score
-                if msg.get_pov() > 0.5:
-                    subjective_count += 1
-                else:
-                    objective_count += 1
+        # Sum the weights of the subjective and objective messages
+        totals = self.guild_totals
+        with self.lock:
+            subjective_count = totals.to_float(totals.subjective)
+            objective_count = totals.to_float(totals.activity - totals.subjective)
 
         # Create labels and sizes for the pie chart
         labels = ['Subjectif', 'Objectif']
@@ -430,19 +864,11 @@ class GuildMoods:
         @return: the distribution of positive and negative messages [labels],[counts].
         @rtype: dict
         """
-        # Initialize counts for positive and negative scores
-        positive_count = 0
-        negative_count = 0
-
-        # Iterate through all messages from all users
-        for messages in self.user_messages.values():
-            for msg in messages:
-                # Increment counts based on the positivity score
-                positivity_score = msg.get_positivity()
-                if positivity_score > 0.5:
-                    positive_count += 1
-                else:
-                    negative_count += 1
+        # Sum the weights of the positive and negative messages
+        totals = self.guild_totals
+        with self.lock:
+            positive_count = totals.to_float(totals.positive)
+            negative_count = totals.to_float(totals.activity - totals.positive)
 
         # Create labels and sizes for the pie chart
         labels = ['Positif', 'Negatif']
@@ -457,21 +883,9 @@ class GuildMoods:
         @return: the distribution of different moods [labels],[counts].
         @rtype: dict
         """
-        # Initialize mood accumulator
-        mood_accumulator = {
-            Mood.JOY.value: 0,
-            Mood.SURPRISE.value: 0,
-            Mood.LOVE.value: 0,
-            Mood.ANGER.value: 0,
-            Mood.SADNESS.value: 0,
-            Mood.FEAR.value: 0
-        }
-
-        # Iterate over all users and accumulate mood frequencies
-        for user_id in self.user_messages:
-            user_mood = self._calculate_user_mood(user_id)
-            for mood_label, frequency in user_mood.items():
-                mood_accumulator[mood_label] += frequency
+        # The mood frequencies of all the messages
+        with self.lock:
+            mood_accumulator = self.guild_totals.get_moods()
 
         # Filter out moods with zero frequency
         labels = []
@@ -0,0 +1,173 @@
+import re
+from collections import Counter
+from enum import Enum
+from typing import NamedTuple, Optional
+
+import emoji
+
+
+class Verdict(Enum):
+    SKIP = 'skip'  # nothing to analyze
+    ESTIMATE = 'estimate'  # a cheap heuristic result is enough
+    ANALYZE = 'analyze'  # the message goes through the models
+
+
+class Estimate(NamedTuple):
+    """Heuristic result of a short message."""
+    mood: str  # one of util.moods.Mood values
+    positivity: float
+    pov: float
+
+
+class PrefilterResult(NamedTuple):
+    verdict: Verdict
+    estimate: Optional[Estimate] = None
+
+
+# the model calls of an analyzed message by the name of their cached result,
+# the mbti result also saves the translation, the pov is scored by a lexicon
+MODEL_CALLS = {'mood': 1, 'sentiment': 1, 'mbti': 2}
+CALLS_PER_MESSAGE = sum(MODEL_CALLS.values())
+
+# asks for the emoji presentation of a symbol, it is optional in most messages: ❤ and ❤️
+VARIATION_SELECTOR = '\ufe0f'
+
+URL_REGEX = re.compile(r'https?://\S+')
+MENTION_REGEX = re.compile(r'<(?:@[!&]?|#|a?:\w+:)\d+>')
+WORD_REGEX = re.compile(r'\w+')
+
+
+class MessagePrefilter:
+    """
+    Fast pre-classification of the messages before the models. Messages without
+    text are skipped, short messages and messages made of emojis get a result
+    from a small lexicon, the others are analyzed by the models.
+    """
+
+    # the emojis and the words which are enough to guess the mood of a short message
+    EMOJI_LEXICON = {
+        '😂': Estimate('joie', 0.9, 0.8), '🤣': Estimate('joie', 0.9, 0.8),
+        '😀': Estimate('joie', 0.9, 0.7), '😁': Estimate('joie', 0.9, 0.7),
+        '😄': Estimate('joie', 0.9, 0.7), '😊': Estimate('joie', 0.9, 0.7),
+        '👍': Estimate('joie', 0.8, 0.5), '🎉': Estimate('joie', 0.9, 0.6),
+        '❤️': Estimate('amour', 0.9, 0.8), '😍': Estimate('amour', 0.9, 0.9),
+        '🥰': Estimate('amour', 0.9, 0.9), '😘': Estimate('amour', 0.9, 0.8),
+        '😮': Estimate('surprise', 0.5, 0.6), '😲': Estimate('surprise', 0.5, 0.6),
+        '😱': Estimate('peur', 0.2, 0.8), '😨': Estimate('peur', 0.2, 0.8),
+        '😢': Estimate('tristesse', 0.1, 0.8), '😭': Estimate('tristesse', 0.1, 0.9),
+        '😞': Estimate('tristesse', 0.1, 0.7), '👎': Estimate('colère', 0.2, 0.6),
+        '😡': Estimate('colère', 0.1, 0.9), '😠': Estimate('colère', 0.1, 0.9),
+    }
+    WORD_LEXICON = {
+        'mdr': Estimate('joie', 0.9, 0.8), 'lol': Estimate('joie', 0.9, 0.8),
+        'ptdr': Estimate('joie', 0.9, 0.8), 'haha': Estimate('joie', 0.9, 0.8),
+        'merci': Estimate('joie', 0.9, 0.5), 'super': Estimate('joie', 0.9, 0.7),
+        'génial': Estimate('joie', 0.9, 0.8), 'cool': Estimate('joie', 0.8, 0.6),
+        'ok': Estimate('joie', 0.6, 0.1), 'oui': Estimate('joie', 0.6, 0.1),
+        'non': Estimate('colère', 0.4, 0.2), 'bof': Estimate('tristesse', 0.3, 0.6),
+        'nul': Estimate('colère', 0.1, 0.8), 'triste': Estimate('tristesse', 0.1, 0.8),
+        'wow': Estimate('surprise', 0.7, 0.7), 'quoi': Estimate('surprise', 0.5, 0.3),
+        'bisous': Estimate('amour', 0.9, 0.8), 'jtm': Estimate('amour', 0.9, 0.9),
+    }
+
+    def __init__(self, cache=None, max_short_words=2, min_emoji_ratio=0.5):
+        """
+        Initializes the prefilter.
+
+        @param cache: The cache of the model results, the calls cached in memory are not counted as saved.
+        @type cache: core.cache.ResultCache
+        @param max_short_words: The number of words up to which a message is short.
+        @type max_short_words: int
+        @param min_emoji_ratio: The share of emojis in the symbols of a message made of emojis.
+        @type min_emoji_ratio: float
+        """
+        self.cache = cache
+        self.max_short_words = max_short_words
+        self.min_emoji_ratio = min_emoji_ratio
+        self.emoji_lexicon = {
+            e.replace(VARIATION_SELECTOR, ''): estimate for e, estimate in self.EMOJI_LEXICON.items()
+        }
+        self.counters = Counter()
+        self.saved_calls = 0
+
+    def classify(self, msg_content):
+        """
+        Pre-classify a message.
+
+        @param msg_content: The content of the message.
+        @type msg_content: str
+        @return: the verdict and the heuristic result of the message, if any.
+        @rtype: PrefilterResult
+        """
+        result = self._classify(msg_content)
+        self.counters[result.verdict] += 1
+        # the skipped and the estimated messages go through none of the models
+        if result.verdict != Verdict.ANALYZE:
+            self.saved_calls += self._count_calls(msg_content)
+        return result
+
+    def _count_calls(self, msg_content):
+        """
+        Counts the model calls of a message whose results are not cached in memory.
+
+        @param msg_content: The content of the message.
+        @type msg_content: str
+        @rtype: int
+        """
+        if self.cache is None:
+            return CALLS_PER_MESSAGE
+        return sum(calls for model, calls in MODEL_CALLS.items() if not self.cache.contains(model, msg_content))
+
+    def _classify(self, msg_content):
+        """
+        Pre-classify a message without counting it.
+
+        @param msg_content: The content of the message.
+        @type msg_content: str
+        @rtype: PrefilterResult
+        """
+        # links, mentions and custom emojis say nothing about the author
+        text = MENTION_REGEX.sub(' ', URL_REGEX.sub(' ', msg_content)).replace(VARIATION_SELECTOR, '').strip()
+        if not text or text.startswith(tuple("!@#$%^&*()-_+=[]{}|;:',.<>?/")):
+            return PrefilterResult(Verdict.SKIP)
+
+        emojis = emoji.distinct_emoji_list(text)
+        words = WORD_REGEX.findall(emoji.replace_emoji(text, ' ').lower())
+        symbols = emoji.emoji_count(text) + len(words)
+
+        # made of emojis: the first known emoji gives the mood
+        if emojis and emoji.emoji_count(text) / symbols >= self.min_emoji_ratio:
+            known = [self.emoji_lexicon[e] for e in emojis if e in self.emoji_lexicon]
+            if known:
+                return PrefilterResult(Verdict.ESTIMATE, known[0])
+            return PrefilterResult(Verdict.SKIP)
+
+        if not words:
+            return PrefilterResult(Verdict.SKIP)
+
+        if len(words) <= self.max_short_words:
+            known = [self.WORD_LEXICON[w] for w in words if w in self.WORD_LEXICON]
+            if known:
+                return PrefilterResult(Verdict.ESTIMATE, known[0])
+            # a single unknown word is not worth the models
+            if len(words) == 1:
+                return PrefilterResult(Verdict.SKIP)
+
+        return PrefilterResult(Verdict.ANALYZE)
+
+    def get_stats(self):
+        """
+        Returns the counters of each verdict and the model calls avoided.
+
+        @rtype: dict
+        """
+        total = sum(self.counters.values())
+        saved = self.counters[Verdict.SKIP] + self.counters[Verdict.ESTIMATE]
+        return {
+            'messages': total,
+            'skipped': self.counters[Verdict.SKIP],
+            'estimated': self.counters[Verdict.ESTIMATE],
+            'analyzed': self.counters[Verdict.ANALYZE],
+            'saved_calls': self.saved_calls,
+            'saved_ratio': saved / total if total else 0.0,
+        }
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from contextlib import suppress
+
+
+class ThrottledMessage:
+    """
+    A reply edited while its content is written. Discord limits the edits of a
+    message, so the message is edited at most once by interval: the contents
+    given in between replace each other and only the last one is sent.
+    """
+
+    def __init__(self, message, interval=1.5, max_length=2000):
+        """
+        :param message: The message to edit
+        :type message: discord.Message
+        :param interval: Minimal time in seconds between two edits
+        :type interval: float
+        :param max_length: Maximal length of the content of a message
+        :type max_length: int
+        """
+        self.message = message
+        self.interval = interval
+        self.max_length = max_length
+        self.edits = 0
+        self.skipped = 0
+        self.__content = None  # Type: Optional[str]
+        self.__task = None  # Type: Optional[asyncio.Task]
+        self.__last_edit = float("-inf")
+
+    def update(self, content):
+        """
+        Edit the message with the content, once the interval since the last edit
+        has passed. Must be called from the event loop.
+
+        :type content: str
+        """
+        if self.__content is not None:
+            self.skipped += 1
+        self.__content = content
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.ensure_future(self.__flush())
+
+    async def __wait(self):
+        """
+        Wait until the message may be edited again.
+        """
+        delay = self.__last_edit + self.interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __edit(self, content):
+        """
+        :type content: str
+        """
+        self.__last_edit = time.monotonic()
+        self.edits += 1
+        await self.message.edit(content=content[:self.max_length])
+
+    async def __flush(self):
+        """
+        Send the last content given after the interval.
+        """
+        await self.__wait()
+        content, self.__content = self.__content, None
+        if content is not None:
+            await self.__edit(content)
+
+    async def close(self, content):
+        """
+        Edit the message with its final content, the pending content is dropped.
+
+        :type content: str
+        """
+        if self.__content is not None:
+            self.skipped += 1
+            self.__content = None
+        if self.__task is not None:
+            self.__task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.__task
+        await self.__wait()
+        await self.__edit(content)
+
+
+class SharedProgress:
+    """
+    The replies of the identical requests which share a computation. Each content
+    is sent to all of them, a reply which joins later gets the last content.
+    """
+
+    def __init__(self):
+        self.replies = []  # Type: List[ThrottledMessage]
+        self.__content = None  # Type: Optional[str]
+
+    def add(self, reply):
+        """
+        :type reply: ThrottledMessage
+        """
+        self.replies.append(reply)
+        if self.__content is not None:
+            reply.update(self.__content)
+
+    def remove(self, reply):
+        """
+        :type reply: ThrottledMessage
+        """
+        self.replies.remove(reply)
+
+    def update(self, content):
+        """
+        Edit all the replies with the content. Must be called from the event loop.
+
+        :type content: str
+        """
+        self.__content = content
+        for reply in self.replies:
+            reply.update(content)
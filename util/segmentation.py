@@ -0,0 +1,215 @@
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class ChatMessage(NamedTuple):
+    """
+    A message of the chat history. The first fields are the (author, content,
+    time, id) tuple used by the summarizer.
+    """
+    author: str  # display name
+    content: str
+    time: float  # timestamp
+    id: int
+    reply_to: Optional[int] = None  # ID of the message it replies to
+    mentions: Tuple[str, ...] = ()  # display names of the mentioned members
+
+
+class ReplyThreader:
+    """
+    Link the messages in one pass with the structure given by Discord: a reply
+    is linked to its message, a mention to the last message of the mentioned
+    member, and a quick answer in a back and forth between two members, or a
+    quick follow-up of the same author, to the previous message.
+    """
+
+    def __init__(self, max_gap=1800, turn_gap=120):
+        """
+        :param max_gap: Maximal time in seconds between a mention and the message it answers
+        :type max_gap: float
+        :param turn_gap: Maximal time in seconds between two turns of a back and forth
+        :type turn_gap: float
+        """
+        self.max_gap = max_gap
+        self.turn_gap = turn_gap
+
+    def get_links(self, messages):
+        """
+        Compute the links between the messages.
+
+        :param messages: Messages sorted by time
+        :type messages: List[tuple]
+        :return: Indices of the linked messages
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        sources, targets = [], []
+        by_id = {}  # Type: dict[int, int]
+        last_by_author = {}  # Type: dict[str, int]
+        for i, message in enumerate(messages):
+            author, time = message[0], message[2]
+            reply_to = getattr(message, 'reply_to', None)
+            mentions = getattr(message, 'mentions', ())
+
+            linked = set()
+            if reply_to in by_id:
+                linked.add(by_id[reply_to])
+            for name in mentions:
+                j = last_by_author.get(name)
+                if j is not None and time - messages[j][2] <= self.max_gap:
+                    linked.add(j)
+            if i > 0 and time - messages[i - 1][2] <= self.turn_gap:
+                if messages[i - 1][0] == author:
+                    # the same author goes on
+                    linked.add(i - 1)
+                elif i > 1 and messages[i - 2][0] == author \
+                        and messages[i - 1][2] - messages[i - 2][2] <= self.turn_gap:
+                    # a back and forth between two members links the three turns
+                    linked.add(i - 1)
+                    sources.append(i - 1)
+                    targets.append(i - 2)
+
+            for j in linked:
+                sources.append(i)
+                targets.append(j)
+            if len(message) > 3:
+                by_id[message[3]] = i
+            last_by_author[author] = i
+        return np.array(sources, dtype=int), np.array(targets, dtype=int)
+
+    def thread(self, messages):
+        """
+        Group the linked messages into threads.
+
+        :param messages: Messages sorted by time
+        :type messages: List[tuple]
+        :return: The threads of linked messages and the messages without any link
+        :rtype: Tuple[List[List[tuple]], List[tuple]]
+        """
+        n = len(messages)
+        sources, targets = self.get_links(messages)
+        graph = coo_matrix((np.ones(len(sources)), (sources, targets)), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+        linked = np.zeros(n, dtype=bool)
+        linked[sources] = True
+        linked[targets] = True
+
+        threads = {}
+        unlinked = []
+        for i, message in enumerate(messages):
+            if linked[i]:
+                threads.setdefault(labels[i], []).append(message)
+            else:
+                unlinked.append(message)
+        return list(threads.values()), unlinked
+
+
+class ConversationSegmenter:
+    """
+    Split a chat history into conversations in near linear time.
+    Each message is only compared with the messages sent just before it: the
+    previous max_neighbors messages sent less than max_gap seconds before. Two
+    messages are linked when their combined score, the TF-IDF cosine similarity
+    and the time proximity, reaches the threshold, and when they share a word:
+    the time alone only links a message without any word, like an emoji or a
+    punctuation, to the message just before. The conversations are the
+    connected groups of linked messages.
+    """
+
+    def __init__(self, similarity_weight=0.7, time_weight=0.3, threshold=0.25,
+                 max_neighbors=10, max_gap=1800, time_scale=600):
+        """
+        :param similarity_weight: Weight of the semantic similarity
+        :type similarity_weight: float
+        :param time_weight: Weight of the time proximity
+        :type time_weight: float
+        :param threshold: Minimal combined score of two linked messages
+        :type threshold: float
+        :param max_neighbors: Number of previous messages compared with each message
+        :type max_neighbors: int
+        :param max_gap: Maximal time in seconds between two linked messages
+        :type max_gap: float
+        :param time_scale: Time in seconds after which the time proximity is 1/e
+        :type time_scale: float
+        """
+        self.similarity_weight = similarity_weight
+        self.time_weight = time_weight
+        self.threshold = threshold
+        self.max_neighbors = max_neighbors
+        self.max_gap = max_gap
+        self.time_scale = time_scale
+
+    def get_links(self, messages):
+        """
+        Compute the links between each message and the messages sent just before.
+
+        :param messages: Messages sorted by time, as (author, content, time, ...) tuples
+        :type messages: List[tuple]
+        :return: Indices of the linked messages and their scores
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        """
+        n = len(messages)
+        times = np.array([message[2] for message in messages], dtype=float)
+        try:
+            # the rows are L2 normalized, a dot product is a cosine similarity
+            tfidf = TfidfVectorizer(sublinear_tf=True).fit_transform([message[1] for message in messages])
+            tfidf = tfidf.tocsr()
+        except ValueError:
+            # no word at all
+            tfidf = None
+        # the messages without any word are linked to the previous one on the time alone
+        if tfidf is not None:
+            wordless = np.diff(tfidf.indptr) == 0
+        else:
+            wordless = np.ones(n, dtype=bool)
+
+        sources, targets, scores = [], [], []
+        for offset in range(1, min(self.max_neighbors, n - 1) + 1):
+            # compare message i with message i - offset
+            delta = times[offset:] - times[:-offset]
+            if tfidf is not None:
+                similarity = np.asarray(tfidf[offset:].multiply(tfidf[:-offset]).sum(axis=1)).ravel()
+            else:
+                similarity = np.zeros(n - offset)
+            proximity = np.exp(-np.abs(delta) / self.time_scale)
+            score = self.similarity_weight * similarity + self.time_weight * proximity
+            related = similarity > 0
+            if offset == 1:
+                related |= wordless[1:]
+            linked = np.flatnonzero((score >= self.threshold) & (np.abs(delta) <= self.max_gap) & related)
+            sources.append(linked + offset)
+            targets.append(linked)
+            scores.append(score[linked])
+
+        if not sources:
+            return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+        return np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+
+    def segment(self, messages):
+        """
+        Split the messages into conversations.
+
+        :param messages: Messages to be clustered, as (author, content, time, ...) tuples
+        :type messages: List[tuple]
+        :return: Detected conversations, the messages of each one in time order
+        :rtype: List[List[tuple]]
+        """
+        if not messages:
+            return []
+        # the history can be fetched from the newest message
+        order = sorted(range(len(messages)), key=lambda i: messages[i][2])
+        ordered = [messages[i] for i in order]
+
+        # the conversations are the connected components of the links graph
+        n = len(ordered)
+        sources, targets, _ = self.get_links(ordered)
+        graph = coo_matrix((np.ones(len(sources)), (sources, targets)), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+
+        conversations = {}
+        for label, message in zip(labels.tolist(), ordered):
+            conversations.setdefault(label, []).append(message)
+        return list(conversations.values())
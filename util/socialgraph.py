@@ -138,12 +138,17 @@ class SocialGraph:
             self.__max_edge_weight = curr_weight
 
     def handle_message(
-        self, message: Tuple[int, List[int], float], messages: List[Tuple[int, float]]
+        self,
+        message: Tuple[int, List[int], float],
+        messages: List[Tuple[int, float]],
+        sample_weight: float = 1.0,
     ):
         """
         Updates the graph in response to incoming messages.
         message respect this format: (author_id, [target_users_id...], time)
         messages is a list of tuple in this format: (author_id, time)
+        sample_weight is the number of messages this one stands for when the
+        messages are sampled.
         """
         with self.__lock:
             author_id, target, time = message
@@ -155,14 +160,14 @@ class SocialGraph:
                 if user_id == author_id:
                     continue
                 user_node = self.__get_user_node(user_id)
-                self.__increase_node_weight(author_node, user_node, 1)
+                self.__increase_node_weight(author_node, user_node, sample_weight)
                 w = self.__graph.weight(author_node, user_node)
 
             # add relative weight to others messages in the channel
             for i, (m_author_id, _) in enumerate(messages):
                 if m_author_id == author_id:
                     continue
-                weight = 1 / (2 * (i + 1))
+                weight = sample_weight / (2 * (i + 1))
                 m_author_node = self.__get_user_node(m_author_id)
                 self.__increase_node_weight(author_node, m_author_node, weight)
 
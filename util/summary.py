@@ -1,15 +1,78 @@
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+
 import numpy as np
 from sklearn.cluster import MeanShift
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
+from util.prefilter import MessagePrefilter, Verdict
+from util.segmentation import ConversationSegmenter, ReplyThreader
+
+
+class Analysis:
+    """
+    The analysis of a chat history shared by the topics, the summary and the
+    participants of a command, so the messages are clustered only once.
+    """
+
+    def __init__(self, messages, conversations, scope=None):
+        """
+        :param messages: Analyzed messages, as fetched
+        :type messages: List[tuple]
+        :param conversations: Detected conversations
+        :type conversations: List[List[tuple]]
+        :param scope: Id of the channel of the messages, their summaries are cached with it
+        :type scope: Optional[int]
+        """
+        self.messages = messages
+        self.conversations = conversations
+        self.scope = scope
+
 
 class Summarizer:
 
-    def __init__(self,pipeline_summary,pipeline_topics):
+    # above this number of messages, cluster_maker is too slow and too greedy in memory
+    MAX_DENSE_MESSAGES = 200
+
+    def __init__(self,pipeline_summary,pipeline_topics,threading=True,batch_size=8,chunker_factory=None,
+                 extractive_tokens=None,max_cached_summaries=1000):
         self.pipeline_summary = pipeline_summary
         self.pipeline_topics = pipeline_topics 
+        # number of chunks sent to a pipeline at once
+        self.batch_size = batch_size
+        # returns the token chunker of a model, by name, the text is split by characters without it
+        self.chunker_factory = chunker_factory
+        self.chunkers = {}
+        # token budget of a conversation given to the summary model, all its messages without it
+        self.extractive_tokens = extractive_tokens
+        self.prefilter = MessagePrefilter()
+        self.extractive_stats = {"conversations": 0, "tokens_in": 0, "tokens_kept": 0, "time": 0.0}
+        # summaries of the chunks by channel, ids of their messages and content
+        self.max_cached_summaries = max_cached_summaries
+        self.summary_cache = OrderedDict()
+        self.summary_cache_stats = {"hits": 0, "misses": 0, "fallbacks": 0}
+        self.summary_cache_lock = Lock()
+        self.segmenter = ConversationSegmenter()
+        # link the messages by replies, mentions and turns before any clustering
+        self.threading = threading
+        self.threader = ReplyThreader()
+
+    def analyze(self, messages, scope=None):
+        """
+        Cluster the messages once for all the following calls.
+        @param messages : Messages to analyze, or their analysis
+        @type messages : Union[List[tuple], Analysis]
+        @param scope : Id of the channel of the messages, their summaries are cached with it
+        @type scope : Optional[int]
+        @rtype: Analysis
+        """
+        if isinstance(messages, Analysis):
+            return messages
+        return Analysis(messages, self.get_conversations(messages) if messages else [], scope)
 
     #########
     #SUMMARY#
@@ -18,69 +81,543 @@ class Summarizer:
     def summarize_all(self, messages):
         """
         Make the summary of N messages.
-        @param messages : Messages to summarize
-        @type messages : List[tuple]
+        @param messages : Messages to summarize, or their analysis
+        @type messages : Union[List[tuple], Analysis]
         @return: Summary of the messages and list of display names
         @rtype: Tuple[str, List[str]]
         """
-        if messages:
-            clusters = self.cluster_maker(messages)
-            summary_all = ""
-            users = set()  # Set to store unique user display names
-            
-            for cluster in clusters:
-                cluster_content = ""
-                previous_user = None
-                for message in cluster:
-                    users.add(message[0])  # Add the fucking name to set
-                    if previous_user != message[0]: 
-                        cluster_content += f"{message[0]}: {message[1]}\n"
-                    else:
-                        cluster_content += f"{message[1]}\n"
-                    previous_user = message[0]
-                
-                chunks = self.split_input_by_max_length(cluster_content)  # Split content into chunks
-                for chunk in chunks:
-                    cl_summary = self.pipeline_summary(chunk)  # Process each chunk
-                    summary_part = "".join(summary['summary_text'] for summary in cl_summary)
-                    summary_all += summary_part
-            
+        analysis = self.analyze(messages)
+        if analysis.messages:
+            users = {message[0] for message in analysis.messages}  # Set to store unique user display names
+            # all the chunks of all the clusters are summarized together
+            summary_all = "".join(self.summarize_conversations(analysis.conversations, analysis.scope))
             return summary_all, list(users)  # Return summary and list of display names
         return None, []
 
-    def summarize_last(self, messages):
+    def write_dialogue(self, cluster):
+        """
+        Write the salient messages of a cluster as a dialogue, one message by line.
+        @param cluster : Messages of a conversation
+        @type cluster : List[tuple]
+        @rtype: str
+        """
+        return "".join(f"{text}\n" for _, text in self.get_dialogue(cluster))
+
+    def get_dialogue(self, cluster):
+        """
+        Returns the salient messages of a cluster and their text in the dialogue,
+        the author is written when it changes.
+        @param cluster : Messages of a conversation
+        @type cluster : List[tuple]
+        @rtype: List[Tuple[tuple, str]]
+        """
+        dialogue = []
+        previous_user = None
+        for message in self.select_salient(cluster):
+            if previous_user != message[0]:
+                dialogue.append((message, f"{message[0]}: {message[1]}"))
+            else:
+                dialogue.append((message, message[1]))
+            previous_user = message[0]
+        return dialogue
+
+    def get_cluster_chunks(self, cluster, scope=None):
+        """
+        Write a cluster as a dialogue and split it into chunks. Each chunk comes
+        with the key of its cached summary: the channel, the ids of the messages
+        of the chunk and a digest of the chunk, so a conversation which only grew
+        keeps the keys of its leading chunks, and an edited message changes the
+        key of its chunk.
+        @param cluster : Messages of a conversation
+        @type cluster : List[tuple]
+        @param scope : Id of the channel of the messages
+        @type scope : Optional[int]
+        @return: The chunks and their keys, None when the messages have no id
+        @rtype: List[Tuple[str, Optional[tuple]]]
+        """
+        lines, owners = [], []
+        for message, text in self.get_dialogue(cluster):
+            for line in text.split("\n"):
+                lines.append(line)
+                owners.append(message)
+        cacheable = scope is not None and all(len(message) >= 4 for message in cluster)
+        chunks = []
+        for chunk, indices in self.split_input_lines("summary", lines):
+            key = None
+            if cacheable:
+                ids = tuple(dict.fromkeys(owners[i][3] for i in indices))
+                key = scope, ids, hash(chunk)
+            chunks.append((chunk, key))
+        return chunks
+
+    def summarize_conversations(self, clusters, scope=None, timeout=None, progress=None):
+        """
+        Summarize each cluster. The chunks already summarized in the channel are
+        taken from the cache, the other chunks of all the clusters are summarized
+        together in batches. The clusters not summarized before the timeout get
+        an extractive summary.
+        @param clusters : Conversations to summarize
+        @type clusters : List[List[tuple]]
+        @param scope : Id of the channel of the messages
+        @type scope : Optional[int]
+        @param timeout : Time in seconds given to the generation
+        @type timeout : Optional[float]
+        @param progress : Called after each batch with the summary of each cluster so far, None when nothing is known yet
+        @type progress : Optional[Callable[[List[Optional[str]]], None]]
+        @return: The summary of each cluster
+        @rtype: List[str]
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        cluster_chunks = [self.get_cluster_chunks(cluster, scope) for cluster in clusters]
+        # the summary of each chunk of each cluster, None until it is known
+        parts = [[None] * len(chunks) for chunks in cluster_chunks]
+        chunks, owners = [], []
+        with self.summary_cache_lock:
+            for i, cluster in enumerate(cluster_chunks):
+                for j, (chunk, key) in enumerate(cluster):
+                    if key in self.summary_cache:
+                        self.summary_cache.move_to_end(key)
+                        parts[i][j] = self.summary_cache[key]
+                        self.summary_cache_stats["hits"] += 1
+                        continue
+                    if key is not None:
+                        self.summary_cache_stats["misses"] += 1
+                    chunks.append(chunk)
+                    owners.append((i, j))
+
+        def set_parts(chunk_summaries):
+            for (i, j), summary in zip(owners, chunk_summaries):
+                if summary is not None:
+                    parts[i][j] = summary
+
+        on_batch = None
+        if progress:
+            def on_batch(chunk_summaries):
+                set_parts(chunk_summaries)
+                progress(["".join(text for text in texts if text) or None for texts in parts])
+
+        set_parts(self.summarize_chunks(chunks, deadline, on_batch))
+        summaries = []
+        with self.summary_cache_lock:
+            for i, j in owners:
+                key = cluster_chunks[i][j][1]
+                if key is not None and parts[i][j] is not None:
+                    self.summary_cache[key] = parts[i][j]
+            while len(self.summary_cache) > self.max_cached_summaries:
+                self.summary_cache.popitem(last=False)
+            # the summary of a cluster is complete once all its chunks are summarized
+            for i, texts in enumerate(parts):
+                if None in texts:
+                    # too late for the model
+                    summaries.append(self.extractive_summary(clusters[i]))
+                    self.summary_cache_stats["fallbacks"] += 1
+                else:
+                    summaries.append("".join(texts))
+        return summaries
+
+    def get_summary_cache_stats(self):
+        """
+        Returns the number of chunk summaries and the hit ratio of the summary cache.
+        @rtype: dict
+        """
+        with self.summary_cache_lock:
+            hits, misses = self.summary_cache_stats["hits"], self.summary_cache_stats["misses"]
+            return {
+                "summaries": len(self.summary_cache),
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "fallbacks": self.summary_cache_stats["fallbacks"],
+            }
+
+    def get_summary_chunks(self, clusters):
+        """
+        Write the clusters as dialogues and split them into chunks.
+        @param clusters : Conversations to summarize
+        @type clusters : List[List[tuple]]
+        @return: The chunks of all the clusters and list of display names
+        @rtype: Tuple[List[str], List[str]]
+        """
+        users = set()  # Set to store unique user display names
+        chunks = []
+        for cluster in clusters:
+            users.update(message[0] for message in cluster)  # Add the fucking name to set
+            chunks.extend(chunk for chunk, _ in self.get_cluster_chunks(cluster))  # Split content into chunks
+        return chunks, list(users)
+
+    def summarize_hierarchical(self, messages, max_depth=3, fan_out=8, time_budget=None,
+                               output_tokens=256, progress=None, timeout=None):
+        """
+        Make the summary of a long history by map-reduce: the conversations are
+        summarized in batches, then the summaries are gathered by fan_out and
+        summarized again, until the summary fits the output budget. The last
+        level reached within the time budget is returned.
+        @param messages : Messages to summarize, or their analysis
+        @type messages : Union[List[tuple], Analysis]
+        @param max_depth : Maximal number of levels of summaries
+        @type max_depth : int
+        @param fan_out : Maximal number of summaries gathered into the next level
+        @type fan_out : int
+        @param time_budget : Time in seconds after which no level is started
+        @type time_budget : Optional[float]
+        @param output_tokens : Number of tokens of a short enough summary
+        @type output_tokens : int
+        @param progress : Called with the depth and the summary of each level, and with
+            the partial first level after each batch
+        @type progress : Optional[Callable[[int, str], None]]
+        @param timeout : Time in seconds given to the first level, the conversations
+            not summarized in time get an extractive summary
+        @type timeout : Optional[float]
+        @return: Summary of the messages and list of display names
+        @rtype: Tuple[str, List[str]]
+        """
+        analysis = self.analyze(messages)
+        if not analysis.messages:
+            return None, []
+        start = time.monotonic()
+        users = list({message[0] for message in analysis.messages})
+        on_batch = None
+        if progress:
+            on_batch = lambda known: progress(1, "\n".join(summary for summary in known if summary))
+        # the first level is the summary of each conversation
+        summaries = self.summarize_conversations(analysis.conversations, analysis.scope, timeout, on_batch)
+        depth = 1
+        while True:
+            summary = "\n".join(summaries)
+            if progress:
+                progress(depth, summary)
+            if len(summaries) == 1 or self.count_tokens("summary", summary) <= output_tokens:
+                break
+            if depth >= max_depth or (time_budget is not None and time.monotonic() - start > time_budget):
+                break
+            # the next level summarizes the summaries by groups of fan_out
+            chunks = []
+            for i in range(0, len(summaries), fan_out):
+                chunks.extend(self.split_input("summary", "\n".join(summaries[i:i + fan_out])))
+            summaries = self.summarize_chunks(chunks)
+            depth += 1
+        return summary, users
+
+    def summarize_last(self, messages, timeout=None, progress=None):
             """
             Make the summary of the last conversation on N messages.
-            @param messages : Messages to summarize
-            @type messages : List[tuple]
+            @param messages : Messages to summarize, or their analysis
+            @type messages : Union[List[tuple], Analysis]
+            @param timeout : Time in seconds given to the model, an extractive summary is returned after it
+            @type timeout : Optional[float]
+            @param progress : Called with the partial summary after each batch
+            @type progress : Optional[Callable[[str], None]]
             @return: Summary of the last conversation and list of display names
             @rtype: Tuple[str, List[str]]      
             """
+            analysis = self.analyze(messages)
+            messages = analysis.messages
             if messages:
-                clusters = self.cluster_maker(messages)
+                clusters = analysis.conversations
                 for c in clusters:
-                    content = ""
                     users = set()  # Set to store shit user display names
-                    previous_user = None
                     if messages[1] in c: 
-                        for cl in c:
-                            users.add(cl[0])  # Add user name to the set if not I will cry
-                            if previous_user != cl[0]:  
-                                content += f"{cl[0]}: {cl[1]}\n"
-                            else:
-                                content += f"{cl[1]}\n"
-                            previous_user = cl[0]
-                        chunks = self.split_input_by_max_length(content)  # Split content into chunks
-                        summary_last = ""
-                        for chunk in chunks:
-                            cl_summary = self.pipeline_summary(chunk)  # Process each chunk
-                            summary_part = "".join(summary['summary_text'] for summary in cl_summary)
-                            summary_last += summary_part
+                        users.update(cl[0] for cl in c)  # Add user name to the set if not I will cry
+                        on_batch = None
+                        if progress:
+                            on_batch = lambda known: progress(known[0] or "")
+                        summary_last = self.summarize_conversations([c], analysis.scope, timeout, on_batch)[0]
                         return summary_last, list(users)  # Return summary and list of display names
             return None, []
 
  
 
+    def select_salient(self, messages):
+        """
+        Keep the most salient messages of a conversation within the extractive
+        token budget. The messages without information (links, "lol", "+1"...)
+        are dropped, then the others are ranked by TextRank.
+
+        :param messages: Messages of a conversation, in time order
+        :type messages: List[tuple]
+        :return: The kept messages, in time order
+        :rtype: List[tuple]
+        """
+        if self.extractive_tokens is None:
+            return messages
+        start = time.perf_counter()
+        tokens = self.count_tokens_many("summary", [message[1] for message in messages])
+        # indices of the messages worth a summary
+        informative = [
+            i for i, message in enumerate(messages)
+            if self.prefilter.classify(message[1]).verdict == Verdict.ANALYZE
+        ] or list(range(len(messages)))
+
+        kept = informative
+        if sum(tokens[i] for i in informative) > self.extractive_tokens:
+            scores = self.text_rank([messages[i] for i in informative])
+            selected, size = [], 0
+            for rank in np.argsort(-scores, kind="stable"):
+                i = informative[rank]
+                if size + tokens[i] <= self.extractive_tokens:
+                    selected.append(i)
+                    size += tokens[i]
+            # a single message may be longer than the budget, it is chunked later
+            kept = sorted(selected) or [informative[int(np.argmax(scores))]]
+
+        stats = self.extractive_stats
+        stats["conversations"] += 1
+        stats["tokens_in"] += sum(tokens)
+        stats["tokens_kept"] += sum(tokens[i] for i in kept)
+        stats["time"] += time.perf_counter() - start
+        return [messages[i] for i in kept]
+
+    def text_rank(self, messages, damping=0.85, iterations=50, tol=1e-6):
+        """
+        Rank the messages by TextRank: PageRank over the graph of their TF-IDF similarities.
+
+        :param messages: Messages to rank
+        :type messages: List[tuple]
+        :return: Score of each message
+        :rtype: numpy.ndarray
+        """
+        n = len(messages)
+        try:
+            similarity = np.asarray(self.semantic_similarity(messages), dtype=float)
+        except ValueError:
+            # no word at all
+            return np.full(n, 1 / n)
+        np.fill_diagonal(similarity, 0)
+        totals = similarity.sum(axis=1, keepdims=True)
+        # a message similar to no other one links to all of them
+        transition = np.divide(similarity, totals, out=np.full((n, n), 1 / n), where=totals > 0)
+        scores = np.full(n, 1 / n)
+        for _ in range(iterations):
+            updated = (1 - damping) / n + damping * transition.T @ scores
+            if np.abs(updated - scores).sum() < tol:
+                return updated
+            scores = updated
+        return scores
+
+    def get_extractive_stats(self):
+        """
+        Returns the input tokens saved by the extractive selection.
+
+        :rtype: dict
+        """
+        stats = self.extractive_stats
+        return {
+            "conversations": stats["conversations"],
+            "tokens_in": stats["tokens_in"],
+            "tokens_kept": stats["tokens_kept"],
+            "reduction": 1 - stats["tokens_kept"] / stats["tokens_in"] if stats["tokens_in"] else 0.0,
+            "time_ms": stats["time"] * 1000,
+        }
+
+    def run_batched(self, pipeline, chunks, deadline=None, on_batch=None, **kwargs):
+        """
+        Send the chunks through the pipeline as batches of chunks of similar
+        lengths, so a batch is padded as little as possible.
+
+        :param pipeline: Pipeline called with a list of texts
+        :param chunks: Texts to process
+        :type chunks: List[str]
+        :param deadline: Value of time.monotonic after which no batch is started, the
+            generation of a batch is also stopped at this time and its truncated outputs
+            are dropped
+        :type deadline: Optional[float]
+        :param on_batch: Called with the outputs after each batch
+        :type on_batch: Optional[Callable[[list], None]]
+        :return: The output of each chunk in the order of the chunks, None for the chunks
+            not processed before the deadline
+        :rtype: list
+        """
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+        outputs = [None] * len(chunks)
+        for start in range(0, len(order), self.batch_size):
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                kwargs["max_time"] = remaining
+            batch = order[start:start + self.batch_size]
+            results = pipeline([chunks[i] for i in batch], batch_size=len(batch), **kwargs)
+            if deadline is not None and time.monotonic() >= deadline:
+                # the generation was stopped by max_time, the outputs are cut short
+                break
+            for i, result in zip(batch, results):
+                outputs[i] = result
+            if on_batch:
+                on_batch(outputs)
+        return outputs
+
+    def summarize_chunks(self, chunks, deadline=None, on_batch=None):
+        """
+        Summarize the chunks in batches.
+
+        :param chunks: Texts to summarize
+        :type chunks: List[str]
+        :param deadline: Value of time.monotonic after which no batch is started
+        :type deadline: Optional[float]
+        :param on_batch: Called with the summaries after each batch
+        :type on_batch: Optional[Callable[[List[Optional[str]]], None]]
+        :return: The summary of each chunk in the order of the chunks, None for the
+            chunks not summarized before the deadline
+        :rtype: List[Optional[str]]
+        """
+        def to_text(result):
+            if result is None:
+                return None
+            # a chunk may have several generated sequences
+            if isinstance(result, dict):
+                result = [result]
+            return "".join(summary['summary_text'] for summary in result)
+
+        callback = None
+        if on_batch:
+            callback = lambda outputs: on_batch([to_text(result) for result in outputs])
+        outputs = self.run_batched(self.pipeline_summary, chunks, deadline, callback)
+        return [to_text(result) for result in outputs]
+
+    def extractive_summary(self, cluster, max_messages=3):
+        """
+        Returns the most central messages of a cluster, the summary of a cluster
+        when there is no time left for the model.
+
+        :param cluster: Messages of a conversation
+        :type cluster: List[tuple]
+        :param max_messages: Number of kept messages
+        :type max_messages: int
+        :rtype: str
+        """
+        informative = [
+            message for message in cluster
+            if self.prefilter.classify(message[1]).verdict == Verdict.ANALYZE
+        ] or cluster
+        scores = self.text_rank(informative)
+        kept = sorted(np.argsort(-scores, kind="stable")[:max_messages])
+        return " ".join(f"{informative[i][0]}: {informative[i][1]}" for i in kept)
+
+    def get_conversations(self, messages):
+        """
+        Split the messages into conversations. In threading mode, the messages
+        linked by a reply, a mention or a turn form the threads, only the other
+        messages are clustered.
+
+        :param messages: Messages to be clustered
+        :type messages: List[tuple]
+        :return: Detected conversations, sorted by their first message
+        :rtype: List[List[tuple]]
+        """
+        if not self.threading:
+            return self.segment(messages)
+        ordered = sorted(messages, key=lambda message: message[2])
+        threads, unlinked = self.threader.thread(ordered)
+        if unlinked:
+            threads.extend(self.segment(unlinked))
+        return sorted(threads, key=lambda conversation: min(m[2] for m in conversation))
+
+    def segment(self, messages):
+        """
+        Split the messages into conversations. The short histories are clustered
+        by cluster_maker, the long ones by the sparse segmentation engine.
+
+        :param messages: Messages to be clustered
+        :type messages: List[tuple]
+        :return: Detected conversations
+        :rtype: List[List[tuple]]
+        """
+        if len(messages) <= self.MAX_DENSE_MESSAGES:
+            return self.cluster_maker(messages)
+        return self.segmenter.segment(messages)
+
+    def get_chunker(self, name):
+        """
+        Returns the token chunker of a model, None without chunker factory.
+
+        :param name: Name of the model, summary or topics
+        :type name: str
+        :rtype: Optional[TokenChunker]
+        """
+        if self.chunker_factory is None:
+            return None
+        if name not in self.chunkers:
+            self.chunkers[name] = self.chunker_factory(name)
+        return self.chunkers[name]
+
+    def count_tokens(self, name, text):
+        """
+        Count the tokens of a text for a model, estimated without chunker.
+
+        :param name: Name of the model, summary or topics
+        :type name: str
+        :type text: str
+        :rtype: int
+        """
+        return self.count_tokens_many(name, [text])[0]
+
+    def count_tokens_many(self, name, texts):
+        """
+        Count the tokens of the texts for a model, estimated without chunker.
+
+        :param name: Name of the model, summary or topics
+        :type name: str
+        :type texts: List[str]
+        :rtype: List[int]
+        """
+        chunker = self.get_chunker(name)
+        if chunker is None:
+            return [math.ceil(len(text) / 3) for text in texts]
+        return chunker.count(texts)
+
+    def split_input(self, name, text):
+        """
+        Split the input text of a model into chunks of its token budget.
+
+        :param name: Name of the model, summary or topics
+        :type name: str
+        :param text: Text to split, one message by line
+        :type text: str
+        :return: The chunks
+        :rtype: List[str]
+        """
+        chunker = self.get_chunker(name)
+        if chunker is None:
+            return self.split_input_by_max_length(text)
+        return chunker.split(text)
+
+    def split_input_lines(self, name, lines):
+        """
+        Split the input lines of a model into chunks of its token budget.
+
+        :param name: Name of the model, summary or topics
+        :type name: str
+        :param lines: Lines to split, without line break
+        :type lines: List[str]
+        :return: The chunks and the indices of the lines of each chunk
+        :rtype: List[Tuple[str, range]]
+        """
+        chunker = self.get_chunker(name)
+        if chunker is None:
+            return self.split_lines_by_max_length(lines)
+        return chunker.split_lines(lines)
+
+    def split_lines_by_max_length(self, lines, max_length=512):
+        """
+        Split the lines into chunks of maximum length, a longer line is a chunk alone.
+
+        :type lines: List[str]
+        :type max_length: int
+        :return: The chunks and the indices of the lines of each chunk
+        :rtype: List[Tuple[str, range]]
+        """
+        chunks = []
+        start, length = 0, -1
+        for i, line in enumerate(lines):
+            # +1 to account for '\n'
+            if i > start and length + len(line) + 1 > max_length:
+                chunks.append(("\n".join(lines[start:i]), range(start, i)))
+                start, length = i, -1
+            length += len(line) + 1
+        if start < len(lines):
+            chunks.append(("\n".join(lines[start:]), range(start, len(lines))))
+        return chunks
+
     def split_input_by_max_length(self,text, max_length=512):
         """
         Split the input text into chunks of maximum length.
@@ -232,15 +769,17 @@ class Summarizer:
     def topics_last(self, messages):
         """
         Extract topics from the given messages, focusing on the last cluster of messages.
-        @param messages: Messages to extract topics from
-        @type messages : List[tuple]
+        @param messages: Messages to extract topics from, or their analysis
+        @type messages : Union[List[tuple], Analysis]
         @return: Dictionary containing topics and their scores
         @rtype: Dict[str, float]
         """
+        analysis = self.analyze(messages)
+        messages = analysis.messages
         if not messages or len(messages) < 2:
             return {}
 
-        clusters = self.cluster_maker(messages)
+        clusters = analysis.conversations
 
         # Initialize dictionary to store topic distributions
         topics_distribution = {}
@@ -251,12 +790,11 @@ class Summarizer:
                 for cl in c:
                     content += f"{cl[1]}\n"
                 # Split content into chunks to avoid large clusters
-                chunks = self.split_input_by_max_length(content)
-                for chunk in chunks:
-                    # Extract topics from each chunk
-                    distributions = self.pipeline_topics([chunk], top_k=None)
+                chunks = self.split_input("topics", content)
+                # Extract topics from the chunks in batches
+                for distributions in self.run_batched(self.pipeline_topics, chunks, top_k=None):
                     other_score = 0
-                    for i, distribution in enumerate(distributions[0]):
+                    for i, distribution in enumerate(distributions):
                         label = distribution['label']
                         score = distribution['score']
                         if i < 5 and score > 0.08:
@@ -270,35 +808,38 @@ class Summarizer:
     def topics(self, messages):
         """
         Extract topics from the given messages.
-        @param messages: Messages to extract topics from
-        @type messages : List[tuple]
+        @param messages: Messages to extract topics from, or their analysis
+        @type messages : Union[List[tuple], Analysis]
         @return: Dictionary containing topics and their scores
         @rtype: Dict[str, float]
         """
         # Cluster all messages
-        clusters = self.cluster_maker(messages)
+        clusters = self.analyze(messages).conversations
         
         # Initialize dictionary to store topic distributions
         topics_distribution = {}
         
-        for cluster_index, cluster_messages in enumerate(clusters):
+        # Split the content of each cluster into chunks to avoid large clusters
+        chunks, cluster_chunks = [], []
+        for cluster_messages in clusters:
             content = ""
             for message in cluster_messages:
                 content += f"{message[1]}\n"
-            
-            # Split content into chunks to avoid large clusters
-            chunks = self.split_input_by_max_length(content)
-            
+            cluster_chunks.append(len(chunks))
+            chunks.extend(self.split_input("topics", content))
+        cluster_chunks.append(len(chunks))
+
+        # Extract topics from the chunks of all the clusters in batches
+        chunk_topics = self.run_batched(self.pipeline_topics, chunks, top_k=None)
+        
+        for cluster_index in range(len(clusters)):
             # Initialize temporary dictionary to accumulate topic scores for each chunk
             temp_distribution = {}
             
-            for chunk in chunks:
-                # Extract topics from each chunk
-                cluster_topics = self.pipeline_topics([chunk], top_k=None)
-                
+            for cluster_topics in chunk_topics[cluster_chunks[cluster_index]:cluster_chunks[cluster_index + 1]]:
                 # Accumulate topic scores for this chunk
                 other_score = 0
-                for i, distribution in enumerate(cluster_topics[0]):
+                for i, distribution in enumerate(cluster_topics):
                     label = distribution['label']
                     score = distribution['score']
                     if i < 5 and score > 0.08: